@@ -12,27 +12,35 @@ done
 
 #cat << EOF > /dev/null
 source /home/jurandy/proj/colario-py/.venv/bin/activate
+# Nada mudou desde a última atualização: não há o que refazer nem publicar
+/home/jurandy/proj/colario-py/colario.py --check parnamirim . "/var/www/html/horario/${CAMPUS}/${ANO_PERIODO}" && exit 0
 #rm -rf md
 #mkdir md
 /home/jurandy/proj/colario-py/colario.py parnamirim . "/var/www/html/horario/${CAMPUS}/${ANO_PERIODO}"
 
 # Atualiza a versão web (HTML)
 
-cp -r modelo/* md && cd md && make html && \
-	cd /var/www/html/horario/${CAMPUS} && \
-	rm -rf "${ANO_PERIODO}" && mv ${OLDPWD}/_build/html "${ANO_PERIODO}" && \
-    cd -
+# Só copia do modelo o que for mais novo e publica (não move) o HTML gerado,
+# para que o make html aproveite o cache em md/_build e refaça só as
+# páginas alteradas. O publicacao.py troca a versão publicada de uma vez e
+# reaproveita os arquivos que não mudaram
+# Se a publicação falhar, a impressão das entradas é apagada para que o
+# próximo --check não dê o campus como atualizado
+cp -ru modelo/. md && cd md && make html && \
+	/home/jurandy/proj/colario-py/publicacao.py _build/html "/var/www/html/horario/${CAMPUS}/${ANO_PERIODO}" || \
+	rm -f "${DEST_DIR}/.colario-entradas.json"
 
 cd ../
 
-# Atualiza os arquivos no formato PDF, SVG e TXT
+# Atualiza os arquivos no formato PDF, SVG, TXT e as agendas ICS
 pwd
 
-for fmt in pdf png svg txt; do
-   FMT_DEST="/var/www/html/horario/${fmt}/${CAMPUS}"
-   rm -rf "${FMT_DEST}"
-   mkdir -pv "${FMT_DEST}"
-   mv -v "${fmt}"/* "${FMT_DEST}"
+for fmt in pdf png svg txt ics; do
+   # Sem validade em horario.yaml não há agendas
+   [ -d "${fmt}" ] || continue
+   # Copiados, não movidos: a próxima execução reaproveita as páginas iguais
+   /home/jurandy/proj/colario-py/publicacao.py "${fmt}" "/var/www/html/horario/${fmt}/${CAMPUS}" || \
+	rm -f "${DEST_DIR}/.colario-entradas.json"
 done
 
 # EOF
@@ -0,0 +1,41 @@
+'''
+Gravação de arquivos que preserva a data de modificação quando o conteúdo
+não muda. O Sphinx usa essa data para decidir quais páginas refazer, então
+reescrever um arquivo idêntico custa uma página renderizada de novo.
+'''
+
+import filecmp
+import os
+import pathlib
+import shutil
+
+
+def escrever_se_mudou(caminho: pathlib.Path, conteudo: str) -> bool:
+    '''
+    Grava `conteudo` em `caminho` só se for diferente do atual. Retorna se gravou.
+    '''
+    caminho = pathlib.Path(caminho)
+    # Sem tradução de fim de linha, para comparar também conteúdo com \r\n (.ics)
+    try:
+        with caminho.open(mode='r', encoding='utf-8', newline='') as arq:
+            if arq.read() == conteudo:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    with caminho.open(mode='w', encoding='utf-8', newline='') as arq:
+        arq.write(conteudo)
+    return True
+
+
+def copiar_se_mudou(origem, destino) -> bool:
+    '''
+    Copia `origem` para `destino` (arquivo ou diretório) só se o conteúdo for
+    diferente. Retorna se copiou. Serve como `copy_function` do
+    shutil.copytree.
+    '''
+    if os.path.isdir(destino):
+        destino = os.path.join(destino, os.path.basename(origem))
+    if os.path.exists(destino) and filecmp.cmp(origem, destino, shallow=False):
+        return False
+    shutil.copy2(origem, destino)
+    return True
@@ -0,0 +1,158 @@
+'''
+Índice invertido de busca, publicado junto com o site e consultado no
+navegador por `busca.js`.
+
+Arquivos gerados em `md/_static/busca`:
+
+- documentos.json: [[categoria, slug, nome], ...], na ordem dos números dos
+  documentos;
+- termos-<x>.json: {termo: [números dos documentos]} para os termos que
+  começam com o caractere <x>;
+- busca.js: função `buscarHorarios(consulta)`, que normaliza a consulta do
+  mesmo jeito que os termos foram normalizados aqui e carrega só as partes
+  do índice necessárias.
+
+Para o `make html` (Sphinx), `md/busca.md` é a página de busca: o formulário,
+os resultados e o busca.js vão num bloco de HTML, sem depender do conf.py do
+modelo. O emissor_html.py gera a sua própria página de busca.
+'''
+
+import json
+import pathlib
+import re
+
+from slugify import slugify
+
+from arquivos import escrever_se_mudou
+from grade import dias
+
+re_intervalo = re.compile(r'^\d{1,2}-\d{2}$')
+
+termos_ignorados = {slugify(dia) for dia in dias} | {'horario', 'professor'}
+
+codigo_js = '''\
+// Gerado pelo colario: busca no índice invertido dos horários.
+const dirBusca = new URL('.', document.currentScript.src);
+const partes = new Map();
+
+function normalizarTermo(termo) {
+  return termo.normalize('NFD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase()
+    .replace(/[^a-z0-9]+/g, '-').replace(/^-+|-+$/g, '');
+}
+
+async function carregarJSON(nome) {
+  if (!partes.has(nome)) {
+    partes.set(nome, fetch(new URL(nome, dirBusca)).then(r => r.ok ? r.json() : {}));
+  }
+  return partes.get(nome);
+}
+
+async function buscarHorarios(consulta) {
+  const termos = consulta.split(/\\s+/).map(normalizarTermo).filter(t => t.length > 1);
+  if (!termos.length) return [];
+  let resultado = null;
+  for (const termo of termos) {
+    const parte = await carregarJSON(`termos-${termo[0]}.json`);
+    const docs = new Set(parte[termo] || []);
+    resultado = resultado === null ? docs : new Set([...resultado].filter(d => docs.has(d)));
+  }
+  const documentos = await carregarJSON('documentos.json');
+  return [...resultado].sort((a, b) => a - b).map(d => {
+    const [categoria, slug, nome] = documentos[d];
+    return {categoria, slug, nome};
+  });
+}
+'''
+
+
+pagina_md = '''\
+---
+orphan: true
+---
+
+(busca)=
+
+# Busca
+
+```{raw} html
+<form id="form-busca" class="wy-form" action="busca.html" method="get">
+  <input type="text" name="q" placeholder="Professor, sala, turma ou disciplina" />
+</form>
+<ul id="resultados-busca"></ul>
+<script src="_static/busca/busca.js"></script>
+<script>
+  (async () => {
+    const consulta = new URLSearchParams(location.search).get('q') || '';
+    document.querySelector('#form-busca input').value = consulta;
+    if (!consulta) return;
+    const lista = document.getElementById('resultados-busca');
+    const resultados = await buscarHorarios(consulta);
+    lista.innerHTML = resultados.length ? '' : '<li>Nenhum horário encontrado.</li>';
+    for (const {categoria, slug, nome} of resultados) {
+      const item = document.createElement('li');
+      const link = document.createElement('a');
+      link.href = `${categoria}/${slug}.html`;
+      link.textContent = nome;
+      item.appendChild(link);
+      lista.appendChild(item);
+    }
+  })();
+</script>
+```
+'''
+
+
+def normalizar_termo(termo: str) -> str:
+    '''
+    Forma do termo no índice, ou '' se ele não deve ser indexado.
+    '''
+    termo = slugify(termo)
+    if len(termo) < 2 or termo in termos_ignorados or re_intervalo.match(termo):
+        return ''
+    return termo
+
+
+def gerar_indice_busca(membros_categoria: dict, dir_busca: pathlib.Path):
+    documentos = []
+    postagens = {}
+    for categoria in sorted(membros_categoria):
+        membros = membros_categoria[categoria]
+        for slug in sorted(membros):
+            membro = membros[slug]
+            doc = len(documentos)
+            documentos.append([categoria, slug, membro.nome])
+            # Nomes por extenso das abreviações, para achar "Informática" em INT_INFO_1M
+            termos = membro.termos_horario + membro.nome.split()
+            for _, nome in membro.siglas:
+                termos += nome.split()
+            for termo in termos:
+                termo = normalizar_termo(termo)
+                if not termo:
+                    continue
+                docs = postagens.setdefault(termo, [])
+                if not docs or docs[-1] != doc:
+                    docs.append(doc)
+
+    partes = {}
+    for termo in sorted(postagens):
+        partes.setdefault(termo[0], {})[termo] = postagens[termo]
+
+    dir_busca.mkdir(parents=True, exist_ok=True)
+    for antigo in dir_busca.glob('termos-*.json'):
+        if antigo.stem[len('termos-'):] not in partes:
+            antigo.unlink()
+
+    conteudos = {'documentos.json': documentos}
+    conteudos.update({f'termos-{inicial}.json': parte for inicial, parte in partes.items()})
+    for nome_arq, conteudo in conteudos.items():
+        escrever_se_mudou(dir_busca / nome_arq, json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')))
+    escrever_se_mudou(dir_busca / 'busca.js', codigo_js)
+
+    return len(documentos), len(postagens)
+
+
+def gerar_pagina_busca(dir_md: pathlib.Path) -> bool:
+    '''
+    Grava `busca.md` em `dir_md`; True se a página mudou.
+    '''
+    return escrever_se_mudou(dir_md / 'busca.md', pagina_md)
@@ -1,14 +1,208 @@
+'''
+Agendas iCalendar (.ics) dos horários: uma por professor, sala e turma, com
+um evento semanal para cada aula, repetido durante a validade do horário
+(`validade.ini` e `validade.fim` do `horario.yaml`).
+
+Todas as agendas são geradas numa única passada pelas grades. O que não
+depende do membro é calculado uma vez: o bloco do fuso horário, o início,
+o fim e a regra de repetição de cada intervalo de aula e o resumo de cada
+texto de célula distinto.
+'''
+
+from datetime import date, datetime, time, timedelta
+import logging
 import pathlib
 
 import yaml
 
-class Estrutura:
-    def __init__(self, **entradas) -> None:
-        self.__dict__.update(entradas)
+from arquivos import escrever_se_mudou
+from grade import dias, horarios, indice
+
+fuso = 'America/Fortaleza'
+deslocamento_fuso = timedelta(hours=-3)
+dominio_uid = 'mange.ifrn.edu.br'
+
+bloco_fuso = (
+    'BEGIN:VTIMEZONE\r\n'
+    f'TZID:{fuso}\r\n'
+    'BEGIN:STANDARD\r\n'
+    'DTSTART:19700101T000000\r\n'
+    'TZOFFSETFROM:-0300\r\n'
+    'TZOFFSETTO:-0300\r\n'
+    'TZNAME:-03\r\n'
+    'END:STANDARD\r\n'
+    'END:VTIMEZONE\r\n'
+)
+
+
+def carrega_validade(dir_raiz: pathlib.Path = None) -> tuple:
+    '''
+    (início, fim) da validade em `horario.yaml`, ou None sem o arquivo.
+    '''
+    cam_arq = (dir_raiz or pathlib.Path('.')) / 'horario.yaml'
+    if not cam_arq.exists():
+        return None
+    with cam_arq.open(mode='r', encoding='utf-8') as man_arq_conf:
+        confs_horario = yaml.safe_load(man_arq_conf) or {}
+    validade = confs_horario.get('validade')
+    if not validade:
+        return None
+    ini, fim = validade['ini'], validade['fim']
+    if not isinstance(ini, date):
+        ini = date.fromisoformat(str(ini))
+    if not isinstance(fim, date):
+        fim = date.fromisoformat(str(fim))
+    assert fim >= ini
+    return ini, fim
+
+
+def escapar(texto: str) -> str:
+    return texto.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def dobrar(linha: str) -> str:
+    '''
+    Linha de conteúdo dobrada em partes de até 75 bytes, como pede a RFC 5545.
+    '''
+    codificada = linha.encode('utf-8')
+    if len(codificada) <= 75:
+        return linha + '\r\n'
+    partes = []
+    inicio = 0
+    limite = 75
+    while inicio < len(codificada):
+        fim = min(inicio + limite, len(codificada))
+        # Não corta um caractere UTF-8 ao meio
+        while fim < len(codificada) and (codificada[fim] & 0xC0) == 0x80:
+            fim -= 1
+        partes.append(codificada[inicio:fim].decode('utf-8'))
+        inicio = fim
+        limite = 74
+    return '\r\n '.join(partes) + '\r\n'
+
+
+class AgendasICS:
+    '''
+    Gerador das agendas de um campus a partir das grades.
+    '''
+
+    def __init__(self, grades, nomes: dict, validade: tuple, campus: str,
+                 referencias=None, expansor=None):
+        '''
+        `nomes` é {categoria: {slug: nome}}. Com `referencias`, a sala citada
+        na aula vai para o local do evento; com `expansor`, as abreviações
+        citadas vão, por extenso, para a descrição.
+        '''
+        self._grades = grades
+        self._nomes = nomes
+        self._campus = campus
+        self._referencias = referencias
+        self._expansor = expansor
+        ini, fim = validade
+
+        # Data da primeira aula de cada dia da semana dentro da validade
+        primeiro_dia = [ini + timedelta(days=(dia - ini.weekday()) % 7) for dia in range(len(dias))]
+        # O último instante da validade, em UTC como pede a RFC 5545
+        ate = datetime.combine(fim, time(23, 59, 59)) - deslocamento_fuso
+        self._regra = f'RRULE:FREQ=WEEKLY;UNTIL={ate:%Y%m%dT%H%M%S}Z\r\n'
+        self._carimbo = f'DTSTAMP:{datetime.combine(ini, time()) - deslocamento_fuso:%Y%m%dT%H%M%S}Z\r\n'
+        self._dias_validos = [primeiro <= fim for primeiro in primeiro_dia]
+
+        def momento(dia: int, hora_minuto: str) -> str:
+            hora, minuto = (int(parte) for parte in hora_minuto.split(':'))
+            return f'{primeiro_dia[dia]:%Y%m%d}T{hora:02d}{minuto:02d}00'
+
+        # (dia, horário) -> início e fim do evento, já formatados
+        self._inicios = {
+            (dia, num): f'DTSTART;TZID={fuso}:{momento(dia, ini_horario)}\r\n'
+            for dia in range(len(dias)) for num, (ini_horario, _) in enumerate(horarios, start=1)
+        }
+        self._fins = {
+            (dia, num): f'DTEND;TZID={fuso}:{momento(dia, fim_horario)}\r\n'
+            for dia in range(len(dias)) for num, (_, fim_horario) in enumerate(horarios, start=1)
+        }
+        # Código de célula -> linhas de resumo, local e descrição
+        self._textos = {}
+
+    def _textos_celula(self, codigo: int) -> str:
+        textos = self._textos.get(codigo)
+        if textos is None:
+            texto = self._grades.celulas.texto(codigo)
+            textos = dobrar(f'SUMMARY:{escapar(texto)}')
+            if self._referencias is not None:
+                salas = [self._nomes.get('sala', {}).get(slug, slug)
+                         for categoria, slug in self._referencias.da_celula(codigo) if categoria == 'sala']
+                if salas:
+                    textos += dobrar(f'LOCATION:{escapar(", ".join(salas))}')
+            if self._expansor is not None:
+                siglas = self._expansor.expandir(texto)
+                if siglas:
+                    textos += dobrar('DESCRIPTION:' + escapar('\n'.join(f'{s}: {n}' for s, n in siglas)))
+            self._textos[codigo] = textos
+        return textos
+
+    def agenda(self, categoria: str, slug: str) -> str:
+        '''
+        Conteúdo do .ics do membro. Aulas seguidas com o mesmo texto viram um
+        único evento.
+        '''
+        grade = self._grades.grade(categoria, slug)
+        nome = self._nomes.get(categoria, {}).get(slug, slug)
+        partes = [
+            'BEGIN:VCALENDAR\r\n'
+            'VERSION:2.0\r\n'
+            'PRODID:-//IFRN//colario//PT-BR\r\n'
+            'CALSCALE:GREGORIAN\r\n',
+            dobrar(f'X-WR-CALNAME:{escapar(nome)}'),
+            f'X-WR-TIMEZONE:{fuso}\r\n',
+            bloco_fuso,
+        ]
+        for dia in range(len(dias)):
+            if not self._dias_validos[dia]:
+                continue
+            num = 1
+            while num <= len(horarios):
+                codigo = grade[indice(num, dia)]
+                if not codigo:
+                    num += 1
+                    continue
+                ultimo = num
+                while ultimo < len(horarios) and grade[indice(ultimo + 1, dia)] == codigo:
+                    ultimo += 1
+                partes.append('BEGIN:VEVENT\r\n')
+                partes.append(f'UID:{self._campus}-{categoria}-{slug}-{dia}-{num}@{dominio_uid}\r\n')
+                partes.append(self._carimbo)
+                partes.append(self._inicios[(dia, num)])
+                partes.append(self._fins[(dia, ultimo)])
+                partes.append(self._regra)
+                partes.append(self._textos_celula(codigo))
+                partes.append('END:VEVENT\r\n')
+                num = ultimo + 1
+        partes.append('END:VCALENDAR\r\n')
+        return ''.join(partes)
+
+    def gerar(self, dir_ics: pathlib.Path) -> tuple:
+        '''
+        Grava as agendas em `dir_ics`/<categoria>/<slug>.ics e apaga as de
+        membros que não existem mais. Retorna (agendas, agendas regravadas).
+        '''
+        total = gravadas = 0
+        existentes = {cam for cam in dir_ics.glob('*/*.ics')}
+        criados = set()
+        for categoria, slug in self._grades.membros():
+            cam_ics = dir_ics / categoria / f'{slug}.ics'
+            if categoria not in criados:
+                cam_ics.parent.mkdir(parents=True, exist_ok=True)
+                criados.add(categoria)
+            existentes.discard(cam_ics)
+            total += 1
+            gravadas += escrever_se_mudou(cam_ics, self.agenda(categoria, slug))
+        for cam_ics in existentes:
+            logging.info(f'Removendo agenda {cam_ics}.')
+            cam_ics.unlink()
+        return total, gravadas
 
-arq_conf = pathlib.Path('horario.yaml')
-if arq_conf.exists():
-    with arq_conf.open(mode='r', encoding='utf-8') as man_arq_conf:
-        confs_horario = yaml.safe_load(man_arq_conf)
 
-        estruturas = Estrutura(**confs_horario)
+def gerar_agendas(grades, nomes: dict, validade: tuple, campus: str, dir_ics: pathlib.Path,
+                  referencias=None, expansor=None) -> tuple:
+    return AgendasICS(grades, nomes, validade, campus, referencias, expansor).gerar(dir_ics)
@@ -1,29 +1,46 @@
 #!/usr/bin/env python3
 
+import sys
+
+# --check responde antes de carregar o restante (conversores, yaml, slugify):
+# o cron pode perguntar a todo minuto se há o que refazer. Ver frescor.py
+if __name__ == '__main__' and '--check' in sys.argv[1:]:
+    from frescor import main as main_frescor
+    main_frescor(sys.argv[1:])
+
 import argparse
+from concurrent.futures import ThreadPoolExecutor, wait
 import csv
-from datetime import date, datetime
-from dataclasses import dataclass
+from datetime import datetime
+from dataclasses import asdict, dataclass, replace
 from glob import glob
+import hashlib
+import json
 import logging
 import os
 import pathlib
+import re
 import shutil
-import subprocess
-import sys
 import tempfile
 import venv
 
 
 from slugify import slugify
-import yaml
 
-cmd_tmpl = {
-    'pdf2pdfs': 'pdfseparate {arq_pdf} {pag_pdf_padrao}',
-    'pdf2txt': 'pdftotext -layout {arq_pdf} {arq_alvo}.txt',
-    'pdf2svg': 'pdf2svg {arq_pdf} {arq_alvo}.svg',
-    'pdf2png': 'pdftoppm -png -singlefile {arq_pdf} {arq_alvo}',
-}
+from arquivos import copiar_se_mudou, escrever_se_mudou
+from busca import gerar_indice_busca, gerar_pagina_busca
+from colagenda import carrega_validade, gerar_agendas
+from conflitos import MapaOcupacao
+from conversor import ConversorCLI, ConversorPDF, conversores, formatos_sem_imagens
+from etapas import executar_etapas, grafo as grafo_etapas, ler_lista, planejar as planejar_etapas
+from expansao import Expansor
+from grade import Grades
+from metricas import Metricas
+from otimizacao import ConfOtimizacao, arq_glifos, glifos_usados, juntar_glifos, otimizar_pagina
+from referencias import Referencias
+
+arq_manifesto = '.colario-manifesto.json'
+arq_conflitos = 'conflitos.json'
 
 plural_categoria = {
     'professor': 'professores',
@@ -31,48 +48,87 @@ plural_categoria = {
     'turma': 'turmas'
 }
 
-@dataclass
+# Endereço de cada artefato publicado, usado nos links "Baixar"
+url_download = 'https://mange.ifrn.edu.br/horario/{fmt}/{campus}/{categoria}/{slug}.{fmt}'
+formatos_download = ('pdf', 'png', 'svg', 'txt')
+
 class MembroCategoria:
-    slug: str
-    nome: str
-    texto_horario: str
-    termos_horario: str
-    categoria: str
-
-
-def atualizar_site(pdf_dir, www_dir):
-    data_hoje = datetime.now().date()
-
-    arq_conf = pathlib.Path(pdf_dir/'horario.yaml')
-    arq_turma = pathlib.Path(pdf_dir/'turma.pdf')
-    arq_index = pathlib.Path(www_dir/'index.html')
-
-    if arq_conf.exists():
-        with arq_conf.open(mode='r', encoding='utf-8') as man_arq_conf:
-            confs_horario = yaml.safe_load(man_arq_conf)
-            data_ini = confs_horario['validade']['ini']
-            data_fim = confs_horario['validade']['fim']
-            assert data_fim >= data_ini
-
-            dif_datas = (data_hoje-data_ini).days
-            
-            return 0==dif_datas # TODO: Qual é a data do arquivo "index.html"?
-    else:
-        datahora_index = datetime.fromtimestamp(arq_index.stat().st_mtime)
-        datahora_turma = datetime.fromtimestamp(arq_turma.stat().st_mtime)
-        return datahora_index < datahora_turma
+    '''
+    Membro de uma categoria. Só o nome fica em memória; o texto do horário é
+    lido do artefato txt quando alguém precisa dele, para que a memória não
+    cresça com o número de páginas (e de campi, no orquestrador).
+    '''
+    __slots__ = ('slug', 'nome', 'categoria', 'arq_txt', 'siglas', 'relacionados')
+
+    def __init__(self, slug: str, nome: str, categoria: str, arq_txt: pathlib.Path, siglas: tuple = ()):
+        self.slug = slug
+        self.nome = nome
+        self.categoria = categoria
+        self.arq_txt = arq_txt
+        # Abreviações citadas no horário, ((abreviação, nome), ...)
+        self.siglas = siglas
+        # Membros de outras categorias ligados a este (MembroCategoria, ...)
+        self.relacionados = ()
+
+    def __repr__(self):
+        return f'MembroCategoria({self.categoria!r}, {self.slug!r}, {self.nome!r})'
+
+    @property
+    def texto_horario(self) -> str:
+        with open(self.arq_txt, mode='r', encoding='utf-8') as arq_txt:
+            return arq_txt.read()
+
+    @property
+    def termos_horario(self) -> list:
+        return self.texto_horario.split()
 
-    # return False
-    return True # Só para passar pelo teste
 
-def carrega_abreviacoes(categoria: str) -> dict:
-    cam_arq = pathlib.Path(os.getcwd()) / 'abrev' / f'{categoria}.csv'
+def iterar_membros(membros_categoria: dict, categorias: tuple = None):
+    '''
+    Percorre os membros das categorias (todas, se `categorias` não for dada)
+    em ordem de categoria e slug, sem montar listas intermediárias.
+    '''
+    for categoria in sorted(membros_categoria) if categorias is None else categorias:
+        membros = membros_categoria.get(categoria, {})
+        for slug in sorted(membros):
+            yield membros[slug]
+
+
+def carrega_abreviacoes(categoria: str, dir_raiz: pathlib.Path = None) -> dict:
+    cam_arq = (dir_raiz or pathlib.Path(os.getcwd())) / 'abrev' / f'{categoria}.csv'
     with cam_arq.open(mode='r', encoding='utf-8') as arq_abrev:
         leitor = csv.DictReader(arq_abrev)
         nome_abrev = {linha['Abreviacao']:linha['Nome'] for linha in leitor}
         return nome_abrev
 
 
+def carrega_tabelas_abreviacoes(dir_raiz: pathlib.Path = None) -> dict:
+    '''
+    Abreviações de cada `abrev/*.csv` com a coluna `Abreviacao`, por
+    categoria: {'sala': {'A101': 'Sala de aula A101'}, ...}. Os demais
+    arquivos, como o `professor.csv` (Nome,Turmas), ficam de fora.
+    '''
+    dir_abrev = (dir_raiz or pathlib.Path(os.getcwd())) / 'abrev'
+    tabelas = {}
+    for cam_arq in sorted(dir_abrev.glob('*.csv')):
+        with cam_arq.open(mode='r', encoding='utf-8') as arq_abrev:
+            if 'Abreviacao' not in (csv.DictReader(arq_abrev).fieldnames or ()):
+                continue
+        tabelas[cam_arq.stem] = carrega_abreviacoes(cam_arq.stem, dir_raiz)
+    return tabelas
+
+
+def carrega_expansor(dir_raiz: pathlib.Path = None) -> Expansor:
+    '''
+    Expansor com as abreviações de todos os `abrev/*.csv` (categorias,
+    disciplinas...).
+    '''
+    nomes = {}
+    for abreviacoes in carrega_tabelas_abreviacoes(dir_raiz).values():
+        nomes.update(abreviacoes)
+    return Expansor(nomes)
+
+
 def carrega_turmas_professores() -> dict:
     cam_arq = pathlib.Path(os.getcwd()) / 'abrev' / 'professor.csv'
     with cam_arq.open(mode='r', encoding='utf-8') as arq_prof:
@@ -81,17 +137,108 @@ def carrega_turmas_professores() -> dict:
         return turmas_prof
 
 
+def nome_membro(categoria: str, texto: str) -> str:
+    '''
+    Nome do professor, sala ou turma no texto da página.
+    '''
+    linhas = texto.splitlines()
+    if categoria == 'professor':
+        return linhas[0].strip()[10:]
+    nome = linhas[0].strip()
+
+    # Thanks professor Henrique Coelho for reporting this bug
+    if nome.startswith('Centro Federal'):
+        nome = linhas[1].strip()
+    return nome
+
+
+def carrega_membros(dir_raiz: pathlib.Path) -> dict:
+    '''
+    {categoria: {slug: MembroCategoria}} da última execução em `dir_raiz`,
+    a partir do manifesto e dos artefatos txt, sem converter nada.
+    '''
+    membros_categoria = {}
+    for categoria, paginas in carrega_manifesto(dir_raiz).get('categorias', {}).items():
+        membros = membros_categoria[categoria] = {}
+        for slug in sorted(set(paginas.values())):
+            arq_txt = dir_raiz / 'txt' / categoria / f'{slug}.txt'
+            with open(arq_txt, mode='r', encoding='utf-8') as arq:
+                # As duas primeiras linhas bastam para o nome
+                inicio = arq.readline() + arq.readline()
+            membros[slug] = MembroCategoria(slug, nome_membro(categoria, inicio), categoria, arq_txt)
+    return membros_categoria
+
+
+def carrega_manifesto(dir_raiz: pathlib.Path) -> dict:
+    cam_arq = dir_raiz / arq_manifesto
+    if not cam_arq.exists():
+        return {}
+    with cam_arq.open(mode='r', encoding='utf-8') as man_arq:
+        return json.load(man_arq)
+
+
+def salva_manifesto(dir_raiz: pathlib.Path, manifesto: dict):
+    cam_arq = dir_raiz / arq_manifesto
+    cam_tmp = cam_arq.with_suffix('.tmp')
+    with cam_tmp.open(mode='w', encoding='utf-8') as man_arq:
+        json.dump(manifesto, man_arq, indent=1, sort_keys=True)
+    os.replace(cam_tmp, cam_arq)
+
+
+# O pdfseparate grava em cada página um /ID novo, feito a partir da hora. Cada
+# um dos dois identificadores vem em hexadecimal, <...>, ou como string, (...)
+_id_elemento = rb'(?:<[0-9A-Fa-f\s]*>|\((?:\\.|[^\\)])*\))'
+_id_trailer = re.compile(rb'/ID\s*\[\s*' + _id_elemento + rb'\s*' + _id_elemento + rb'\s*\]', re.DOTALL)
+
+
+def hash_pdf_pagina(caminho) -> str:
+    '''
+    Hash do PDF de uma página sem o /ID do trailer, para que a mesma página
+    separada em execuções diferentes tenha o mesmo hash.
+    '''
+    with open(caminho, mode='rb') as arq:
+        return hashlib.sha256(_id_trailer.sub(b'/ID', arq.read())).hexdigest()
+
+
 class FatiadorPDF:
     '''
     Fatiador de arquivo PDF
     '''
     
-    def __init__(self, categoria: str):
-
-        self._dir_raiz = pathlib.Path(os.getcwd())
+    def __init__(self, categoria: str, executor: ThreadPoolExecutor = None,
+                 paginas_anteriores: dict = None, lote: bool = False,
+                 conversor: ConversorPDF = None, metricas: Metricas = None,
+                 dir_raiz: pathlib.Path = None, campus: str = None,
+                 otimizacao: ConfOtimizacao = None, expansor: Expansor = None,
+                 downloads: tuple = formatos_download, ext_img: str = 'png', gerar_md: bool = True):
+
+        self._dir_raiz = dir_raiz or pathlib.Path(os.getcwd())
+        self._otimizacao = otimizacao
+        self._expansor = expansor
+        self._downloads = downloads
+        # Formato da imagem mostrada em cada página; None, sem imagem
+        self.ext_img = ext_img
+        self.campus = campus or globals().get('campus', '')
         self.categoria = categoria
         self.membros = {}        
         self.caminho_arquivo = self._dir_raiz/f'{categoria}.pdf'
+        self._executor = executor
+        self._lote = lote
+        self._conversor = conversor or ConversorCLI(metricas)
+        self._metricas = metricas or self._conversor.metricas
+        # Artefatos guardados de cada página; sem PNG e SVG, as imagens são
+        # geradas sob demanda pelo servidor_imagens.py
+        self._artefatos = ('txt', 'pdf') + tuple(ext for ext in ('png', 'svg') if ext in self._conversor.formatos)
+
+        # hash da página PDF -> slug, da execução anterior e desta
+        self._paginas_anteriores = paginas_anteriores or {}
+        self.paginas = {}
+        # Slugs cujos artefatos foram (re)gerados nesta execução
+        self.alterados = set()
+        # Glifos compartilhados extraídos nesta execução, no total e por
+        # página convertida
+        self._glifos = {}
+        self._glifos_pagina = {}
 
         self._dir_ext = {
             'md': self._dir_raiz / 'md' / categoria,
@@ -102,71 +249,191 @@ class FatiadorPDF:
         }
 
         self._separar_paginas()
-        self._gerar_md(ext_img='png')
-                
+        self._remover_obsoletos(ext_img=self.ext_img)
+        # As páginas dos membros esperam os relacionados (gerar_paginas_md)
+        if gerar_md:
+            with self._metricas.etapa('md', self.categoria):
+                self._gerar_indice_md(ext_img=self.ext_img)
+
+    def _reaproveitavel(self, hash_pagina: str) -> bool:
+        slug = self._paginas_anteriores.get(hash_pagina)
+        if slug is None:
+            return False
+        return all((self._dir_ext[ext]/f'{slug}.{ext}').exists() for ext in self._artefatos)
+
+    def _executar(self, tarefas: list):
+        '''
+        Executa as tarefas de conversão. Com um executor, rodam em paralelo
+        (inclusive entre categorias que o compartilham).
+        '''
+        if self._executor is None:
+            for tarefa in tarefas:
+                tarefa()
+        else:
+            futuros = [self._executor.submit(tarefa) for tarefa in tarefas]
+            wait(futuros)
+            for futuro in futuros:
+                futuro.result()
+
     def _separar_paginas(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             logging.info(f'Diretório temporário {temp_dir} criado para horários de {plural_categoria[self.categoria]}.')
-            cwd = os.getcwd()
-            os.chdir(temp_dir)
-            cmd = cmd_tmpl["pdf2pdfs"].format(arq_pdf=self.caminho_arquivo, pag_pdf_padrao=f'{self.categoria}-%02d.pdf')
-            subprocess.run(cmd.split())
+            dir_temp = pathlib.Path(temp_dir)
+            with self._metricas.etapa('split', self.categoria):
+                self._conversor.separar(self.caminho_arquivo, dir_temp/f'{self.categoria}-%02d.pdf',
+                                        reaproveitavel=lambda pagina: self._reaproveitavel(hash_pdf_pagina(pagina)))
 
             logging.debug(f'Arquivos PDF de {plural_categoria[self.categoria]} separados.')
 
-            arqs_pdf = glob('*.pdf')
-            for ext in ('pdf', 'png', 'md', 'svg', 'txt'):
+            # Mesma ordem do glob('*.pdf') no diretório temporário, para que
+            # slugs repetidos sejam resolvidos como na execução serial
+            arqs_pdf = [pathlib.Path(arq).name for arq in glob(str(dir_temp/'*.pdf'))]
+            for ext in ('md',) + self._artefatos:
                 self._dir_ext[ext].mkdir(parents=True, exist_ok=True)
 
+            hashes = {nome_arq_pdf: hash_pdf_pagina(dir_temp/nome_arq_pdf) for nome_arq_pdf in arqs_pdf}
+            novos = {nome_arq_pdf for nome_arq_pdf in arqs_pdf if not self._reaproveitavel(hashes[nome_arq_pdf])}
+            logging.info(f'{len(novos)} de {len(arqs_pdf)} páginas de {plural_categoria[self.categoria]} alteradas.')
+
+            prefixo = len(self.categoria) + 1
+            nome_pagina = {int(nome_arq_pdf[prefixo:-4]): nome_arq_pdf[:-4] for nome_arq_pdf in novos}
+            with self._metricas.etapa('conversao', self.categoria):
+                if self._lote:
+                    self._conversor.converter_lote(self.caminho_arquivo, dir_temp, nome_pagina, len(arqs_pdf), self._executar)
+                else:
+                    self._conversor.converter_paginas(dir_temp, nome_pagina, self._executar)
+            with self._metricas.etapa('otimizacao', self.categoria):
+                self._otimizar(dir_temp, nome_pagina)
+
+            # Última página com cada slug (a que prevalece, como na execução serial)
+            origem_slug = {}
             for nome_arq_pdf in arqs_pdf:
-                nome_arq = nome_arq_pdf[:-4]
-                nome_arq_txt = f'{nome_arq_pdf[:-4]}.txt'
-
-                for ext in ('txt', 'png', 'svg'):
-                    cmd = cmd_tmpl[f'pdf2{ext}'].format(arq_pdf=nome_arq_pdf, arq_alvo=nome_arq)
-                    subprocess.run(cmd.split())
+                hash_pagina = hashes[nome_arq_pdf]
+                if nome_arq_pdf in novos:
+                    nome_arq = dir_temp/nome_arq_pdf[:-4]
+                    nome_arq_txt = f'{nome_arq}.txt'
+                else:
+                    nome_arq = None
+                    nome_arq_txt = self._dir_ext['txt']/f'{self._paginas_anteriores[hash_pagina]}.txt'
         
                 with open(file=nome_arq_txt, mode='r', encoding='utf-8') as arq_txt:
                     texto = arq_txt.read()
-                    linhas = texto.splitlines()
-                    if self.categoria == 'professor':
-                        nome = linhas[0].strip()[10:]
-                    else:
-                        nome = linhas[0].strip()
-
-                        # Thanks professor Henrique Coelho for reporting this bug
-                        if nome.startswith('Centro Federal'):
-                            nome = linhas[1].strip()
-
+                    nome = nome_membro(self.categoria, texto)
                     slug = slugify(nome)
                     logging.debug(f'Arquivo: {nome_arq_txt}, Nome: {nome}, Slug: {slug}')
 
+                    # O texto fica no artefato txt, copiado abaixo
                     novo_membro = MembroCategoria(
                         slug=slug,
                         nome=nome,
-                        texto_horario=texto,
-                        termos_horario=texto.split(),
-                        categoria=self.categoria
+                        categoria=self.categoria,
+                        arq_txt=self._dir_ext['txt']/f'{slug}.txt',
+                        siglas=self._expansor.expandir(texto) if self._expansor else ()
                     )
                     self.membros[slug] = novo_membro
-
-                    for ext in ('txt', 'pdf', 'png', 'svg'):
-                        shutil.copy(f'{nome_arq}.{ext}', self._dir_ext[ext]/f'{slug}.{ext}')
-
-            os.chdir(cwd)
+                    self.paginas[hash_pagina] = slug
+                    origem_slug[slug] = nome_arq
+
+            for slug, nome_arq in origem_slug.items():
+                if nome_arq is None:
+                    continue
+                self.alterados.add(slug)
+                for ext in self._artefatos:
+                    shutil.copy(f'{nome_arq}.{ext}', self._dir_ext[ext]/f'{slug}.{ext}')
+            self._atualizar_glifos(origem_slug)
+
+    def _otimizar(self, dir_temp: pathlib.Path, nome_pagina: dict):
+        '''
+        Diminui as imagens das páginas convertidas, antes de copiá-las.
+        '''
+        if self._otimizacao is None or not nome_pagina:
+            return
+        resultados = {}
+
+        def otimizar(nome_arq):
+            resultados[nome_arq] = otimizar_pagina(dir_temp/nome_arq, self._conversor.formatos, self._otimizacao)
+
+        self._executar([lambda nome_arq=nome_arq: otimizar(nome_arq) for nome_arq in nome_pagina.values()])
+
+        for nome_arq, resultado in resultados.items():
+            self._glifos.update(resultado['glifos'])
+            self._glifos_pagina[nome_arq] = set(resultado['glifos'])
+        logging.info(f"Otimização de {plural_categoria[self.categoria]}: "
+                     f"{sum(r['png'] for r in resultados.values())} bytes a menos em PNG, "
+                     f"{sum(r['svg'] for r in resultados.values())} em SVG, "
+                     f"{len(self._glifos)} glifos compartilhados.")
+
+    def _atualizar_glifos(self, origem_slug: dict):
+        '''
+        Junta os glifos novos ao _glifos.svg da categoria e tira dele os que
+        nenhuma página usa mais. Os glifos de cada página ficam num índice
+        em `dir_raiz`; sem ele, são lidos dos próprios SVG.
+        '''
+        if self._otimizacao is None or not self._otimizacao.glifos_compartilhados or 'svg' not in self._artefatos:
+            return
+        cam_indice = self._dir_raiz / f'.colario-glifos-{self.categoria}.json'
+        indice = None
+        if cam_indice.exists():
+            with open(cam_indice, mode='r', encoding='utf-8') as arq_indice:
+                indice = json.load(arq_indice)
+        if indice is None:
+            indice = {
+                slug: sorted(glifos_usados((self._dir_ext['svg']/f'{slug}.svg').read_text(encoding='utf-8')))
+                for slug in self.membros if (self._dir_ext['svg']/f'{slug}.svg').exists()
+            }
+        for slug, nome_arq in origem_slug.items():
+            if nome_arq is not None:
+                indice[slug] = sorted(self._glifos_pagina.get(pathlib.Path(nome_arq).name, ()))
+        indice = {slug: glifos for slug, glifos in indice.items() if slug in self.membros}
+
+        manter = set()
+        for glifos in indice.values():
+            manter.update(glifos)
+        juntar_glifos(self._dir_ext['svg']/arq_glifos, self._glifos, manter)
+        escrever_se_mudou(cam_indice, json.dumps(indice, indent=1, sort_keys=True))
+
+    def _remover_obsoletos(self, ext_img='svg'):
+        '''
+        Apaga os artefatos de slugs que existiam na execução anterior e sumiram.
+
+        Além do manifesto, olha as páginas Markdown e as imagens que já estão
+        em `md`, que é mantido mesmo nas reconstruções completas.
+        '''
+        cam_imgs = self._dir_ext['md'].parent / '_static' / 'img' / f'{self.categoria}'
+        existentes = set(self._paginas_anteriores.values())
+        existentes.update(cam.stem for cam in self._dir_ext['md'].glob('*.md') if cam.name != 'index.md')
+        if ext_img:
+            existentes.update(cam.stem for cam in cam_imgs.glob(f'*.{ext_img}'))
+        obsoletos = existentes - set(self.membros)
+        for slug in sorted(obsoletos):
+            logging.info(f'Removendo artefatos de {self.categoria} {slug}.')
+            caminhos = [self._dir_ext[ext]/f'{slug}.{ext}' for ext in ('md', 'pdf', 'png', 'svg', 'txt')]
+            if ext_img:
+                caminhos.append(cam_imgs/f'{slug}.{ext_img}')
+            for caminho in caminhos:
+                caminho.unlink(missing_ok=True)
 
     def _gerar_md(self, ext_img='svg'):
-
+        '''
+        Gera as páginas Markdown e copia as imagens para `_static`. Arquivos
+        com o mesmo conteúdo não são regravados, para que o Sphinx só refaça
+        as páginas que mudaram.
+        '''
+        self._gerar_indice_md(ext_img)
+        self.gerar_paginas_md(ext_img)
+
+    def _gerar_indice_md(self, ext_img='svg'):
         # Gera a página Markdown índice
         cam_arq_indice = self._dir_ext['md'] / 'index.md'
         plural = plural_categoria[self.categoria]
 
         # Cria diretório para salvar imagens
-        cam_orig_imgs = self._dir_ext[ext_img]
+        cam_orig_imgs = self._dir_ext.get(ext_img)
         cam_dest_imgs = self._dir_ext['md'].parent / '_static' / 'img' / f'{self.categoria}'
-        cam_dest_imgs.mkdir(parents=True, exist_ok=True)
-        with cam_arq_indice.open(mode='w', encoding='utf-8') as arq_indice:
-            arq_indice.write(f'''\
+        imagens_locais = ext_img in self._artefatos
+        if imagens_locais:
+            cam_dest_imgs.mkdir(parents=True, exist_ok=True)
+        indice = f'''\
 ({self.categoria})=                             
 
 # {plural.capitalize()}
@@ -174,27 +441,38 @@ class FatiadorPDF:
 ```{{toctree}}
 :maxdepth: 1
 
-''')
-            
-            for slug in sorted(self.membros.keys()):
-                arq_indice.write(f'{slug}\n')
-                shutil.copy(cam_orig_imgs/f'{slug}.{ext_img}', cam_dest_imgs)
-
-            arq_indice.write("```\n")
-
-
-        # Gera uma página Markdown por membro da categoria
-
+'''
+        for slug in sorted(self.membros.keys()):
+            indice += f'{slug}\n'
+            if not imagens_locais:
+                continue
+            if slug in self.alterados or not (cam_dest_imgs/f'{slug}.{ext_img}').exists():
+                copiar_se_mudou(cam_orig_imgs/f'{slug}.{ext_img}', cam_dest_imgs/f'{slug}.{ext_img}')
+        indice += "```\n"
+        escrever_se_mudou(cam_arq_indice, indice)
+
+    def gerar_paginas_md(self, ext_img='svg'):
+        '''
+        Gera uma página Markdown por membro da categoria, com links para os
+        relacionados de cada um.
+        '''
+        imagens_locais = ext_img in self._artefatos
         for slug,membro in self.membros.items():
             md = self._dir_ext['md'] / f'{slug}.md'
-
-            with open(md, mode='w', encoding='utf-8') as man_arq_md:
-                conteudo_md = f'''\
+            conteudo_md = f'''\
 ({self.categoria}:{slug})=
 
 # {membro.nome}
 
-```{{figure}} ../_static/img/{self.categoria}/{slug}.{ext_img}
+'''
+            # Sem ext_img, nem imagens locais nem servidor de imagens
+            if ext_img:
+                if imagens_locais:
+                    img = f'../_static/img/{self.categoria}/{slug}.{ext_img}'
+                else:
+                    img = url_download.format(fmt=ext_img, campus=self.campus, categoria=self.categoria, slug=slug)
+                conteudo_md += f'''\
+```{{figure}} {img}
 ---
 width: 100%
 align: center
@@ -203,24 +481,352 @@ name: fig:{self.categoria}:{slug}
 ---
 ```
 
-## Baixar
+'''
+            if membro.relacionados:
+                conteudo_md += '## Relacionados\n\n'
+                por_categoria = {}
+                for relacionado in membro.relacionados:
+                    por_categoria.setdefault(relacionado.categoria, []).append(
+                        f'{{ref}}`{relacionado.nome} <{relacionado.categoria}:{relacionado.slug}>`')
+                for categoria, refs in por_categoria.items():
+                    conteudo_md += f'- {plural_categoria[categoria].capitalize()}: {", ".join(refs)}\n'
+                conteudo_md += '\n'
+            if membro.siglas:
+                conteudo_md += '## Abreviações\n\n'
+                for sigla, nome in membro.siglas:
+                    conteudo_md += f'- **{sigla}**: {nome}\n'
+                conteudo_md += '\n'
+            conteudo_md += '## Baixar\n\n'
+            for fmt in self._downloads:
+                url = url_download.format(fmt=fmt, campus=self.campus, categoria=self.categoria, slug=slug)
+                conteudo_md += f'- [{fmt.upper()}]({url})\n'
+            conteudo_md += '\n'
+            if escrever_se_mudou(md, conteudo_md):
+                logging.debug(f'Página {md} atualizada.')
 
-- [PDF](https://mange.ifrn.edu.br/horario/pdf/{campus}/{self.categoria}/{slug}.pdf)
-- [PNG](https://mange.ifrn.edu.br/horario/png/{campus}/{self.categoria}/{slug}.png)
-- [SVG](https://mange.ifrn.edu.br/horario/svg/{campus}/{self.categoria}/{slug}.svg)
-- [TXT](https://mange.ifrn.edu.br/horario/txt/{campus}/{self.categoria}/{slug}.txt)
 
-'''
+@dataclass
+class CampusProcessado:
+    membros_categoria: dict
+    grades: Grades
+    ocupacao: MapaOcupacao
+    conflitos: list
+    # Formatos dos links "Baixar" (com agendas, também ics)
+    downloads: tuple = formatos_download
+    # Etapas executadas (etapas.py) e a imagem mostrada nas páginas
+    etapas: tuple = tuple(grafo_etapas)
+    ext_img: str = 'png'
+    imagens_locais: bool = True
+
+
+def processar_campus(campus: str, dir_raiz: pathlib.Path, conversoes: ThreadPoolExecutor = None,
+                     lote: bool = False, conversor = ConversorCLI.nome, completo: bool = False,
+                     metricas: Metricas = None, sem_imagens: bool = False,
+                     otimizacao: ConfOtimizacao = None, formatos: tuple = None,
+                     etapas: tuple = None, jobs: int = None) -> CampusProcessado:
+    '''
+    Fatia os PDFs das três categorias de um campus, em `dir_raiz`, e gera os
+    artefatos derivados. As conversões vão para o executor `conversoes`, que
+    pode ser compartilhado por vários campi. `conversor` é o nome de um dos
+    `conversores` ou uma instância de ConversorPDF. Com `sem_imagens`, PNG e
+    SVG não são gerados e as páginas apontam para o servidor de imagens.
+    `otimizacao` configura a resolução e o pós-processamento das imagens.
+
+    `formatos` limita as conversões (txt, png, svg) e `etapas` as etapas do
+    grafo em etapas.py; as que não rodam não custam nada. Formatos que não
+    são gerados também saem dos links "Baixar". `jobs` limita as conversões
+    simultâneas dos conversores que não usam o executor (o assincrono).
+    '''
+    metricas = metricas or Metricas()
+    otimizacao = otimizacao or ConfOtimizacao()
+    if isinstance(conversor, ConversorPDF):
+        formatos = conversor.formatos
+    elif formatos is None and sem_imagens:
+        formatos = formatos_sem_imagens
+    ativas, formatos = planejar_etapas(etapas, formatos)
+    if isinstance(conversor, ConversorPDF):
+        instancia_conversor = conversor
+        conversor = conversor.nome
+    else:
+        instancia_conversor = conversores[conversor](metricas, formatos=formatos, dpi=otimizacao.dpi,
+                                                     max_tarefas=jobs)
+    categorias = ('professor',  'sala',  'turma')
+    logging.info(f"Etapas: {', '.join(ativas)}.")
+
+    # A imagem das páginas é o PNG; sem ele, o SVG. Sem nenhum dos dois, a
+    # imagem vem do servidor de imagens (sem_imagens) ou as páginas ficam sem
+    # imagem (ext_img None)
+    imagens_locais = any(fmt in formatos for fmt in ('png', 'svg'))
+    if imagens_locais:
+        ext_img = 'svg' if 'svg' in formatos and 'png' not in formatos else 'png'
+    else:
+        ext_img = 'png' if sem_imagens else None
+    if otimizacao.glifos_compartilhados and ext_img == 'svg':
+        logging.warning('Glifos compartilhados desligados: o SVG é a imagem das páginas, e o navegador '
+                        'não carrega glifos de outro arquivo numa <img>.')
+        otimizacao = replace(otimizacao, glifos_compartilhados=False)
+    # Links só para o que é publicado; com sem_imagens, o servidor de imagens
+    # atende PNG e SVG
+    downloads = tuple(fmt for fmt in formatos_download if fmt == 'pdf' or sem_imagens or fmt in formatos)
+
+    # Imagens de execuções anteriores seriam publicadas desatualizadas
+    for fmt in ('png', 'svg'):
+        if fmt not in formatos and (dir_raiz / fmt).exists():
+            shutil.rmtree(dir_raiz / fmt)
+    dir_static_img = dir_raiz / 'md' / '_static' / 'img'
+    if not imagens_locais and dir_static_img.exists():
+        shutil.rmtree(dir_static_img)
+    elif imagens_locais:
+        for img in dir_static_img.glob('*/*'):
+            if img.suffix != f'.{ext_img}':
+                img.unlink()
+
+    # Sem manifesto compatível, a reconstrução é completa como antes. O
+    # diretório md fica: as páginas iguais não são regravadas e o cache do
+    # Sphinx em md/_build continua valendo
+    manifesto = carrega_manifesto(dir_raiz)
+    if completo or manifesto.get('campus') != campus or manifesto.get('conversor') != conversor \
+            or manifesto.get('otimizacao', asdict(ConfOtimizacao())) != asdict(otimizacao):
+        manifesto = {}
+        formatos_suportados = ('pdf', 'png', 'svg', 'txt')
+        for formato in formatos_suportados:
+            if (dir_raiz / formato).exists():
+                shutil.rmtree(dir_raiz / formato)
+    paginas_categoria = manifesto.get('categorias', {})
+
+    # Estado compartilhado entre as etapas; o que não roda fica vazio
+    grades = Grades()
+    referencias = ocupacao = None
+    conflitos = []
+    expansor = None
+
+    with metricas.etapa('total'):
+        # Abreviações compiladas uma vez e aplicadas a cada página no fatiamento
+        if 'abreviacoes' in ativas:
+            with metricas.etapa('abreviacoes'):
+                expansor = carrega_expansor(dir_raiz)
+            logging.info(f'{len(expansor)} abreviações carregadas.')
+        # Sem a validade do horário, não há como limitar as agendas
+        validade = carrega_validade(dir_raiz) if 'agendas' in ativas else None
+        if validade:
+            downloads += ('ics',)
+
+        # As três categorias são fatiadas ao mesmo tempo e compartilham o mesmo
+        # conjunto de processos de conversão
+        with metricas.etapa('fatiamento'), \
+             ThreadPoolExecutor(max_workers=len(categorias)) as fatiadores:
+            fatiadores_categoria = {
+                categoria: fatiadores.submit(FatiadorPDF, categoria, conversoes,
+                                             paginas_categoria.get(categoria), lote, instancia_conversor, metricas,
+                                             dir_raiz, campus, otimizacao if 'otimizacao' in ativas else None,
+                                             expansor, downloads, ext_img, 'md' in ativas)
+                for categoria in categorias
+            }
+            fatiados = {
+                categoria: fatiador.result()
+                for categoria, fatiador in fatiadores_categoria.items()
+            }
+
+        membros_categoria = {categoria: fatiado.membros for categoria, fatiado in fatiados.items()}
+        nomes = {
+            categoria: {slug: membro.nome for slug, membro in membros.items()}
+            for categoria, membros in membros_categoria.items()
+        }
 
-                man_arq_md.write(conteudo_md)
+        def etapa_grades():
+            nonlocal referencias
+            with metricas.etapa('grades'):
+                for membro in iterar_membros(membros_categoria):
+                    grades.adicionar(membro.categoria, membro.slug, membro.texto_horario)
+                    if not grades.ocupacao(membro.categoria, membro.slug):
+                        logging.warning(f'Grade vazia ou não reconhecida: {membro.categoria} {membro.slug}.')
+            logging.info(f'{len(grades)} grades com {len(grades.celulas)} células distintas.')
+
+            referencias = Referencias(grades, nomes, carrega_tabelas_abreviacoes(dir_raiz))
+
+        def etapa_conflitos():
+            nonlocal ocupacao, conflitos
+            with metricas.etapa('conflitos'):
+                ocupacao = MapaOcupacao(grades, referencias)
+                conflitos = ocupacao.conflitos()
+            for conflito in conflitos:
+                logging.warning(f"Conflito: {conflito['descricao']} ({conflito['slug']}), "
+                                f"{conflito['dia']} {conflito['intervalo']}: {', '.join(conflito['membros'])}.")
+            with open(dir_raiz / arq_conflitos, mode='w', encoding='utf-8') as man_arq_conflitos:
+                json.dump(conflitos, man_arq_conflitos, ensure_ascii=False, indent=1)
+            print(f'{campus}: {len(conflitos)} conflitos de horário encontrados (ver {arq_conflitos}).')
+
+        # Ligações entre professores, salas e turmas, a partir das citações
+        def etapa_relacionados():
+            with metricas.etapa('relacionados'):
+                for (categoria, slug), outros in ocupacao.relacionados().items():
+                    membro = membros_categoria.get(categoria, {}).get(slug)
+                    if membro is not None:
+                        membro.relacionados = tuple(
+                            membros_categoria[c][s] for c, s in outros if s in membros_categoria.get(c, {}))
+
+        def etapa_md():
+            for categoria, fatiado in fatiados.items():
+                with metricas.etapa('md', categoria):
+                    fatiado.gerar_paginas_md(ext_img=ext_img)
+
+        def etapa_busca():
+            with metricas.etapa('busca'):
+                total_docs, total_termos = gerar_indice_busca(membros_categoria,
+                                                              dir_raiz / 'md' / '_static' / 'busca')
+                gerar_pagina_busca(dir_raiz / 'md')
+            logging.info(f'Índice de busca gerado: {total_docs} documentos, {total_termos} termos.')
+
+        def etapa_agendas():
+            if not validade:
+                return
+            with metricas.etapa('agendas'):
+                total_agendas, gravadas = gerar_agendas(grades, nomes, validade, campus, dir_raiz / 'ics',
+                                                        referencias, expansor)
+            logging.info(f'{total_agendas} agendas iCalendar, {gravadas} regravadas.')
+
+        # Artefatos de etapas que não rodaram estariam desatualizados
+        if 'busca' not in ativas:
+            if (dir_raiz / 'md' / '_static' / 'busca').exists():
+                shutil.rmtree(dir_raiz / 'md' / '_static' / 'busca')
+            (dir_raiz / 'md' / 'busca.md').unlink(missing_ok=True)
+        if 'conflitos' not in ativas:
+            (dir_raiz / arq_conflitos).unlink(missing_ok=True)
+        executar_etapas(ativas, {
+            'grades': etapa_grades,
+            'conflitos': etapa_conflitos,
+            'relacionados': etapa_relacionados,
+            'md': etapa_md,
+            'busca': etapa_busca,
+            'agendas': etapa_agendas,
+        })
+        # Agendas que não são mais geradas não podem ser publicadas
+        if not validade and (dir_raiz / 'ics').exists():
+            shutil.rmtree(dir_raiz / 'ics')
+
+    salva_manifesto(dir_raiz, {
+        'campus': campus,
+        'conversor': conversor,
+        'otimizacao': asdict(otimizacao),
+        'categorias': {categoria: fatiado.paginas for categoria, fatiado in fatiados.items()}
+    })
+
+    return CampusProcessado(membros_categoria, grades, ocupacao, conflitos, downloads, ativas, ext_img,
+                            imagens_locais)
+
+
+def executar(args: argparse.Namespace, fname: str):
+    '''
+    Processa o campus no diretório atual e, com --html nativo, gera o HTML.
+    '''
+    metricas = Metricas()
+    global membros_categoria, grades, ocupacao
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as conversoes:
+        processado = processar_campus(campus, pathlib.Path(os.getcwd()), conversoes, lote=args.lote,
+                                      conversor=args.conversor, completo=args.completo, metricas=metricas,
+                                      sem_imagens=args.sem_imagens,
+                                      otimizacao=ConfOtimizacao(dpi=args.dpi, nivel_png=args.nivel_png,
+                                                                glifos_compartilhados=args.glifos_compartilhados),
+                                      formatos=args.formatos, etapas=args.etapas, jobs=args.jobs)
+    membros_categoria = processado.membros_categoria
+    grades = processado.grades
+    ocupacao = processado.ocupacao
+
+    if args.html == 'nativo' and 'html' in processado.etapas:
+        from emissor_html import gerar_html
+        with metricas.etapa('html'):
+            gerar_html(membros_categoria, pathlib.Path(os.getcwd()) / 'md', campus, ext_img=processado.ext_img,
+                       imagens_locais=processado.imagens_locais, downloads=processado.downloads)
+
+    resumo = metricas.resumo()
+    logging.info(f'Resumo da execução:\n{resumo}')
+    print(resumo)
+    arq_metricas = f'{fname[:-4]}.json'
+    metricas.salvar(arq_metricas)
+    print(f'Métricas: {arq_metricas}')
+
+
+def vigiar(args: argparse.Namespace, dir_envios: pathlib.Path, fname: str):
+    '''
+    Modo --watch: a cada envio completo em `dir_envios`, copia os três PDFs
+    para o diretório atual e refaz o campus de forma incremental. Uma falha
+    não interrompe a vigia; o próximo envio tenta de novo.
+    '''
+    from frescor import impressao, salvar
+    from vigia import categorias, vigiar_envios
+
+    def ao_chegar(_, carimbo: str):
+        print(f'Envio {carimbo} recebido.', flush=True)
+        for categoria in categorias:
+            copiar_se_mudou(dir_envios / f'{carimbo}_{categoria}.pdf', f'{categoria}.pdf')
+        try:
+            # Como numa execução normal, para que o --check do cron a reconheça
+            entradas = impressao('.', sys.argv[1:])
+            executar(args, fname)
+            salvar('.', entradas)
+        except Exception:
+            logging.exception(f'Falha ao processar o envio {carimbo}')
+            print(f'Falha ao processar o envio {carimbo}; veja o log.', flush=True)
+        # Depois da primeira execução, só o que mudou é refeito
+        args.completo = False
+
+    print(f'Vigiando {dir_envios} (Ctrl+C para sair).', flush=True)
+    try:
+        vigiar_envios({campus: dir_envios}, ao_chegar, atraso=args.atraso)
+    except KeyboardInterrupt:
+        pass
 
 
 def main():
+    # colario.py diff <campus> <anterior> <atual>: ver diferencas.py
+    if sys.argv[1:2] == ['diff']:
+        from diferencas import main as main_diferencas
+        main_diferencas(sys.argv[2:])
+    # colario.py api <dir_pdf>: ver consultas.py
+    if sys.argv[1:2] == ['api']:
+        from consultas import main as main_consultas
+        main_consultas(sys.argv[2:])
+
     ana_args = argparse.ArgumentParser()
     ana_args.add_argument('campus', help='Nome do campus')
     ana_args.add_argument('dir_pdf', help='Diretório onde se encontram os arquivos PDF com horários')
     ana_args.add_argument('dir_www', help='Diretório para publicação dos horários na Web')
+    ana_args.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                          help='Número de conversões de páginas executadas em paralelo')
+    ana_args.add_argument('--lote', action='store_true',
+                          help='Converte cada categoria com um processo por formato, em vez de um por página')
+    ana_args.add_argument('--conversor', choices=sorted(conversores), default=ConversorCLI.nome,
+                          help='Conversor de PDF: programas externos (cli) ou PyMuPDF no próprio processo (mupdf)')
+    ana_args.add_argument('--completo', action='store_true',
+                          help='Ignora o manifesto e refaz todos os artefatos')
+    ana_args.add_argument('--sem-imagens', action='store_true',
+                          help='Não gera PNG nem SVG; as páginas usam as imagens do servidor_imagens.py')
+    ana_args.add_argument('--formatos', '--formats', type=ler_lista, metavar='FMT,...',
+                          help='Formatos gerados para cada página, dentre txt, png e svg (txt é obrigatório). '
+                               'Os demais não são convertidos nem aparecem nos links "Baixar"')
+    ana_args.add_argument('--etapas', '--stages', type=ler_lista, metavar='ETAPA,...',
+                          help=f'Só estas etapas e as suas dependências, dentre {", ".join(grafo_etapas)}')
+    ana_args.add_argument('--dpi', type=int, default=ConfOtimizacao.dpi, help='Resolução dos PNG')
+    ana_args.add_argument('--nivel-png', type=int, choices=range(10), default=ConfOtimizacao.nivel_png,
+                          help='Nível de compressão do zlib para recomprimir os PNG (0 não recomprime)')
+    ana_args.add_argument('--glifos-compartilhados', action='store_true',
+                          help='Guarda os glifos dos SVG de cada categoria num único _glifos.svg')
+    ana_args.add_argument('--html', choices=('sphinx', 'nativo'), default='sphinx',
+                          help='sphinx: só gera o Markdown para o make html; nativo: também gera o HTML '
+                               'final em md/_build/html, sem Sphinx')
+    ana_args.add_argument('--watch', metavar='DIR_ENVIOS',
+                          help='Fica vigiando o diretório de envios e refaz o campus a cada novo envio '
+                               '(<carimbo>_professor.pdf, <carimbo>_sala.pdf e <carimbo>_turma.pdf)')
+    ana_args.add_argument('--atraso', type=float, default=5.0,
+                          help='Com --watch, segundos sem mudanças no diretório antes de processar um envio')
+    ana_args.add_argument('--check', action='store_true',
+                          help='Só verifica se as entradas mudaram desde a última execução: sai com 0 se o '
+                               'campus está atualizado e com 1 se é preciso refazê-lo (ver frescor.py)')
     args = ana_args.parse_args()
+    try:
+        planejar_etapas(args.etapas, args.formatos)
+    except ValueError as erro:
+        ana_args.error(str(erro))
 
     global campus
     campus = args.campus
@@ -229,14 +835,13 @@ def main():
     ls_pdf = dir_horarios.glob('*.pdf')
 
     dir_www = pathlib.Path(args.dir_www)
+    dir_envios = pathlib.Path(args.watch).resolve() if args.watch else None
 
     # assert dir_horarios.is_dir() and dir_www.is_dir()
     # assert all([arq_pdf in ls_pdf for arq_pdf in ('professor.pdf', 'sala.pdf', 'turma.pdf')])
     # assert 'index.html' in dir_www.glob('index.html')
   
     os.chdir(dir_horarios)
-    # if not atualizar_site(dir_horarios, dir_www):
-    #     sys.exit(1)
 
     now = datetime.now()   
     pid = os.getpid()
@@ -250,17 +855,16 @@ def main():
         format='%(asctime)s - %(levelname)s - %(message)s',
         level=logging.DEBUG
     )
-    categorias = ('professor',  'sala',  'turma')
-
-    formatos_suportados = ('md', 'pdf', 'png', 'svg', 'txt')
-    for formato in formatos_suportados:
-        if os.path.exists(formato): 
-            shutil.rmtree(formato)
-
-    global membros_categoria
-
-    membros_categoria = {categoria:FatiadorPDF(categoria).membros for categoria in categorias}
-
+    if dir_envios:
+        vigiar(args, dir_envios, fname)
+        sys.exit(0)
+
+    # Impressão tirada antes: um envio que chegue durante a execução ainda
+    # deixa o campus desatualizado para o próximo --check
+    from frescor import impressao, salvar
+    entradas = impressao('.', sys.argv[1:])
+    executar(args, fname)
+    salvar('.', entradas)
     sys.exit(0)
 
 if __name__ == '__main__':
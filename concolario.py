@@ -1,89 +1,238 @@
 #!/usr/bin/env python3.11
 # -*- coding: utf-8 -*-
 
+'''
+Conversão assíncrona dos horários: cada página segue da separação para as
+conversões em TXT, PNG e SVG assim que é gravada, sem esperar as demais
+páginas nem as outras categorias. Cada PDF é separado por um único
+pdfseparate, e uma página está gravada quando ele passa à seguinte.
+
+Todos os comandos (pdfseparate, pdftotext, pdftoppm e pdf2svg) passam por um
+único semáforo, que limita quantos processos rodam ao mesmo tempo (--jobs).
+Os comandos são executados diretamente, sem shell, e uma falha em qualquer
+um deles cancela os demais e interrompe a execução.
+
+O restante (manifesto, Markdown, grades, conflitos e índice de busca) é o
+mesmo do colario.py, que também pode usar este conversor com
+`--conversor assincrono`.
+'''
+
 import argparse
 import asyncio
-import glob
+from datetime import datetime
 import logging
 import os
 import pathlib
-import tempfile
-
-# Singular da categoria
-sing_categ = {
-    'professores': 'professor',
-    'salas': 'sala',
-    'turmas': 'turma'
-}
-
-cmd_pdf2 = {
-    'txt': 'pdftotext {cam_pdf} {cam_ext}',
-    'svg': 'pdf2svg {cam_pdf} {cam_ext}',
-    'png': 'pdftoppm -png -singlefile {cam_pdf} {cam_ext}'
-}
-
-async def disparar(comando: str):
-    processo = await asyncio.subprocess.create_subprocess_shell(comando)
-    stdout,stdin = await processo.communicate()
-    await processo.wait()
-
-
-async def separar_pdf(nome_categoria: str, dir_dest_pdf: pathlib.Path):
-    dir_pdf_categoria = dir_dest_pdf/f'{nome_categoria}'
-    dir_pdf_categoria.mkdir(parents=True, exist_ok=True)
-    padrao_caminho = dir_pdf_categoria/f'{nome_categoria}-%02d.pdf'
-
-    comando = f'/usr/bin/pdfseparate {nome_categoria}.pdf {padrao_caminho}'
-    await disparar(comando)
-
-async def converter_pdf(ext: str, dir_dest_pdf: pathlib.Path):
-    dir_ext = dir_dest_pdf.parent/ext
-    dir_ext.mkdir(exist_ok=True, parents=True)
-    for categoria in 'professor sala turma'.split():
-        dir_ext_categ = dir_ext/categoria
-        dir_ext_categ.mkdir(parents=True, exist_ok=True)
-
-    pdfs = dir_dest_pdf.glob('**/*.pdf')
-    caminhos = [str(r) for r in pdfs]
-    comandos = []
-    mod_comando = cmd_pdf2[ext]
-    for cam in caminhos:
-         comandos.append(mod_comando.format(cam_pdf=cam, cam_ext=cam.replace("pdf", ext)))
-    
-    if ext=='png':
-        tarefas = [disparar(cmd[:-4]) for cmd in comandos]
-    else:
-        tarefas = [disparar(cmd) for cmd in comandos]
-
-    await asyncio.gather(*tarefas)
-
-async def main():
-    ana_args = argparse.ArgumentParser()
-    ana_args.add_argument('diretorio_pdf', 
-                          help='Diretório com arquivos PDF')
+import sys
+import threading
+import time
+
+from conversor import ConversorPDF, cmd_tmpl, comando, dpi_padrao, formatos_conversao, formatos_sem_imagens
+from metricas import Metricas
+
+
+class ErroConversao(Exception):
+    '''
+    Comando de conversão que terminou com código de saída diferente de zero.
+    '''
+
+    def __init__(self, cmd: list, codigo: int, erro: str):
+        self.cmd = cmd
+        self.codigo = codigo
+        self.erro = erro
+        super().__init__(f'{" ".join(cmd)} terminou com código {codigo}: {erro.strip()}')
+
+
+# Segundos entre as verificações das páginas gravadas pelo pdfseparate
+intervalo_separacao = 0.01
+
+
+def primeira_falha(falhas: ExceptionGroup) -> Exception:
+    '''
+    O erro a repassar de um grupo de falhas: a primeira ErroConversao, ou a
+    primeira falha se não houver nenhuma.
+    '''
+    erros = falhas.exceptions
+    return next((erro for erro in erros if isinstance(erro, ErroConversao)), erros[0])
+
+
+class LacoConversao:
+    '''
+    Laço asyncio numa thread à parte, com o semáforo que limita quantos
+    comandos rodam ao mesmo tempo. Vários conversores (os campi do
+    orquestrador.py) podem compartilhar o mesmo laço e, com ele, o limite.
+    '''
+
+    def __init__(self, max_tarefas: int = None):
+        self.max_tarefas = max(1, max_tarefas or os.cpu_count())
+        self.semaforo = None
+        self._laco = asyncio.new_event_loop()
+        iniciado = threading.Event()
+        threading.Thread(target=self._rodar, args=(iniciado,), name='concolario', daemon=True).start()
+        iniciado.wait()
+
+    def _rodar(self, iniciado: threading.Event):
+        asyncio.set_event_loop(self._laco)
+        self.semaforo = asyncio.Semaphore(self.max_tarefas)
+        iniciado.set()
+        self._laco.run_forever()
+
+    def aguardar(self, corrotina):
+        '''
+        Executa `corrotina` no laço e espera o resultado.
+        '''
+        return asyncio.run_coroutine_threadsafe(corrotina, self._laco).result()
+
+
+class ConversorAssincrono(ConversorPDF):
+    '''
+    Conversor que separa e converte as páginas num laço asyncio próprio.
+
+    O laço roda numa thread à parte e é compartilhado pelas categorias, que
+    chamam `separar` de threads diferentes; assim o semáforo vale para o
+    campus inteiro. Com `laco`, o laço e o semáforo são os de outros
+    conversores, e `max_tarefas` é o do laço.
+    '''
+
+    nome = 'assincrono'
+
+    def __init__(self, metricas: Metricas = None, max_tarefas: int = None,
+                 formatos: tuple = formatos_conversao, dpi: int = dpi_padrao, laco: LacoConversao = None):
+        super().__init__(metricas, formatos, dpi, laco.max_tarefas if laco else max_tarefas)
+        self._laco = laco or LacoConversao(self.max_tarefas)
+
+    def separar(self, arq_pdf, pag_pdf_padrao, reaproveitavel=None):
+        self._laco.aguardar(self._separar(arq_pdf, pag_pdf_padrao, reaproveitavel))
+
+    def converter_paginas(self, dir_temp, nome_pagina, executar):
+        # As páginas novas já foram convertidas durante a separação; aqui só
+        # sobram as que `reaproveitavel` pulou e não puderam ser reaproveitadas
+        pendentes = [
+            nome_arq for nome_arq in nome_pagina.values()
+            if not all((dir_temp/f'{nome_arq}.{ext}').exists() for ext in self.formatos)
+        ]
+        if pendentes:
+            self._laco.aguardar(self._converter_varias(dir_temp, pendentes))
+
+    def converter_lote(self, arq_pdf, dir_temp, nome_pagina, total_paginas, executar):
+        self.converter_paginas(dir_temp, nome_pagina, executar)
+
+    async def _executar(self, cmd: list, alvo=None) -> bytes:
+        cmd = [str(parte) for parte in cmd]
+        async with self._laco.semaforo:
+            inicio = time.perf_counter()
+            try:
+                processo = await asyncio.create_subprocess_exec(
+                    *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            except OSError as erro_exec:
+                # Programa ausente ou sem permissão: como o 127 do shell
+                self.metricas.registrar(' '.join(cmd), time.perf_counter() - inicio, 127, alvo, str(erro_exec))
+                raise ErroConversao(cmd, 127, str(erro_exec)) from erro_exec
+            saida, erro = await processo.communicate()
+            duracao = time.perf_counter() - inicio
+
+        erro = erro.decode('utf-8', errors='replace')
+        self.metricas.registrar(' '.join(cmd), duracao, processo.returncode, alvo, erro)
+        if processo.returncode != 0:
+            raise ErroConversao(cmd, processo.returncode, erro)
+        return saida
+
+    async def _reunir(self, corrotinas):
+        '''
+        Executa as corrotinas juntas. Na primeira falha as demais são
+        canceladas e o erro é repassado sem o ExceptionGroup; se mais de uma
+        falhou, a ErroConversao tem preferência.
+        '''
+        try:
+            async with asyncio.TaskGroup() as grupo:
+                for corrotina in corrotinas:
+                    grupo.create_task(corrotina)
+        except ExceptionGroup as falhas:
+            raise primeira_falha(falhas) from None
+
+    async def _converter_pagina(self, arq_alvo: pathlib.Path):
+        await self._reunir(self._executar(comando(ext, f'{arq_alvo}.pdf', arq_alvo, self.dpi), f'{arq_alvo}.{ext}')
+                           for ext in self.formatos)
+
+    async def _encaminhar_pagina(self, arq_pagina: pathlib.Path, reaproveitavel):
+        if reaproveitavel is not None and reaproveitavel(arq_pagina):
+            return
+        await self._converter_pagina(arq_pagina.with_suffix(''))
+
+    async def _separar(self, arq_pdf, pag_pdf_padrao, reaproveitavel):
+        # Um só pdfseparate para o PDF inteiro. Ele grava as páginas em ordem,
+        # então uma página está completa quando aparece a seguinte ou quando
+        # ele termina; cada uma segue para a conversão nesse momento
+        cmd = cmd_tmpl['pdf2pdfs'].format(arq_pdf=arq_pdf, pag_pdf_padrao=pag_pdf_padrao)
+        try:
+            async with asyncio.TaskGroup() as grupo:
+                separacao = grupo.create_task(self._executar(cmd.split(), arq_pdf))
+                pagina = 1
+                while True:
+                    arq_pagina = pathlib.Path(str(pag_pdf_padrao) % pagina)
+                    seguinte = pathlib.Path(str(pag_pdf_padrao) % (pagina + 1))
+                    while not (separacao.done() or seguinte.exists()):
+                        await asyncio.sleep(intervalo_separacao)
+                    if separacao.done():
+                        separacao.result()
+                        if not arq_pagina.exists():
+                            break
+                    grupo.create_task(self._encaminhar_pagina(arq_pagina, reaproveitavel))
+                    pagina += 1
+        except ExceptionGroup as falhas:
+            raise primeira_falha(falhas) from None
+
+    async def _converter_varias(self, dir_temp: pathlib.Path, nomes_arq: list):
+        await self._reunir(self._converter_pagina(dir_temp/nome_arq) for nome_arq in nomes_arq)
+
+
+def main():
+    from colario import processar_campus
+
+    ana_args = argparse.ArgumentParser(description='Fatia e converte os horários com um pipeline assíncrono')
+    ana_args.add_argument('campus', help='Nome do campus')
+    ana_args.add_argument('dir_pdf', help='Diretório onde se encontram os arquivos PDF com horários')
+    ana_args.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                          help='Número máximo de comandos de conversão executados ao mesmo tempo')
+    ana_args.add_argument('--completo', action='store_true',
+                          help='Ignora o manifesto e refaz todos os artefatos')
+    ana_args.add_argument('--sem-imagens', action='store_true',
+                          help='Não gera PNG nem SVG; as páginas usam as imagens do servidor_imagens.py')
     args = ana_args.parse_args()
 
-    pdf_dir = pathlib.Path(args.diretorio_pdf)
-
-    if pdf_dir.exists and pdf_dir.is_dir():
-        os.chdir(pdf_dir)
-        categorias = 'professor sala turma'.split()
-        with tempfile.TemporaryDirectory(prefix='concolario-') as dir_temp:
-            print(f'Diretório temporário: {dir_temp}')
-            dir_pdf = pathlib.Path(dir_temp)/'pdf'
-            dir_pdf.mkdir(parents=True, exist_ok=True)
-
-            tarefas = sepadores_pdf = [
-                asyncio.create_task(separar_pdf(categoria, dir_pdf))
-                for categoria in categorias
-            ]
-            await asyncio.gather(*tarefas)
-            await converter_pdf(ext='txt', dir_dest_pdf=dir_pdf)
-            await converter_pdf(ext='svg', dir_dest_pdf=dir_pdf)
-            await converter_pdf(ext='png', dir_dest_pdf=dir_pdf)
-            
-            print('Separação terminada.')
-            input('Pressione ENTER')
+    dir_horarios = pathlib.Path(args.dir_pdf)
+    if not dir_horarios.is_dir():
+        ana_args.error(f'{dir_horarios} não é um diretório')
+    os.chdir(dir_horarios)
+
+    now = datetime.now()
+    fname = f"/tmp/concolario_{now.strftime('%F_%T')}_{os.getpid()}.log"
+    print(f'Arquivo de log: {fname}')
+    logging.basicConfig(
+        filename=fname,
+        filemode='w',
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
+
+    metricas = Metricas()
+    conversor = ConversorAssincrono(metricas, max_tarefas=args.jobs,
+                                    formatos=formatos_sem_imagens if args.sem_imagens else formatos_conversao)
+    try:
+        processar_campus(args.campus, pathlib.Path(os.getcwd()), conversor=conversor,
+                         completo=args.completo, metricas=metricas)
+    except ErroConversao as erro:
+        logging.exception('Falha na conversão')
+        print(f'Falha na conversão: {erro}', file=sys.stderr)
+        sys.exit(1)
+    finally:
+        resumo = metricas.resumo()
+        logging.info(f'Resumo da execução:\n{resumo}')
+        metricas.salvar(f'{fname[:-4]}.json')
+
+    print(resumo)
+    sys.exit(0)
+
 
 if __name__ == '__main__':
-    asyncio.run(main())
\ No newline at end of file
+    main()
@@ -0,0 +1,123 @@
+'''
+Detecção de conflitos de horário e de salas livres.
+
+Cada membro tem sua ocupação representada por um inteiro de 85 bits, um por
+célula da grade (ver grade.indice()). Um membro X está em conflito num
+horário quando dois membros distintos de uma mesma categoria o citam nesse
+horário: duas turmas na mesma sala, duas salas para o mesmo professor, dois
+professores para a mesma turma etc.
+'''
+
+from grade import dias, horarios, indice, total_celulas
+
+descricao_conflito = {
+    'professor': 'professor em dois lugares ao mesmo tempo',
+    'sala': 'sala com duas aulas ao mesmo tempo',
+    'turma': 'turma com aulas sobrepostas',
+}
+
+
+def iterar_bits(bits: int):
+    '''
+    Posições dos bits ligados, da menor para a maior.
+    '''
+    while bits:
+        menor = bits & -bits
+        yield menor.bit_length() - 1
+        bits ^= menor
+
+
+class MapaOcupacao:
+    '''
+    Ocupação de todos os membros, montada em uma única passada pelas grades.
+    '''
+
+    def __init__(self, grades, referencias):
+        # (categoria, slug) -> bits das células ocupadas, na própria grade ou
+        # por citações em grades de outras categorias
+        self.ocupacao = {}
+        # membro citado -> categoria de quem cita -> {slug de quem cita: bits}
+        self.citacoes = {}
+
+        for chave in grades.membros():
+            categoria, slug = chave
+            proprios = 0
+            for i, codigo in enumerate(grades.grade(categoria, slug)):
+                if not codigo:
+                    continue
+                proprios |= 1 << i
+                for citado in referencias.da_celula(codigo):
+                    if citado[0] == categoria:
+                        continue
+                    por_slug = self.citacoes.setdefault(citado, {}).setdefault(categoria, {})
+                    por_slug[slug] = por_slug.get(slug, 0) | (1 << i)
+            self.ocupacao[chave] = self.ocupacao.get(chave, 0) | proprios
+
+        for citado, por_categoria in self.citacoes.items():
+            bits = self.ocupacao.get(citado, 0)
+            for por_slug in por_categoria.values():
+                for bits_slug in por_slug.values():
+                    bits |= bits_slug
+            self.ocupacao[citado] = bits
+
+        # Por categoria: membros em ordem fixa e, para cada célula, os bits
+        # (um por membro) dos que estão ocupados nela
+        self._ordem = {}
+        self._ocupados_celula = {}
+        for categoria, slug in sorted(self.ocupacao):
+            self._ordem.setdefault(categoria, []).append(slug)
+        for categoria, slugs in self._ordem.items():
+            ocupados = [0] * total_celulas
+            for k, slug in enumerate(slugs):
+                for i in iterar_bits(self.ocupacao[(categoria, slug)]):
+                    ocupados[i] |= 1 << k
+            self._ocupados_celula[categoria] = ocupados
+
+    def relacionados(self) -> dict:
+        '''
+        (categoria, slug) -> ((categoria, slug), ...) dos membros de outras
+        categorias ligados a ele: os que ele cita e os que o citam. Sai das
+        citações já indexadas, sem comparar os membros dois a dois.
+        '''
+        ligados = {}
+        for citado, por_categoria in self.citacoes.items():
+            for categoria, por_slug in por_categoria.items():
+                for slug in por_slug:
+                    ligados.setdefault(citado, set()).add((categoria, slug))
+                    ligados.setdefault((categoria, slug), set()).add(citado)
+        return {membro: tuple(sorted(outros)) for membro, outros in ligados.items()}
+
+    def livres(self, categoria: str, horario: int, dia: int) -> list:
+        '''
+        Slugs dos membros da categoria sem aula no horário (1 a 17) e dia (0 a 4).
+        '''
+        slugs = self._ordem.get(categoria, [])
+        todos = (1 << len(slugs)) - 1
+        livres = todos & ~self._ocupados_celula[categoria][indice(horario, dia)]
+        return [slugs[k] for k in iterar_bits(livres)]
+
+    def conflitos(self) -> list:
+        '''
+        Um registro por membro, horário e categoria de origem em conflito.
+        '''
+        registros = []
+        for (categoria, slug), por_categoria in sorted(self.citacoes.items()):
+            for origem, por_slug in sorted(por_categoria.items()):
+                vistos = repetidos = 0
+                for bits in por_slug.values():
+                    repetidos |= vistos & bits
+                    vistos |= bits
+
+                for i in iterar_bits(repetidos):
+                    horario, dia = divmod(i, len(dias))
+                    registros.append({
+                        'categoria': categoria,
+                        'slug': slug,
+                        'descricao': descricao_conflito.get(categoria, 'conflito'),
+                        'dia': dias[dia],
+                        'horario': horario + 1,
+                        'intervalo': ' - '.join(horarios[horario]),
+                        'origem': origem,
+                        'membros': sorted(s for s, bits in por_slug.items() if bits >> i & 1),
+                    })
+        return registros
@@ -0,0 +1,335 @@
+'''
+API HTTP/JSON de consulta aos horários de um campus (`colario.py api`).
+
+Os horários da última execução em <dir_pdf> (manifesto e artefatos txt)
+são carregados uma vez em índices na memória: grades por membro, ocupação
+por célula e referências entre categorias. As respostas não tocam o disco,
+ficam num cache LRU e são recarregadas quando o manifesto muda, ao fim de
+uma nova execução do colario.py.
+
+    GET /membros/<categoria>                    membros da categoria
+    GET /membros/<categoria>/<slug>             grade do membro, só as aulas
+    GET /horario/<categoria>/<slug>?dia=&hora=  aula do membro no horário
+    GET /agora/<categoria>/<slug>               aula do membro neste momento
+    GET /livres/<categoria>?dia=&hora=          membros sem aula no horário
+
+`dia` é Seg, Ter, Qua, Qui ou Sex; `hora` é um horário como 10:30 (ou
+`horario`, o número do horário, de 1 a 17). Sem `dia` e `hora`, vale o
+momento atual.
+'''
+
+import argparse
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+import json
+import logging
+import os
+import pathlib
+import sys
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from colario import arq_manifesto, carrega_membros, carrega_tabelas_abreviacoes
+from conflitos import MapaOcupacao
+from grade import Grades, dias, horarios, indice
+from referencias import Referencias
+
+
+class ErroConsulta(Exception):
+    def __init__(self, status: HTTPStatus, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def minutos(hora_minuto: str) -> int:
+    hora, minuto = hora_minuto.split(':')
+    return int(hora) * 60 + int(minuto)
+
+
+intervalos_minutos = [(minutos(ini), minutos(fim)) for ini, fim in horarios]
+
+
+def horario_da_hora(hora_minuto: str) -> int:
+    '''
+    Número do horário (1 a 17) que contém a hora, ou None nos intervalos.
+    '''
+    agora = minutos(hora_minuto)
+    for num, (ini, fim) in enumerate(intervalos_minutos, start=1):
+        if ini <= agora < fim:
+            return num
+    return None
+
+
+class DadosCampus:
+    '''
+    Índices dos horários de um campus, montados uma vez por carga.
+    '''
+
+    def __init__(self, dir_raiz: pathlib.Path):
+        self.membros_categoria = carrega_membros(dir_raiz)
+        self.grades = Grades()
+        for categoria, membros in self.membros_categoria.items():
+            for slug, membro in membros.items():
+                self.grades.adicionar(categoria, slug, membro.texto_horario)
+        nomes = {
+            categoria: {slug: membro.nome for slug, membro in membros.items()}
+            for categoria, membros in self.membros_categoria.items()
+        }
+        self.referencias = Referencias(self.grades, nomes, carrega_tabelas_abreviacoes(dir_raiz))
+        self.ocupacao = MapaOcupacao(self.grades, self.referencias)
+
+    def membro(self, categoria: str, slug: str):
+        membro = self.membros_categoria.get(categoria, {}).get(slug)
+        if membro is None:
+            raise ErroConsulta(HTTPStatus.NOT_FOUND, f'{categoria} {slug} não encontrado')
+        return membro
+
+    def _ref(self, categoria: str, slug: str) -> dict:
+        membro = self.membros_categoria.get(categoria, {}).get(slug)
+        return {'categoria': categoria, 'slug': slug, 'nome': membro.nome if membro else slug}
+
+    def aula(self, categoria: str, slug: str, horario: int, dia: int) -> dict:
+        '''
+        A aula do membro na célula, pela própria grade ou, se ela estiver
+        vazia, pelas grades que o citam (a sala numa grade de turma).
+        '''
+        i = indice(horario, dia)
+        codigo = self.grades.grade(categoria, slug)[i]
+        citado_por = []
+        if not codigo:
+            for origem, por_slug in self.ocupacao.citacoes.get((categoria, slug), {}).items():
+                for s, bits in por_slug.items():
+                    if bits >> i & 1:
+                        citado_por.append(self._ref(origem, s))
+                        # O texto da aula é o da célula de quem cita
+                        codigo = codigo or self.grades.grade(origem, s)[i]
+            if not citado_por:
+                return None
+        return {
+            'dia': dias[dia],
+            'horario': horario,
+            'intervalo': ' - '.join(horarios[horario - 1]),
+            'texto': self.grades.celulas.texto(codigo),
+            'relacionados': citado_por or [self._ref(c, s) for c, s in self.referencias.da_celula(codigo)
+                                           if (c, s) != (categoria, slug)],
+        }
+
+    def grade_membro(self, categoria: str, slug: str) -> dict:
+        membro = self.membro(categoria, slug)
+        aulas = []
+        for dia in range(len(dias)):
+            for horario in range(1, len(horarios) + 1):
+                aula = self.aula(categoria, slug, horario, dia)
+                if aula:
+                    aulas.append(aula)
+        return {'categoria': categoria, 'slug': slug, 'nome': membro.nome, 'aulas': aulas}
+
+    def livres(self, categoria: str, horario: int, dia: int) -> list:
+        '''
+        Membros sem aula no horário; fora dos horários de aula, todos.
+        '''
+        if categoria not in self.membros_categoria:
+            raise ErroConsulta(HTTPStatus.NOT_FOUND, f'Categoria {categoria} não encontrada')
+        if horario is None or dia is None:
+            slugs = sorted(self.membros_categoria[categoria])
+        else:
+            slugs = self.ocupacao.livres(categoria, horario, dia)
+        return [self._ref(categoria, slug) for slug in slugs]
+
+
+class ServicoConsultas:
+    '''
+    Servidor HTTP/1.1 mínimo sobre asyncio, com conexões persistentes.
+    '''
+
+    def __init__(self, dir_raiz: pathlib.Path, tamanho_cache: int = 4096, intervalo_recarga: float = 2.0):
+        self.dir_raiz = pathlib.Path(dir_raiz)
+        self.tamanho_cache = tamanho_cache
+        self.intervalo_recarga = intervalo_recarga
+        self._cache = OrderedDict()
+        self._mtime_manifesto = self._mtime()
+        self.dados = DadosCampus(self.dir_raiz)
+        self.acertos = 0
+        self.falhas = 0
+
+    def _mtime(self) -> int:
+        try:
+            return (self.dir_raiz / arq_manifesto).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def vigiar_manifesto(self):
+        '''
+        Recarrega os dados quando o colario.py termina uma execução (o
+        manifesto é sempre o último arquivo gravado).
+        '''
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.intervalo_recarga)
+            mtime = self._mtime()
+            if mtime is None or mtime == self._mtime_manifesto:
+                continue
+            try:
+                dados = await loop.run_in_executor(None, DadosCampus, self.dir_raiz)
+            except Exception:
+                logging.exception('Falha ao recarregar os horários; mantidos os anteriores')
+                continue
+            self._mtime_manifesto = mtime
+            self.dados = dados
+            self._cache.clear()
+            logging.info('Horários recarregados.')
+
+    def _celula(self, consulta: dict) -> tuple:
+        '''
+        (horário, dia) pedidos na consulta ou os de agora.
+        '''
+        if 'dia' in consulta or 'hora' in consulta or 'horario' in consulta:
+            nome_dia = consulta.get('dia', [''])[0].capitalize()
+            if nome_dia not in dias:
+                raise ErroConsulta(HTTPStatus.BAD_REQUEST, f'Dia inválido: {nome_dia!r} (use {", ".join(dias)})')
+            try:
+                if 'horario' in consulta:
+                    horario = int(consulta['horario'][0])
+                    if not 1 <= horario <= len(horarios):
+                        raise ValueError
+                else:
+                    horario = horario_da_hora(consulta['hora'][0])
+            except (KeyError, ValueError):
+                raise ErroConsulta(HTTPStatus.BAD_REQUEST, 'Informe hora=HH:MM ou horario=1..17')
+            return horario, dias.index(nome_dia)
+        agora = datetime.now()
+        dia = agora.weekday()
+        if dia >= len(dias):
+            return None, None
+        return horario_da_hora(f'{agora.hour}:{agora.minute:02d}'), dia
+
+    def responder(self, caminho: str, consulta: dict) -> tuple:
+        '''
+        (status, corpo JSON) da consulta, do cache quando possível.
+        '''
+        partes = [unquote(p) for p in caminho.strip('/').split('/')]
+        recurso = partes[0] if partes else ''
+
+        if recurso in ('horario', 'agora', 'livres'):
+            horario, dia = self._celula(consulta if recurso != 'agora' else {})
+            chave = (recurso, *partes[1:], horario, dia)
+        else:
+            chave = tuple(partes)
+
+        corpo = self._cache.get(chave)
+        if corpo is not None:
+            self._cache.move_to_end(chave)
+            self.acertos += 1
+            return HTTPStatus.OK, corpo
+        self.falhas += 1
+
+        dados = self.dados
+        if recurso == 'membros' and len(partes) == 2:
+            if partes[1] not in dados.membros_categoria:
+                raise ErroConsulta(HTTPStatus.NOT_FOUND, f'Categoria {partes[1]} não encontrada')
+            resultado = [{'slug': m.slug, 'nome': m.nome} for _, m in sorted(dados.membros_categoria[partes[1]].items())]
+        elif recurso == 'membros' and len(partes) == 3:
+            resultado = dados.grade_membro(partes[1], partes[2])
+        elif recurso in ('horario', 'agora') and len(partes) == 3:
+            membro = dados.membro(partes[1], partes[2])
+            resultado = {'categoria': membro.categoria, 'slug': membro.slug, 'nome': membro.nome,
+                         'aula': dados.aula(partes[1], partes[2], horario, dia) if horario else None}
+        elif recurso == 'livres' and len(partes) == 2:
+            resultado = dados.livres(partes[1], horario, dia)
+        else:
+            raise ErroConsulta(HTTPStatus.NOT_FOUND, f'Consulta desconhecida: {caminho}')
+
+        corpo = json.dumps(resultado, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._cache[chave] = corpo
+        if len(self._cache) > self.tamanho_cache:
+            self._cache.popitem(last=False)
+        return HTTPStatus.OK, corpo
+
+    async def atender(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    break
+                manter = versao == 'HTTP/1.1'
+                while True:
+                    cabecalho = await leitor.readline()
+                    if cabecalho in (b'\r\n', b'\n', b''):
+                        break
+                    nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                    if nome.strip().lower() == 'connection':
+                        manter = valor.strip().lower() != 'close' if versao == 'HTTP/1.1' \
+                            else valor.strip().lower() == 'keep-alive'
+
+                if metodo not in ('GET', 'HEAD'):
+                    status, corpo = HTTPStatus.METHOD_NOT_ALLOWED, b'{"erro":"use GET"}'
+                else:
+                    url = urlsplit(alvo)
+                    try:
+                        status, corpo = self.responder(url.path, parse_qs(url.query))
+                    except ErroConsulta as erro:
+                        status = erro.status
+                        corpo = json.dumps({'erro': str(erro)}, ensure_ascii=False).encode('utf-8')
+                    except Exception:
+                        logging.exception(f'Falha ao responder {alvo}')
+                        status, corpo = HTTPStatus.INTERNAL_SERVER_ERROR, b'{"erro":"falha interna"}'
+
+                escritor.write(
+                    f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                    'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(corpo)}\r\n'
+                    'Access-Control-Allow-Origin: *\r\n'
+                    f'Connection: {"keep-alive" if manter else "close"}\r\n\r\n'.encode('latin-1'))
+                if metodo != 'HEAD':
+                    escritor.write(corpo)
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, endereco: str, porta: int):
+        servidor = await asyncio.start_server(self.atender, endereco, porta)
+        print(f'Consultas em http://{endereco}:{porta}/ (Ctrl+C para sair)', flush=True)
+        async with servidor:
+            await asyncio.gather(servidor.serve_forever(), self.vigiar_manifesto())
+
+
+def main(argv: list = None):
+    ana_args = argparse.ArgumentParser(prog='colario.py api', description='API de consulta aos horários')
+    ana_args.add_argument('dir_pdf', help='Diretório em que o colario.py gerou os horários do campus')
+    ana_args.add_argument('--endereco', default='127.0.0.1', help='Endereço em que o servidor escuta')
+    ana_args.add_argument('--porta', type=int, default=8020, help='Porta em que o servidor escuta')
+    ana_args.add_argument('--tamanho-cache', type=int, default=4096, help='Respostas guardadas no cache')
+    args = ana_args.parse_args(argv)
+
+    now = datetime.now()
+    fname = f"/tmp/colario_api_{now.strftime('%F_%T')}_{os.getpid()}.log"
+    print(f'Arquivo de log: {fname}')
+    logging.basicConfig(
+        filename=fname,
+        filemode='w',
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    servico = ServicoConsultas(pathlib.Path(args.dir_pdf).resolve(), args.tamanho_cache)
+    total = sum(len(membros) for membros in servico.dados.membros_categoria.values())
+    logging.info(f'{total} membros carregados de {args.dir_pdf}.')
+    try:
+        asyncio.run(servico.servir(args.endereco, args.porta))
+    except KeyboardInterrupt:
+        pass
+    logging.info(f'Cache: {servico.acertos} acertos, {servico.falhas} respostas montadas.')
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,321 @@
+'''
+Conversores de PDF usados pelo fatiador: separação das páginas e extração de
+texto, SVG e PNG.
+
+- ConversorCLI: ferramentas do poppler (pdfseparate, pdftotext, pdftoppm) e
+  pdf2svg, um processo por chamada;
+- ConversorMuPDF: PyMuPDF, dentro do próprio processo Python, abrindo o PDF
+  de cada categoria uma única vez por thread.
+'''
+
+import os
+import pathlib
+import threading
+import time
+
+from metricas import Metricas
+
+cmd_tmpl = {
+    'pdf2pdfs': 'pdfseparate {arq_pdf} {pag_pdf_padrao}',
+    'pdf2txt': 'pdftotext -layout {arq_pdf} {arq_alvo}.txt',
+    'pdf2svg': 'pdf2svg {arq_pdf} {arq_alvo}.svg',
+    'pdf2png': 'pdftoppm -png -singlefile -r {dpi} {arq_pdf} {arq_alvo}',
+    # Conversão em lote, direto do PDF da categoria
+    'pdf2txt-lote': 'pdftotext -layout -f {pag_ini} -l {pag_fim} {arq_pdf} {arq_alvo}.txt',
+    'pdf2svg-lote': 'pdf2svg {arq_pdf} {arq_alvo}-%d.svg all',
+    # Com uma página só, o pdf2svg usa o nome como está, sem trocar o %d
+    'pdf2svg-lote-pagina': 'pdf2svg {arq_pdf} {arq_alvo}-{pagina}.svg {pagina}',
+    'pdf2png-lote': 'pdftoppm -png -r {dpi} -f {pag_ini} -l {pag_fim} {arq_pdf} {arq_alvo}',
+}
+
+formatos_conversao = ('txt', 'png', 'svg')
+# Resolução padrão do pdftoppm
+dpi_padrao = 150
+# Sem imagens, que passam a ser geradas sob demanda pelo servidor_imagens.py
+formatos_sem_imagens = ('txt',)
+
+
+def comando(ext: str, arq_pdf, arq_alvo, dpi: int = dpi_padrao) -> list:
+    '''
+    Linha de comando que converte o PDF de uma página para o formato `ext`,
+    gravando em `arq_alvo` (sem a extensão).
+    '''
+    return cmd_tmpl[f'pdf2{ext}'].format(arq_pdf=arq_pdf, arq_alvo=arq_alvo, dpi=dpi).split()
+
+
+def faixas_paginas(paginas) -> list:
+    '''
+    Agrupa números de página em faixas contínuas [inicial, final].
+    '''
+    faixas = []
+    for pagina in sorted(paginas):
+        if faixas and faixas[-1][1] == pagina - 1:
+            faixas[-1][1] = pagina
+        else:
+            faixas.append([pagina, pagina])
+    return faixas
+
+
+class ConversorPDF:
+    '''
+    Interface dos conversores.
+
+    `nome_pagina` associa o número de cada página (a partir de 1) ao nome,
+    sem extensão, com que o arquivo da página é gravado no diretório
+    temporário. `executar` recebe uma lista de funções sem argumentos e as
+    executa, possivelmente em paralelo. `formatos` são os formatos gerados
+    para cada página, dentre os de `formatos_conversao`, e `dpi` é a
+    resolução dos PNG. `max_tarefas` (--jobs) limita as conversões
+    simultâneas dos conversores que não passam pelo `executar`.
+    '''
+
+    nome = None
+
+    def __init__(self, metricas: Metricas = None, formatos: tuple = formatos_conversao, dpi: int = dpi_padrao,
+                 max_tarefas: int = None):
+        self.metricas = metricas or Metricas()
+        self.formatos = tuple(formatos)
+        self.dpi = dpi
+        self.max_tarefas = max(1, max_tarefas or os.cpu_count())
+
+    def separar(self, arq_pdf: pathlib.Path, pag_pdf_padrao: pathlib.Path, reaproveitavel=None):
+        '''
+        Grava cada página de `arq_pdf` em `pag_pdf_padrao % número_da_página`.
+
+        `reaproveitavel(caminho_pagina)` diz se a página já tem artefatos da
+        execução anterior; conversores que já convertem as páginas durante a
+        separação podem pular essas.
+        '''
+        raise NotImplementedError
+
+    def converter_paginas(self, dir_temp: pathlib.Path, nome_pagina: dict, executar):
+        '''
+        Converte para os `formatos` os PDFs de página já separados em `dir_temp`.
+        '''
+        raise NotImplementedError
+
+    def converter_lote(self, arq_pdf: pathlib.Path, dir_temp: pathlib.Path,
+                       nome_pagina: dict, total_paginas: int, executar):
+        '''
+        Converte as páginas direto do PDF da categoria, gravando os resultados
+        em `dir_temp` com os mesmos nomes de `converter_paginas`.
+        '''
+        raise NotImplementedError
+
+
+class ConversorCLI(ConversorPDF):
+    '''
+    Conversor baseado nos programas de linha de comando.
+    '''
+
+    nome = 'cli'
+
+    def separar(self, arq_pdf, pag_pdf_padrao, reaproveitavel=None):
+        cmd = cmd_tmpl['pdf2pdfs'].format(arq_pdf=arq_pdf, pag_pdf_padrao=pag_pdf_padrao)
+        self.metricas.executar(cmd.split())
+
+    def converter_paginas(self, dir_temp, nome_pagina, executar):
+        tarefas = []
+        for nome_arq in nome_pagina.values():
+            for ext in self.formatos:
+                cmd = comando(ext, dir_temp/f'{nome_arq}.pdf', dir_temp/nome_arq, self.dpi)
+                alvo = dir_temp/f'{nome_arq}.{ext}'
+                tarefas.append(lambda cmd=cmd, alvo=alvo: self.metricas.executar(cmd, alvo))
+
+        executar(tarefas)
+
+    def converter_lote(self, arq_pdf, dir_temp, nome_pagina, total_paginas, executar):
+        if not nome_pagina:
+            return
+
+        faixas = faixas_paginas(nome_pagina)
+        dir_lote = dir_temp / 'lote'
+        dir_lote.mkdir()
+        cmds = []
+        for pag_ini, pag_fim in faixas:
+            for ext in ('txt', 'png'):
+                if ext not in self.formatos:
+                    continue
+                cmd = cmd_tmpl[f'pdf2{ext}-lote'].format(arq_pdf=arq_pdf, pag_ini=pag_ini, pag_fim=pag_fim,
+                                                         arq_alvo=dir_lote/f'{ext}-{pag_ini}', dpi=self.dpi)
+                cmds.append(cmd.split())
+
+        # O pdf2svg não aceita faixas: ou todas as páginas, ou uma só, cada
+        # uma com o seu nome
+        if 'svg' in self.formatos:
+            if len(nome_pagina) == total_paginas:
+                cmds.append(cmd_tmpl['pdf2svg-lote'].format(arq_pdf=arq_pdf, arq_alvo=dir_lote/'svg').split())
+            else:
+                for pagina in sorted(nome_pagina):
+                    cmd = cmd_tmpl['pdf2svg-lote-pagina'].format(arq_pdf=arq_pdf, pagina=pagina,
+                                                                 arq_alvo=dir_lote/'svg')
+                    cmds.append(cmd.split())
+
+        executar([lambda cmd=cmd: self.metricas.executar(cmd) for cmd in cmds])
+
+        for pag_ini, pag_fim in faixas:
+            with open(dir_lote/f'txt-{pag_ini}.txt', mode='r', encoding='utf-8') as arq_txt:
+                textos = arq_txt.read().split('\f')
+            for pagina, texto in zip(range(pag_ini, pag_fim+1), textos):
+                with open(dir_temp/f'{nome_pagina[pagina]}.txt', mode='w', encoding='utf-8') as arq_pagina:
+                    arq_pagina.write(f'{texto}\f')
+
+        for ext in ('png', 'svg'):
+            if ext not in self.formatos:
+                continue
+            for cam_arq in dir_lote.glob(f'{ext}-*.{ext}'):
+                pagina = int(cam_arq.stem.rsplit('-', 1)[1])
+                if pagina in nome_pagina:
+                    os.replace(cam_arq, dir_temp/f'{nome_pagina[pagina]}.{ext}')
+
+
+class ConversorMuPDF(ConversorPDF):
+    '''
+    Conversor que usa o PyMuPDF (pacote opcional `pymupdf`) dentro do processo.
+
+    Cada thread de conversão abre o PDF da categoria uma vez e converte dele
+    as suas páginas, sem abrir os PDFs de página. O PyMuPDF não pode ser
+    chamado por várias threads ao mesmo tempo, então só as chamadas a ele
+    passam por uma trava comum a todas as categorias; o layout do texto, a
+    gravação dos arquivos e as métricas ficam de fora.
+    '''
+
+    nome = 'mupdf'
+
+    _trava = threading.Lock()
+
+    def __init__(self, metricas: Metricas = None, formatos: tuple = formatos_conversao, dpi: int = dpi_padrao,
+                 max_tarefas: int = None):
+        super().__init__(metricas, formatos, dpi, max_tarefas)
+        try:
+            import pymupdf
+        except ImportError:
+            raise SystemExit('O conversor mupdf precisa do pacote pymupdf (pip install pymupdf).')
+        self._pymupdf = pymupdf
+        # Diretório temporário -> PDF da categoria separado nele
+        self._origens = {}
+
+    def separar(self, arq_pdf, pag_pdf_padrao, reaproveitavel=None):
+        self._origens[pathlib.Path(pag_pdf_padrao).parent] = arq_pdf
+        with self._trava:
+            doc = self._pymupdf.open(arq_pdf)
+        try:
+            for i in range(doc.page_count):
+                with self._trava, self._pymupdf.open() as pagina:
+                    pagina.insert_pdf(doc, from_page=i, to_page=i)
+                    # Sem /ID novo, para que o hash da página não mude entre execuções
+                    pagina.save(str(pag_pdf_padrao) % (i+1), garbage=3, no_new_id=True)
+        finally:
+            with self._trava:
+                doc.close()
+
+    def converter_paginas(self, dir_temp, nome_pagina, executar):
+        arq_pdf = self._origens.pop(dir_temp, None)
+        if arq_pdf is None:
+            # Separado por outro conversor: só há os PDFs de página
+            self._converter_de(lambda pagina: dir_temp/f'{nome_pagina[pagina]}.pdf', lambda pagina: 0,
+                               dir_temp, nome_pagina, executar)
+        else:
+            self._converter_de(lambda pagina: arq_pdf, lambda pagina: pagina - 1, dir_temp, nome_pagina, executar)
+
+    def converter_lote(self, arq_pdf, dir_temp, nome_pagina, total_paginas, executar):
+        self._origens.pop(dir_temp, None)
+        self._converter_de(lambda pagina: arq_pdf, lambda pagina: pagina - 1, dir_temp, nome_pagina, executar)
+
+    def _converter_de(self, arquivo, indice, dir_temp: pathlib.Path, nome_pagina: dict, executar):
+        '''
+        Converte as páginas de `nome_pagina`, a página `indice(pagina)` do PDF
+        `arquivo(pagina)`. Cada thread mantém abertos os documentos que já
+        usou até o fim da conversão.
+        '''
+        local = threading.local()
+        abertos = []
+
+        def documento(caminho):
+            docs = local.__dict__.setdefault('docs', {})
+            if caminho not in docs:
+                with self._trava:
+                    docs[caminho] = self._pymupdf.open(caminho)
+                abertos.append(docs[caminho])
+            return docs[caminho]
+
+        def converter(pagina):
+            self._converter(documento(arquivo(pagina)), indice(pagina), pagina, dir_temp/nome_pagina[pagina])
+
+        try:
+            executar([lambda pagina=pagina: converter(pagina) for pagina in sorted(nome_pagina)])
+        finally:
+            with self._trava:
+                for doc in abertos:
+                    doc.close()
+
+    def _converter(self, doc, indice: int, pagina: int, arq_alvo: pathlib.Path):
+        with self._trava:
+            pag_doc = doc.load_page(indice)
+        for ext in self.formatos:
+            alvo = f'{arq_alvo}.{ext}'
+            inicio = time.perf_counter()
+            if ext == 'txt':
+                with self._trava:
+                    palavras = pag_doc.get_text('words', sort=True)
+                pathlib.Path(alvo).write_text(texto_layout(palavras), encoding='utf-8')
+            elif ext == 'svg':
+                with self._trava:
+                    svg = pag_doc.get_svg_image()
+                pathlib.Path(alvo).write_text(svg, encoding='utf-8')
+            elif ext == 'png':
+                with self._trava:
+                    png = pag_doc.get_pixmap(dpi=self.dpi).tobytes('png')
+                pathlib.Path(alvo).write_bytes(png)
+            self.metricas.registrar(f'mupdf {ext} página {pagina}', time.perf_counter() - inicio, alvo=alvo)
+
+
+def texto_layout(palavras: list) -> str:
+    '''
+    Texto de uma página a partir das suas palavras no PyMuPDF
+    (`get_text('words')`), posicionadas em colunas de caracteres, como na
+    saída do `pdftotext -layout`.
+    '''
+    if not palavras:
+        return '\f'
+
+    # Largura média de um caractere, para converter coordenadas em colunas
+    # contadas a partir da palavra mais à esquerda
+    largura = sum(p[2]-p[0] for p in palavras) / max(1, sum(len(p[4]) for p in palavras))
+    margem = min(p[0] for p in palavras)
+
+    linhas = []
+    base_atual = None
+    for x0, y0, x1, y1, palavra, *_ in sorted(palavras, key=lambda p: (round(p[3]), p[0])):
+        if base_atual is None or abs(y1 - base_atual) > (y1-y0)/2:
+            linhas.append([])
+            base_atual = y1
+        linhas[-1].append((x0, palavra))
+
+    texto = []
+    for linha in linhas:
+        atual = ''
+        for x0, palavra in sorted(linha):
+            coluna = int((x0 - margem) / largura)
+            if atual:
+                atual += ' ' * max(1, coluna - len(atual))
+            else:
+                atual = ' ' * coluna
+            atual += palavra
+        texto.append(atual.rstrip())
+
+    return '\n'.join(texto) + '\n\f'
+
+
+def conversor_assincrono(metricas: Metricas = None, formatos: tuple = formatos_conversao, dpi: int = dpi_padrao,
+                         max_tarefas: int = None):
+    # Importado só quando usado: o concolario.py precisa do Python 3.11
+    from concolario import ConversorAssincrono
+    return ConversorAssincrono(metricas, max_tarefas, formatos=formatos, dpi=dpi)
+
+
+conversores = {
+    ConversorCLI.nome: ConversorCLI,
+    ConversorMuPDF.nome: ConversorMuPDF,
+    'assincrono': conversor_assincrono,
+}
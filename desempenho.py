@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Medição de desempenho do colario.py e do concolario.py com PDFs sintéticos.
+
+Gera professor.pdf, sala.pdf e turma.pdf com o leiaute dos horários (título,
+cabeçalho dos dias e 17 linhas de horário) e processa o campus uma vez por
+caminho, medindo em segundos as mesmas etapas em todos: split, txt, svg,
+png, md, index e total (ver resultados_fixos). O resultado vai para um
+arquivo JSON, para comparar execuções em commits diferentes.
+
+Exemplo:
+
+    ./desempenho.py --paginas 200 --saida desempenho-200.json
+'''
+
+import argparse
+from datetime import datetime
+import json
+import os
+import pathlib
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+
+from grade import dias, horarios
+
+# Células de até 22 caracteres (disciplina e turma), com ao menos dois espaços
+# até a célula seguinte
+largura_celula = 24
+
+
+def escapar_pdf(texto: str) -> str:
+    return texto.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def escrever_pdf(caminho: pathlib.Path, paginas: list):
+    '''
+    Grava um PDF mínimo, em A4 paisagem e fonte Courier, com uma página por
+    lista de linhas de texto.
+    '''
+    objetos = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    refs_paginas = []
+    for linhas in paginas:
+        texto = ' T* '.join(f'({escapar_pdf(linha)}) Tj' for linha in linhas)
+        fluxo = f'BT /F1 7 Tf 10 TL 20 570 Td {texto} ET'.encode('cp1252')
+        objetos.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(fluxo), fluxo))
+        objetos.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 842 595] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % len(objetos))
+        refs_paginas.append(f'{len(objetos)} 0 R')
+    objetos[1] = f'<< /Type /Pages /Kids [{" ".join(refs_paginas)}] /Count {len(paginas)} >>'.encode()
+
+    with open(caminho, mode='wb') as arq:
+        arq.write(b'%PDF-1.4\n')
+        posicoes = []
+        for num, corpo in enumerate(objetos, start=1):
+            posicoes.append(arq.tell())
+            arq.write(b'%d 0 obj\n%s\nendobj\n' % (num, corpo))
+        inicio_xref = arq.tell()
+        arq.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objetos) + 1))
+        for posicao in posicoes:
+            arq.write(b'%010d 00000 n \n' % posicao)
+        arq.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objetos) + 1, inicio_xref))
+
+
+def pagina_horario(titulo: str, celulas: dict) -> list:
+    '''
+    Linhas de uma página de horário. `celulas` é {(horario, dia): texto}.
+    '''
+    linhas = [titulo, '', 'Horário'.ljust(16) + ''.join(d.ljust(largura_celula) for d in dias)]
+    for horario, (ini, fim) in enumerate(horarios, start=1):
+        linha = f'{ini} - {fim}'.ljust(16)
+        linha += ''.join(celulas.get((horario, dia), '').ljust(largura_celula) for dia in range(len(dias)))
+        linhas.append(linha.rstrip())
+    return linhas
+
+
+def gerar_pdfs_sinteticos(dir_dest: pathlib.Path, paginas: int, semente: int = 0):
+    '''
+    Gera os três PDFs de categoria, com cerca de `paginas` páginas cada, a
+    partir de um mesmo conjunto de aulas (turma, horário) -> (professor, sala).
+    '''
+    aleatorio = random.Random(semente)
+    professores = [f'Professor Sintetico {i:04d}' for i in range(paginas)]
+    salas = [f'SALA{i:04d}' for i in range(paginas)]
+    turmas = [f'TUR_SINT_{i:04d}' for i in range(paginas)]
+
+    grades = {'professor': {}, 'sala': {}, 'turma': {}}
+    for turma in turmas:
+        for horario in range(1, len(horarios) + 1):
+            for dia in range(len(dias)):
+                if aleatorio.random() < 0.4:
+                    continue
+                professor = aleatorio.choice(professores)
+                sala = aleatorio.choice(salas)
+                disciplina = f'DSC.{aleatorio.randint(1, 9999):04d}'
+                grades['turma'].setdefault(turma, {})[(horario, dia)] = f'{disciplina} {sala}'
+                grades['professor'].setdefault(professor, {})[(horario, dia)] = f'{disciplina} {sala}'
+                grades['sala'].setdefault(sala, {})[(horario, dia)] = f'{disciplina} {turma}'
+
+    titulos = {'professor': professores, 'sala': salas, 'turma': turmas}
+    for categoria, nomes in titulos.items():
+        # O título da página de professor já começa com "Professor "
+        paginas_pdf = [pagina_horario(nome, grades[categoria].get(nome, {})) for nome in nomes]
+        escrever_pdf(dir_dest / f'{categoria}.pdf', paginas_pdf)
+
+
+# Chaves de todos os caminhos, na ordem do relatório
+etapas_medidas = ('split', 'txt', 'svg', 'png', 'md', 'index', 'total')
+# Programa -> etapa em que o seu tempo é somado
+etapa_programa = {'pdfseparate': 'split', 'pdftotext': 'txt', 'pdf2svg': 'svg', 'pdftoppm': 'png'}
+
+
+def resultados_fixos(metricas) -> dict:
+    '''
+    As `etapas_medidas` a partir das métricas de uma execução, iguais para
+    todos os caminhos. split, txt, svg e png somam a duração dos comandos de
+    cada programa, que não depende de quantos rodam ao mesmo tempo; md soma
+    as etapas md das categorias; index e total são o tempo de parede da
+    busca e do processamento inteiro. O que não rodou vale 0.
+    '''
+    resultados = dict.fromkeys(etapas_medidas, 0.0)
+    for comando in metricas.comandos:
+        etapa = etapa_programa.get(os.path.basename(comando['comando'].split()[0]))
+        if etapa is not None:
+            resultados[etapa] += comando['duracao']
+    for etapa in metricas.etapas:
+        nome = {'busca': 'index'}.get(etapa['etapa'], etapa['etapa'])
+        if nome in ('md', 'index', 'total'):
+            resultados[nome] += etapa['parede']
+    resultados = {etapa: round(duracao, 4) for etapa, duracao in resultados.items()}
+    for etapa, duracao in resultados.items():
+        print(f'  {etapa:<8} {duracao:9.3f} s')
+    return resultados
+
+
+def medir_colario(dir_pdf: pathlib.Path) -> dict:
+    '''
+    Caminho serial do colario.py: o ConversorCLI sem executor, com uma
+    chamada de programa por página e formato, uma de cada vez em cada
+    categoria, seguida de Markdown e índice de busca.
+    '''
+    from colario import processar_campus
+    from conversor import ConversorCLI
+    from metricas import Metricas
+
+    os.chdir(dir_pdf)
+    metricas = Metricas()
+    processar_campus('desempenho', dir_pdf, conversor=ConversorCLI(metricas), completo=True, metricas=metricas)
+    return resultados_fixos(metricas)
+
+
+def medir_concolario(dir_pdf: pathlib.Path) -> dict:
+    '''
+    Caminho do concolario.py, em que cada página passa da separação para as
+    conversões assim que é gravada.
+    '''
+    from colario import processar_campus
+    from concolario import ConversorAssincrono
+    from metricas import Metricas
+
+    os.chdir(dir_pdf)
+    metricas = Metricas()
+    processar_campus('desempenho', dir_pdf, conversor=ConversorAssincrono(metricas),
+                     completo=True, metricas=metricas)
+    return resultados_fixos(metricas)
+
+
+def versao_git() -> str:
+    dir_repo = pathlib.Path(__file__).parent
+    processo = subprocess.run(['git', '-C', str(dir_repo), 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True)
+    return processo.stdout.strip() or None
+
+
+def main():
+    ana_args = argparse.ArgumentParser(description='Mede o tempo de cada etapa com PDFs sintéticos')
+    ana_args.add_argument('--paginas', type=int, default=100,
+                          help='Páginas por categoria (de 10 a 2000)')
+    ana_args.add_argument('--semente', type=int, default=0, help='Semente dos horários sintéticos')
+    ana_args.add_argument('--saida', default='desempenho.json', help='Arquivo JSON com os resultados')
+    ana_args.add_argument('--caminhos', default='colario,concolario',
+                          help='Caminhos medidos, separados por vírgula')
+    ana_args.add_argument('--manter', metavar='DIR',
+                          help='Gera os arquivos em DIR e não os apaga ao final')
+    args = ana_args.parse_args()
+
+    if not 10 <= args.paginas <= 2000:
+        ana_args.error('--paginas deve estar entre 10 e 2000')
+
+    saida = pathlib.Path(args.saida).absolute()
+    sys.path.insert(0, str(pathlib.Path(__file__).parent))
+    medidores = {'colario': medir_colario, 'concolario': medir_concolario}
+
+    relatorio = {
+        'commit': versao_git(),
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'paginas': args.paginas,
+        'semente': args.semente,
+        'resultados': {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix='desempenho-') as temp_dir:
+        dir_base = pathlib.Path(args.manter or temp_dir)
+        for caminho in args.caminhos.split(','):
+            dir_pdf = dir_base / caminho
+            dir_pdf.mkdir(parents=True, exist_ok=True)
+            gerar_pdfs_sinteticos(dir_pdf, args.paginas, args.semente)
+            print(f'{caminho} ({args.paginas} páginas por categoria):')
+            relatorio['resultados'][caminho] = medidores[caminho](dir_pdf)
+            os.chdir(dir_base)
+
+    with saida.open(mode='w', encoding='utf-8') as arq_saida:
+        json.dump(relatorio, arq_saida, ensure_ascii=False, indent=1)
+    print(f'Resultados gravados em {saida}')
+
+
+if __name__ == '__main__':
+    main()
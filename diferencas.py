@@ -0,0 +1,259 @@
+'''
+Diferenças entre dois envios de horários de um campus (`colario.py diff`).
+
+Cada envio é fatiado com o FatiadorPDF, só em texto. O envio atual
+reaproveita as páginas do anterior pelo hash, como nas execuções
+incrementais, e só as páginas alteradas são convertidas. Membros com a
+mesma página nos dois envios são dados como iguais sem olhar as grades; os
+demais são comparados célula a célula.
+
+Um envio é um diretório com professor.pdf, sala.pdf e turma.pdf ou o
+prefixo dos arquivos enviados, como envios/20250210083000 para
+envios/20250210083000_<categoria>.pdf.
+'''
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import logging
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+
+from arquivos import escrever_se_mudou
+from grade import analisar_grade, dias, horarios, total_celulas
+
+categorias = ('professor', 'sala', 'turma')
+
+
+def arquivos_envio(envio: pathlib.Path) -> dict:
+    '''
+    {categoria: PDF} de um envio, dado como diretório ou como prefixo.
+    '''
+    envio = pathlib.Path(envio)
+    if envio.is_dir():
+        pdfs = {categoria: envio / f'{categoria}.pdf' for categoria in categorias}
+    else:
+        pdfs = {categoria: envio.with_name(f'{envio.name}_{categoria}.pdf') for categoria in categorias}
+    faltando = [str(pdf) for pdf in pdfs.values() if not pdf.is_file()]
+    if faltando:
+        raise FileNotFoundError(f'Envio {envio} incompleto: falta {", ".join(faltando)}')
+    return pdfs
+
+
+def fatiar_envio(envio: pathlib.Path, dir_trabalho: pathlib.Path, campus: str, conversoes: ThreadPoolExecutor,
+                 anterior: dict = None, dir_anterior: pathlib.Path = None) -> dict:
+    '''
+    Fatia o envio em `dir_trabalho`, só em texto. Com o resultado de um
+    envio `anterior` (fatiado em `dir_anterior`), as páginas iguais às dele
+    não são convertidas de novo. Retorna {categoria: FatiadorPDF}.
+    '''
+    from colario import FatiadorPDF
+    from conversor import ConversorCLI, formatos_sem_imagens
+
+    dir_trabalho.mkdir(parents=True, exist_ok=True)
+    for categoria, pdf in arquivos_envio(envio).items():
+        (dir_trabalho / f'{categoria}.pdf').symlink_to(pdf.resolve())
+    if dir_anterior is not None:
+        for ext in ('pdf', 'txt'):
+            if (dir_anterior / ext).exists():
+                shutil.copytree(dir_anterior / ext, dir_trabalho / ext)
+
+    conversor = ConversorCLI(formatos=formatos_sem_imagens)
+    return {
+        categoria: FatiadorPDF(categoria, conversoes, anterior[categoria].paginas if anterior else None,
+                               conversor=conversor, dir_raiz=dir_trabalho, campus=campus)
+        for categoria in categorias
+    }
+
+
+def _posicao(i: int) -> dict:
+    horario, dia = divmod(i, len(dias))
+    return {'dia': dias[dia], 'horario': horario + 1, 'intervalo': ' - '.join(horarios[horario])}
+
+
+def comparar_grades(antes: list, depois: list) -> list:
+    '''
+    Mudanças entre duas grades (listas de 85 textos de célula): aulas
+    trocadas entre dois horários, movidas para um horário que estava livre,
+    incluídas, removidas e alteradas no mesmo horário.
+    '''
+    diferentes = [i for i in range(total_celulas) if antes[i] != depois[i]]
+    usadas = set()
+    mudancas = []
+
+    # Trocas: duas células com os textos invertidos
+    por_par = {}
+    for i in diferentes:
+        if antes[i] and depois[i]:
+            por_par.setdefault((antes[i], depois[i]), []).append(i)
+    for i in diferentes:
+        if i in usadas or not (antes[i] and depois[i]):
+            continue
+        for j in por_par.get((depois[i], antes[i]), []):
+            if j != i and j not in usadas:
+                usadas.update((i, j))
+                mudancas.append({'tipo': 'troca', 'de': _posicao(i), 'para': _posicao(j),
+                                 'antes': antes[i], 'depois': depois[i]})
+                break
+
+    # Movidas: o texto saiu de uma célula e apareceu numa que estava vazia
+    saidas = {}
+    for i in diferentes:
+        if i not in usadas and antes[i] and not depois[i]:
+            saidas.setdefault(antes[i], []).append(i)
+    for j in diferentes:
+        if j in usadas or antes[j] or not depois[j]:
+            continue
+        origens = saidas.get(depois[j])
+        if origens:
+            i = origens.pop(0)
+            usadas.update((i, j))
+            mudancas.append({'tipo': 'movida', 'de': _posicao(i), 'para': _posicao(j),
+                             'antes': antes[i], 'depois': depois[j]})
+
+    for i in diferentes:
+        if i in usadas:
+            continue
+        tipo = 'incluida' if not antes[i] else 'removida' if not depois[i] else 'alterada'
+        mudancas.append({'tipo': tipo, 'de': _posicao(i), 'para': _posicao(i),
+                         'antes': antes[i], 'depois': depois[i]})
+
+    ordem = {'troca': 0, 'movida': 1, 'alterada': 2, 'incluida': 3, 'removida': 4}
+    mudancas.sort(key=lambda m: (ordem[m['tipo']], dias.index(m['de']['dia']), m['de']['horario']))
+    return mudancas
+
+
+def comparar_envios(anterior: dict, atual: dict) -> dict:
+    '''
+    Diferenças entre dois envios fatiados ({categoria: FatiadorPDF}).
+    '''
+    resultado = {}
+    for categoria in categorias:
+        membros_antes = anterior[categoria].membros
+        membros_depois = atual[categoria].membros
+        hash_antes = {slug: h for h, slug in anterior[categoria].paginas.items()}
+        hash_depois = {slug: h for h, slug in atual[categoria].paginas.items()}
+
+        alterados = {}
+        inalterados = 0
+        for slug in sorted(membros_antes.keys() & membros_depois.keys()):
+            # A mesma página nos dois envios: nada a comparar
+            if hash_antes.get(slug) == hash_depois.get(slug):
+                inalterados += 1
+                continue
+            mudancas = comparar_grades(analisar_grade(membros_antes[slug].texto_horario),
+                                       analisar_grade(membros_depois[slug].texto_horario))
+            if mudancas:
+                alterados[slug] = {'nome': membros_depois[slug].nome, 'mudancas': mudancas}
+            else:
+                inalterados += 1
+
+        resultado[categoria] = {
+            'incluidos': [{'slug': slug, 'nome': membros_depois[slug].nome}
+                          for slug in sorted(membros_depois.keys() - membros_antes.keys())],
+            'removidos': [{'slug': slug, 'nome': membros_antes[slug].nome}
+                          for slug in sorted(membros_antes.keys() - membros_depois.keys())],
+            'alterados': alterados,
+            'inalterados': inalterados,
+        }
+    return resultado
+
+
+def _horario(posicao: dict) -> str:
+    return f"{posicao['dia']} {posicao['intervalo']}"
+
+
+def _descrever(mudanca: dict) -> str:
+    tipo = mudanca['tipo']
+    de, para = _horario(mudanca['de']), _horario(mudanca['para'])
+    if tipo == 'troca':
+        return f"{de} ⇄ {para}: `{mudanca['antes']}` e `{mudanca['depois']}` trocaram de horário"
+    if tipo == 'movida':
+        return f"`{mudanca['antes']}` movida de {de} para {para}"
+    if tipo == 'incluida':
+        return f"{de}: incluída `{mudanca['depois']}`"
+    if tipo == 'removida':
+        return f"{de}: removida `{mudanca['antes']}`"
+    return f"{de}: `{mudanca['antes']}` → `{mudanca['depois']}`"
+
+
+def gerar_md(diferencas: dict, anterior: str, atual: str) -> str:
+    from colario import plural_categoria
+
+    md = f'''\
+(mudancas)=
+
+# Mudanças nos horários
+
+Comparação entre `{anterior}` e `{atual}`.
+
+'''
+    for categoria in categorias:
+        dif = diferencas[categoria]
+        md += f'## {plural_categoria[categoria].capitalize()}\n\n'
+        if not (dif['incluidos'] or dif['removidos'] or dif['alterados']):
+            md += 'Sem mudanças.\n\n'
+            continue
+        if dif['incluidos']:
+            md += '### Incluídos\n\n' + ''.join(f"- {m['nome']}\n" for m in dif['incluidos']) + '\n'
+        if dif['removidos']:
+            md += '### Removidos\n\n' + ''.join(f"- {m['nome']}\n" for m in dif['removidos']) + '\n'
+        for slug, alterado in dif['alterados'].items():
+            md += f"### {alterado['nome']}\n\n"
+            md += ''.join(f'- {_descrever(mudanca)}\n' for mudanca in alterado['mudancas']) + '\n'
+    return md
+
+
+def main(argv: list = None):
+    ana_args = argparse.ArgumentParser(prog='colario.py diff',
+                                       description='Mostra o que mudou entre dois envios de horários')
+    ana_args.add_argument('campus', help='Nome do campus')
+    ana_args.add_argument('anterior', help='Envio anterior: diretório com os PDFs ou prefixo <dir>/<carimbo>')
+    ana_args.add_argument('atual', help='Envio atual: diretório com os PDFs ou prefixo <dir>/<carimbo>')
+    ana_args.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                          help='Número de conversões de páginas executadas em paralelo')
+    ana_args.add_argument('--json', default='mudancas.json', help='Arquivo JSON com as mudanças')
+    ana_args.add_argument('--md', default='mudancas.md', help='Página Markdown com as mudanças')
+    args = ana_args.parse_args(argv)
+
+    now = datetime.now()
+    fname = f"/tmp/colario_diff_{now.strftime('%F_%T')}_{os.getpid()}.log"
+    print(f'Arquivo de log: {fname}')
+    logging.basicConfig(
+        filename=fname,
+        filemode='w',
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        level=logging.DEBUG
+    )
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='colario-diff-') as temp_dir, \
+             ThreadPoolExecutor(max_workers=max(1, args.jobs)) as conversoes:
+            dir_anterior = pathlib.Path(temp_dir) / 'anterior'
+            anterior = fatiar_envio(pathlib.Path(args.anterior), dir_anterior, args.campus, conversoes)
+            atual = fatiar_envio(pathlib.Path(args.atual), pathlib.Path(temp_dir) / 'atual', args.campus,
+                                 conversoes, anterior, dir_anterior)
+            diferencas = comparar_envios(anterior, atual)
+    except FileNotFoundError as erro:
+        print(erro, file=sys.stderr)
+        sys.exit(1)
+
+    with open(args.json, mode='w', encoding='utf-8') as arq_json:
+        json.dump({'campus': args.campus, 'anterior': args.anterior, 'atual': args.atual,
+                   'categorias': diferencas}, arq_json, ensure_ascii=False, indent=1)
+    escrever_se_mudou(pathlib.Path(args.md), gerar_md(diferencas, args.anterior, args.atual))
+
+    for categoria in categorias:
+        dif = diferencas[categoria]
+        print(f"{categoria}: {len(dif['incluidos'])} incluídos, {len(dif['removidos'])} removidos, "
+              f"{len(dif['alterados'])} alterados, {dif['inalterados']} sem mudanças.")
+    print(f'Mudanças: {args.json}, {args.md}')
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+'''
+Emissor de HTML nativo: gera o site direto dos membros das categorias, sem
+Sphinx, com a mesma estrutura de páginas e a aparência do tema Read the Docs
+usado pelo modelo.
+
+Os modelos abaixo são compilados uma única vez, na importação; cada página é
+só uma substituição de texto. As páginas ficam em `md/_build/html`, o mesmo
+lugar do `make html`, e só são regravadas quando mudam.
+
+Arquivos gerados:
+
+- index.html: lista das categorias;
+- <categoria>/index.html: lista dos membros da categoria;
+- <categoria>/<slug>.html: figura do horário e links para baixar;
+- busca.html: resultados de `buscarHorarios` (ver busca.py);
+- _static: imagens e índice de busca de `md/_static` e os arquivos do tema
+  (sphinx_rtd_theme, se estiver instalado).
+'''
+
+from html import escape
+import importlib.util
+import logging
+import pathlib
+import shutil
+from string import Template
+
+from arquivos import copiar_se_mudou, escrever_se_mudou
+from colario import formatos_download, plural_categoria, url_download
+
+categorias = ('professor', 'sala', 'turma')
+
+modelo_pagina = Template('''\
+<!DOCTYPE html>
+<html class="writer-html5" lang="pt-BR">
+<head>
+  <meta charset="utf-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+  <title>$titulo &mdash; $projeto</title>
+  <link rel="stylesheet" type="text/css" href="${raiz}_static/css/theme.css" />
+  <script src="${raiz}_static/busca/busca.js"></script>
+</head>
+
+<body class="wy-body-for-nav">
+  <div class="wy-grid-for-nav">
+    <nav data-toggle="wy-nav-shift" class="wy-nav-side">
+      <div class="wy-side-scroll">
+        <div class="wy-side-nav-search">
+          <a href="${raiz}index.html" class="icon icon-home">$projeto</a>
+          <div role="search">
+            <form id="rtd-search-form" class="wy-form" action="${raiz}busca.html" method="get">
+              <input type="text" name="q" placeholder="Buscar horários" aria-label="Buscar horários" />
+            </form>
+          </div>
+        </div>
+        <div class="wy-menu wy-menu-vertical" role="navigation" aria-label="Menu de navegação">
+          <ul$classe_menu>
+$menu
+          </ul>
+        </div>
+      </div>
+    </nav>
+
+    <section data-toggle="wy-nav-shift" class="wy-nav-content-wrap">
+      <nav class="wy-nav-top" aria-label="Menu de navegação móvel">
+        <i data-toggle="wy-nav-top" class="fa fa-bars"></i>
+        <a href="${raiz}index.html">$projeto</a>
+      </nav>
+      <div class="wy-nav-content">
+        <div class="rst-content">
+          <div role="navigation" aria-label="Navegação da página">
+            <ul class="wy-breadcrumbs">
+              <li><a href="${raiz}index.html" class="icon icon-home" aria-label="Início"></a></li>
+$trilha
+            </ul>
+            <hr/>
+          </div>
+          <div role="main" class="document">
+            <div itemprop="articleBody">
+$conteudo
+            </div>
+          </div>
+          <footer>
+$rodape
+            <hr/>
+          </footer>
+        </div>
+      </div>
+    </section>
+  </div>
+  <script>
+    document.querySelector('[data-toggle="wy-nav-top"]').addEventListener('click', () =>
+      document.querySelectorAll('[data-toggle="wy-nav-shift"]').forEach(e => e.classList.toggle('shift')));
+  </script>
+</body>
+</html>
+''')
+
+modelo_figura = Template('''\
+<figure class="align-center" id="fig-$categoria-$slug">
+<a class="reference internal image-reference" href="$img"><img alt="Horário de $rotulo $nome" src="$img" style="width: 100%;" /></a>
+</figure>
+''')
+
+modelo_membro = Template('''\
+<section id="$slug">
+<h1>$nome</h1>
+$figura$relacionados$siglas<section id="baixar">
+<h2>Baixar</h2>
+<ul class="simple">
+$links
+</ul>
+</section>
+</section>''')
+
+modelo_relacionados = Template('''\
+<section id="relacionados">
+<h2>Relacionados</h2>
+<ul class="simple">
+$itens
+</ul>
+</section>
+''')
+
+modelo_siglas = Template('''\
+<section id="abreviacoes">
+<h2>Abreviações</h2>
+<ul class="simple">
+$itens
+</ul>
+</section>
+''')
+
+modelo_lista = Template('''\
+<section id="$id_secao">
+<h1>$titulo</h1>
+<div class="toctree-wrapper compound">
+<ul>
+$itens
+</ul>
+</div>
+</section>''')
+
+modelo_busca = Template('''\
+<section id="busca">
+<h1>Busca</h1>
+<ul id="resultados-busca"></ul>
+<script>
+  (async () => {
+    const consulta = new URLSearchParams(location.search).get('q') || '';
+    document.querySelector('#rtd-search-form input').value = consulta;
+    const lista = document.getElementById('resultados-busca');
+    const resultados = await buscarHorarios(consulta);
+    lista.innerHTML = resultados.length ? '' : '<li>Nenhum horário encontrado.</li>';
+    for (const {categoria, slug, nome} of resultados) {
+      const item = document.createElement('li');
+      const link = document.createElement('a');
+      link.href = `$${categoria}/$${slug}.html`;
+      link.textContent = nome;
+      item.appendChild(link);
+      lista.appendChild(item);
+    }
+  })();
+</script>
+</section>''')
+
+modelo_rodape = Template('''\
+            <div class="rst-footer-buttons" role="navigation" aria-label="Rodapé">
+$botoes
+            </div>''')
+
+modelo_anterior = Template('''\
+              <a href="$href" class="btn btn-neutral float-left" title="$titulo" accesskey="p" rel="prev"><span class="fa fa-arrow-circle-left" aria-hidden="true"></span> Anterior</a>''')
+
+modelo_proximo = Template('''\
+              <a href="$href" class="btn btn-neutral float-right" title="$titulo" accesskey="n" rel="next">Próximo <span class="fa fa-arrow-circle-right" aria-hidden="true"></span></a>''')
+
+modelo_item_trilha = Template('''\
+              <li class="breadcrumb-item$classe">$conteudo</li>''')
+
+modelo_item_menu = Template('''\
+<li class="toctree-l$nivel$classe"><a class="$classe_link" href="$href">$titulo</a>$subitens</li>''')
+
+# Tema mínimo para quando o sphinx_rtd_theme não estiver instalado
+css_reserva = '''\
+body { margin: 0; font-family: Lato, "Helvetica Neue", Arial, sans-serif; color: #404040; background: #edf0f2; }
+a { color: #2980b9; text-decoration: none; }
+.wy-grid-for-nav { position: absolute; width: 100%; height: 100%; }
+.wy-nav-side { position: fixed; top: 0; bottom: 0; left: 0; width: 300px; overflow-y: auto; background: #343131; }
+.wy-side-nav-search { padding: .809em; background: #2980b9; text-align: center; }
+.wy-side-nav-search a { color: #fcfcfc; font-size: 100%; font-weight: 700; }
+.wy-side-nav-search input { width: 100%; border-radius: 50px; padding: 6px 12px; border: 1px solid #2472a4; }
+.wy-menu-vertical ul { list-style: none; margin: 0; padding: 0; }
+.wy-menu-vertical a { display: block; padding: .4045em 1.618em; color: #d9d9d9; }
+.wy-menu-vertical li.current > a { background: #fcfcfc; color: #404040; }
+.wy-menu-vertical li.toctree-l2 a { padding-left: 2.427em; background: #c9c9c9; color: #404040; }
+.wy-nav-content-wrap { margin-left: 300px; background: #fcfcfc; min-height: 100%; }
+.wy-nav-content { padding: 1.618em 3.236em; max-width: 800px; }
+.wy-nav-top { display: none; }
+.wy-breadcrumbs { list-style: none; padding: 0; }
+.wy-breadcrumbs li { display: inline-block; }
+.wy-breadcrumbs li.breadcrumb-item:before { content: "/"; padding: 0 5px; }
+figure.align-center { margin: 0; text-align: center; }
+.rst-footer-buttons:after { content: ""; display: table; clear: both; }
+.float-left { float: left; }
+.float-right { float: right; }
+@media screen and (max-width: 768px) {
+  .wy-nav-side { left: -300px; }
+  .wy-nav-side.shift { left: 0; }
+  .wy-nav-content-wrap { margin-left: 0; }
+  .wy-nav-top { display: block; padding: .4045em .809em; background: #2980b9; }
+  .wy-nav-top a { color: #fff; font-weight: 700; }
+}
+'''
+
+
+def dir_tema() -> pathlib.Path:
+    '''
+    Diretório `static` do sphinx_rtd_theme, ou None se não estiver instalado.
+    '''
+    especificacao = importlib.util.find_spec('sphinx_rtd_theme')
+    if especificacao is None or especificacao.origin is None:
+        return None
+    return pathlib.Path(especificacao.origin).parent / 'static'
+
+
+def titulo_categoria(categoria: str) -> str:
+    return plural_categoria[categoria].capitalize()
+
+
+class EmissorHTML:
+    '''
+    Gera as páginas HTML de um campus a partir de `membros_categoria`
+    ({categoria: {slug: MembroCategoria}}).
+    '''
+
+    def __init__(self, membros_categoria: dict, dir_md: pathlib.Path, campus: str,
+                 projeto: str = 'Horários', ext_img: str = 'png', imagens_locais: bool = True,
+                 downloads: tuple = formatos_download):
+        self.membros_categoria = membros_categoria
+        self.dir_md = pathlib.Path(dir_md)
+        self.dir_html = self.dir_md / '_build' / 'html'
+        self.campus = campus
+        self.projeto = escape(projeto)
+        self.ext_img = ext_img
+        self.imagens_locais = imagens_locais
+        self.downloads = downloads
+        self._slugs = {categoria: sorted(membros_categoria.get(categoria, {})) for categoria in categorias}
+        # Itens do menu lateral de cada categoria, montados uma vez só
+        self._itens_menu = {
+            categoria: [
+                modelo_item_menu.substitute(nivel=2, classe='', classe_link='reference internal',
+                                            href=f'{slug}.html', titulo=self._nome(categoria, slug), subitens='')
+                for slug in slugs
+            ]
+            for categoria, slugs in self._slugs.items()
+        }
+
+    def _nome(self, categoria: str, slug: str) -> str:
+        return escape(self.membros_categoria[categoria][slug].nome)
+
+    def _menu(self, raiz: str, atual: str = None, indice_membro: int = None) -> str:
+        '''
+        Menu lateral: as categorias, com a categoria `atual` aberta e, nela,
+        o membro da posição `indice_membro` marcado.
+        '''
+        linhas = []
+        for categoria in categorias:
+            titulo = titulo_categoria(categoria)
+            if categoria != atual:
+                linhas.append(modelo_item_menu.substitute(
+                    nivel=1, classe='', classe_link='reference internal',
+                    href=f'{raiz}{categoria}/index.html', titulo=titulo, subitens=''))
+                continue
+
+            itens = self._itens_menu[categoria]
+            if indice_membro is not None:
+                slug = self._slugs[categoria][indice_membro]
+                subitens = '<ul>\n' + modelo_item_menu.substitute(
+                    nivel=3, classe='', classe_link='reference internal',
+                    href='#baixar', titulo='Baixar', subitens='') + '\n</ul>\n'
+                itens = itens.copy()
+                itens[indice_membro] = modelo_item_menu.substitute(
+                    nivel=2, classe=' current', classe_link='current reference internal',
+                    href='#', titulo=self._nome(categoria, slug), subitens=subitens)
+            lista = '<ul class="current">\n' + '\n'.join(itens) + '\n</ul>\n' if itens else ''
+            na_categoria = indice_membro is None
+            linhas.append(modelo_item_menu.substitute(
+                nivel=1, classe=' current', classe_link='current reference internal' if na_categoria else 'reference internal',
+                href='#' if na_categoria else 'index.html', titulo=titulo, subitens=lista))
+        return '\n'.join(linhas)
+
+    def _rodape(self, anterior: tuple = None, proximo: tuple = None) -> str:
+        botoes = []
+        if anterior:
+            botoes.append(modelo_anterior.substitute(href=anterior[0], titulo=anterior[1]))
+        if proximo:
+            botoes.append(modelo_proximo.substitute(href=proximo[0], titulo=proximo[1]))
+        return modelo_rodape.substitute(botoes='\n'.join(botoes))
+
+    def _pagina(self, caminho: pathlib.Path, titulo: str, raiz: str, trilha: list, conteudo: str,
+                rodape: str, categoria: str = None, indice_membro: int = None) -> bool:
+        itens_trilha = [
+            modelo_item_trilha.substitute(classe=' active' if i == len(trilha) - 1 else '', conteudo=item)
+            for i, item in enumerate(trilha)
+        ]
+        html = modelo_pagina.substitute(
+            titulo=titulo, projeto=self.projeto, raiz=raiz,
+            classe_menu=' class="current"' if categoria else '',
+            menu=self._menu(raiz, categoria, indice_membro),
+            trilha='\n'.join(itens_trilha), conteudo=conteudo, rodape=rodape)
+        return escrever_se_mudou(caminho, html)
+
+    def _copiar_estaticos(self):
+        dir_static = self.dir_html / '_static'
+        shutil.copytree(self.dir_md / '_static', dir_static, dirs_exist_ok=True, copy_function=copiar_se_mudou)
+        tema = dir_tema()
+        if tema is not None:
+            for subdir in ('css', 'js', 'fonts'):
+                if (tema / subdir).is_dir():
+                    shutil.copytree(tema / subdir, dir_static / subdir, dirs_exist_ok=True,
+                                    copy_function=copiar_se_mudou)
+        else:
+            logging.warning('sphinx_rtd_theme não encontrado: usando o tema mínimo do emissor HTML.')
+            (dir_static / 'css').mkdir(parents=True, exist_ok=True)
+            escrever_se_mudou(dir_static / 'css' / 'theme.css', css_reserva)
+
+    def _remover_obsoletos(self, categoria: str):
+        dir_categoria = self.dir_html / categoria
+        slugs = set(self._slugs[categoria])
+        for cam_html in dir_categoria.glob('*.html'):
+            if cam_html.name != 'index.html' and cam_html.stem not in slugs:
+                cam_html.unlink()
+
+    def gerar(self) -> int:
+        '''
+        Gera o site inteiro. Retorna quantas páginas foram (re)gravadas.
+        '''
+        self.dir_html.mkdir(parents=True, exist_ok=True)
+        self._copiar_estaticos()
+        gravadas = 0
+
+        itens = '\n'.join(
+            f'<li class="toctree-l1"><a class="reference internal" href="{categoria}/index.html">'
+            f'{titulo_categoria(categoria)}</a></li>'
+            for categoria in categorias
+        )
+        primeira = categorias[0]
+        gravadas += self._pagina(
+            self.dir_html / 'index.html', self.projeto, '', [],
+            modelo_lista.substitute(id_secao='horarios', titulo=self.projeto, itens=itens),
+            self._rodape(proximo=(f'{primeira}/index.html', titulo_categoria(primeira))))
+
+        gravadas += self._pagina(
+            self.dir_html / 'busca.html', 'Busca', '', ['Busca'], modelo_busca.substitute(), self._rodape())
+
+        for posicao, categoria in enumerate(categorias):
+            gravadas += self._gerar_categoria(categoria, posicao)
+
+        logging.info(f'HTML nativo: {gravadas} páginas gravadas em {self.dir_html}.')
+        return gravadas
+
+    def _gerar_categoria(self, categoria: str, posicao: int) -> int:
+        dir_categoria = self.dir_html / categoria
+        dir_categoria.mkdir(parents=True, exist_ok=True)
+        self._remover_obsoletos(categoria)
+        slugs = self._slugs[categoria]
+        titulo = titulo_categoria(categoria)
+        rotulo = categoria.capitalize()
+        gravadas = 0
+
+        # A navegação anterior/próximo segue a ordem do toctree: início,
+        # índice da categoria, seus membros, índice da categoria seguinte...
+        if posicao == 0:
+            anterior = ('../index.html', self.projeto)
+        else:
+            categoria_anterior = categorias[posicao - 1]
+            ultimos = self._slugs[categoria_anterior]
+            if ultimos:
+                anterior = (f'../{categoria_anterior}/{ultimos[-1]}.html', self._nome(categoria_anterior, ultimos[-1]))
+            else:
+                anterior = (f'../{categoria_anterior}/index.html', titulo_categoria(categoria_anterior))
+        seguinte = None
+        if posicao + 1 < len(categorias):
+            seguinte = (f'../{categorias[posicao + 1]}/index.html', titulo_categoria(categorias[posicao + 1]))
+
+        itens = '\n'.join(
+            f'<li class="toctree-l1"><a class="reference internal" href="{slug}.html">{self._nome(categoria, slug)}</a></li>'
+            for slug in slugs
+        )
+        gravadas += self._pagina(
+            dir_categoria / 'index.html', titulo, '../', [titulo],
+            modelo_lista.substitute(id_secao=categoria, titulo=titulo, itens=itens),
+            self._rodape(anterior, (f'{slugs[0]}.html', self._nome(categoria, slugs[0])) if slugs else seguinte),
+            categoria)
+
+        trilha_categoria = f'<a href="index.html">{titulo}</a>'
+        for indice, slug in enumerate(slugs):
+            membro = self.membros_categoria[categoria][slug]
+            nome = escape(membro.nome)
+            links = '\n'.join(
+                f'<li><p><a class="reference external" href="'
+                f'{url_download.format(fmt=fmt, campus=self.campus, categoria=categoria, slug=slug)}">'
+                f'{fmt.upper()}</a></p></li>'
+                for fmt in self.downloads
+            )
+            # Sem ext_img não há imagem para mostrar
+            figura = ''
+            if self.ext_img:
+                if self.imagens_locais:
+                    img = f'../_static/img/{categoria}/{slug}.{self.ext_img}'
+                else:
+                    img = url_download.format(fmt=self.ext_img, campus=self.campus, categoria=categoria, slug=slug)
+                figura = modelo_figura.substitute(slug=slug, nome=nome, categoria=categoria, rotulo=rotulo, img=img)
+            relacionados = ''
+            if membro.relacionados:
+                por_categoria = {}
+                for relacionado in membro.relacionados:
+                    por_categoria.setdefault(relacionado.categoria, []).append(
+                        f'<a class="reference internal" href="../{relacionado.categoria}/{relacionado.slug}.html">'
+                        f'<span class="std std-ref">{escape(relacionado.nome)}</span></a>')
+                relacionados = modelo_relacionados.substitute(itens='\n'.join(
+                    f'<li><p>{escape(plural_categoria[outra].capitalize())}: {", ".join(links)}</p></li>'
+                    for outra, links in por_categoria.items()
+                ))
+            siglas = ''
+            if membro.siglas:
+                siglas = modelo_siglas.substitute(itens='\n'.join(
+                    f'<li><p><strong>{escape(sigla)}</strong>: {escape(nome_sigla)}</p></li>'
+                    for sigla, nome_sigla in membro.siglas
+                ))
+            conteudo = modelo_membro.substitute(slug=slug, nome=nome, figura=figura, relacionados=relacionados,
+                                                siglas=siglas, links=links)
+            anterior_membro = (f'{slugs[indice - 1]}.html', self._nome(categoria, slugs[indice - 1])) \
+                if indice > 0 else ('index.html', titulo)
+            proximo_membro = (f'{slugs[indice + 1]}.html', self._nome(categoria, slugs[indice + 1])) \
+                if indice + 1 < len(slugs) else seguinte
+            gravadas += self._pagina(
+                dir_categoria / f'{slug}.html', nome, '../', [trilha_categoria, nome], conteudo,
+                self._rodape(anterior_membro, proximo_membro), categoria, indice)
+        return gravadas
+
+
+def gerar_html(membros_categoria: dict, dir_md: pathlib.Path, campus: str, ext_img: str = 'png',
+               imagens_locais: bool = True, downloads: tuple = formatos_download) -> int:
+    return EmissorHTML(membros_categoria, dir_md, campus, ext_img=ext_img, imagens_locais=imagens_locais,
+                       downloads=downloads).gerar()
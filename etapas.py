@@ -0,0 +1,98 @@
+'''
+Grafo das etapas do processamento de um campus.
+
+Cada etapa declara de quais depende; pedir uma etapa traz junto as suas
+dependências, e as que ninguém pediu não rodam. Os formatos de conversão
+(txt, png, svg) também são etapas: `--etapas split,txt,md` gera só o texto
+e o Markdown, sem imagens, grades, agendas nem índice de busca.
+
+O txt é sempre gerado, porque os nomes dos membros saem dele.
+'''
+
+# etapa -> etapas das quais depende. A ordem das chaves é a de execução
+grafo = {
+    'split': (),
+    'txt': ('split',),
+    'png': ('split',),
+    'svg': ('split',),
+    'otimizacao': ('split',),
+    'abreviacoes': (),
+    'grades': ('txt',),
+    'conflitos': ('grades',),
+    'relacionados': ('conflitos',),
+    'md': ('txt', 'abreviacoes'),
+    'busca': ('txt', 'abreviacoes'),
+    'agendas': ('grades', 'abreviacoes'),
+    'html': ('md',),
+}
+
+formatos_etapas = ('txt', 'png', 'svg')
+# Sem elas não há membros
+etapas_obrigatorias = ('split', 'txt')
+
+
+def ler_lista(texto: str) -> tuple:
+    '''
+    'a,b, c' -> ('a', 'b', 'c'), para os argumentos --etapas e --formatos.
+    '''
+    return tuple(item.strip() for item in texto.split(',') if item.strip())
+
+
+def resolver(pedidas=None) -> tuple:
+    '''
+    Etapas a executar: as `pedidas` (todas, se None), suas dependências e as
+    obrigatórias, na ordem em que aparecem no `grafo`. Essa ordem respeita as
+    dependências e também põe relacionados antes de md, quando as duas rodam:
+    as páginas só saem com os links se os relacionados já existem.
+    '''
+    pedidas = tuple(grafo) if pedidas is None else tuple(pedidas)
+    desconhecidas = [etapa for etapa in pedidas if etapa not in grafo]
+    if desconhecidas:
+        raise ValueError(f'Etapas desconhecidas: {", ".join(desconhecidas)} (válidas: {", ".join(grafo)})')
+
+    ativas = set()
+    pendentes = list(etapas_obrigatorias + pedidas)
+    while pendentes:
+        etapa = pendentes.pop()
+        if etapa not in ativas:
+            ativas.add(etapa)
+            pendentes.extend(grafo[etapa])
+    return tuple(etapa for etapa in grafo if etapa in ativas)
+
+
+def formatos_das_etapas(etapas: tuple) -> tuple:
+    '''
+    Formatos de conversão entre as `etapas`, na ordem de `formatos_etapas`.
+    '''
+    return tuple(fmt for fmt in formatos_etapas if fmt in etapas)
+
+
+def planejar(etapas=None, formatos=None) -> tuple:
+    '''
+    Combina --etapas e --formatos. Os formatos só limitam as conversões;
+    sem --formatos, as conversões são as que estão entre as etapas pedidas.
+    Retorna (etapas, formatos).
+    '''
+    if formatos is not None:
+        invalidos = [fmt for fmt in formatos if fmt not in formatos_etapas]
+        if invalidos:
+            raise ValueError(f'Formatos desconhecidos: {", ".join(invalidos)} (válidos: {", ".join(formatos_etapas)})')
+        if 'txt' not in formatos:
+            raise ValueError('O formato txt é obrigatório: os nomes dos membros saem dele')
+    if etapas is None:
+        etapas = tuple(etapa for etapa in grafo if etapa not in formatos_etapas) + (formatos or formatos_etapas)
+    elif formatos is not None:
+        etapas = tuple(etapa for etapa in etapas if etapa not in formatos_etapas) + tuple(formatos)
+    ordem = resolver(etapas)
+    return ordem, formatos_das_etapas(ordem)
+
+
+def executar_etapas(ordem: tuple, funcoes: dict):
+    '''
+    Chama, na ordem, as funções das etapas de `ordem` que estão em `funcoes`
+    ({etapa: função sem argumentos}).
+    '''
+    for etapa in ordem:
+        funcao = funcoes.get(etapa)
+        if funcao is not None:
+            funcao()
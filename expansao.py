@@ -0,0 +1,99 @@
+'''
+Expansão de abreviações (códigos de turma, sala, disciplina...) nos textos
+dos horários.
+
+Todas as abreviações de `abrev/*.csv` são compiladas num único autômato de
+Aho-Corasick, que encontra todas as ocorrências num texto com uma passada só,
+qualquer que seja o número de abreviações. Só contam ocorrências que são
+palavras inteiras: "A101" não é encontrada dentro de "LA101".
+'''
+
+from collections import deque
+
+
+def _fronteira(texto: str, posicao: int) -> bool:
+    if posicao < 0 or posicao >= len(texto):
+        return True
+    caractere = texto[posicao]
+    return not (caractere.isalnum() or caractere == '_')
+
+
+class Expansor:
+    '''
+    Autômato de Aho-Corasick sobre as abreviações de {abreviação: nome}.
+    '''
+
+    def __init__(self, nomes: dict):
+        self.nomes = {abrev: nome for abrev, nome in nomes.items() if abrev}
+        # Estado -> {caractere: próximo estado}
+        self._transicoes = [{}]
+        self._falhas = [0]
+        # Estado -> abreviações que terminam nele, da mais longa para a mais curta
+        self._saidas = [()]
+
+        for abrev in self.nomes:
+            estado = 0
+            for caractere in abrev:
+                proximo = self._transicoes[estado].get(caractere)
+                if proximo is None:
+                    proximo = len(self._transicoes)
+                    self._transicoes[estado][caractere] = proximo
+                    self._transicoes.append({})
+                    self._falhas.append(0)
+                    self._saidas.append(())
+                estado = proximo
+            self._saidas[estado] = (abrev,)
+
+        # Ligações de falha em largura: a falha de um estado é o maior sufixo
+        # dele que também é prefixo de alguma abreviação
+        fila = deque(self._transicoes[0].values())
+        while fila:
+            estado = fila.popleft()
+            for caractere, proximo in self._transicoes[estado].items():
+                fila.append(proximo)
+                falha = self._falhas[estado]
+                while falha and caractere not in self._transicoes[falha]:
+                    falha = self._falhas[falha]
+                falha = self._transicoes[falha].get(caractere, 0)
+                self._falhas[proximo] = falha if falha != proximo else 0
+                self._saidas[proximo] += self._saidas[self._falhas[proximo]]
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def ocorrencias(self, texto: str) -> list:
+        '''
+        Ocorrências [(início, fim, abreviação)] sem sobreposição, da
+        esquerda para a direita, preferindo a mais longa num mesmo início.
+        '''
+        achadas = []
+        transicoes, falhas, saidas = self._transicoes, self._falhas, self._saidas
+        estado = 0
+        for posicao, caractere in enumerate(texto):
+            while estado and caractere not in transicoes[estado]:
+                estado = falhas[estado]
+            estado = transicoes[estado].get(caractere, 0)
+            for abrev in saidas[estado]:
+                inicio = posicao + 1 - len(abrev)
+                if _fronteira(texto, inicio - 1) and _fronteira(texto, posicao + 1):
+                    achadas.append((inicio, posicao + 1, abrev))
+
+        achadas.sort(key=lambda achada: (achada[0], -achada[1]))
+        resultado = []
+        fim_anterior = 0
+        for inicio, fim, abrev in achadas:
+            if inicio >= fim_anterior:
+                resultado.append((inicio, fim, abrev))
+                fim_anterior = fim
+        return resultado
+
+    def expandir(self, texto: str) -> tuple:
+        '''
+        Abreviações encontradas no texto, sem repetição e na ordem em que
+        aparecem, como ((abreviação, nome), ...).
+        '''
+        vistas = {}
+        for _, _, abrev in self.ocorrencias(texto):
+            if abrev not in vistas:
+                vistas[abrev] = self.nomes[abrev]
+        return tuple(vistas.items())
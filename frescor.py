@@ -0,0 +1,165 @@
+'''
+Verificação rápida de um campus (`colario.py --check`): diz se os horários
+publicados ainda correspondem às entradas, sem carregar o conversor, o
+yaml nem o slugify, para que o cron possa chamá-la a todo minuto.
+
+Cada execução bem-sucedida do colario.py grava em `.colario-entradas.json`
+a impressão das entradas: tamanho, data e hash SHA-256 dos PDFs enviados,
+do horario.yaml e dos abrev/*.csv, os argumentos que mudam o resultado e a
+versão da ferramenta (os módulos .py e o Python). Se tamanho e data de
+todos os arquivos conferem, nada é lido; com a data diferente (um cp sem
+-p, por exemplo), o hash decide.
+
+Saída 0: atualizado. Saída 1: é preciso refazer o campus.
+'''
+
+import json
+import os
+import sys
+
+arq_impressao = '.colario-entradas.json'
+arqs_entrada = ('professor.pdf', 'sala.pdf', 'turma.pdf', 'horario.yaml')
+# Opções do colario.py seguidas de um valor, para achar os posicionais
+opcoes_com_valor = ('-j', '--jobs', '--conversor', '--dpi', '--nivel-png', '--html', '--watch', '--atraso',
+                    '--formatos', '--formats', '--etapas', '--stages')
+# Não mudam o resultado (--completo só refaz tudo; com --watch, cada envio
+# processado grava a mesma impressão de uma execução normal)
+opcoes_ignoradas = ('-j', '--jobs', '--check', '--completo', '--watch', '--atraso')
+
+
+def _separar_argumentos(argv: list) -> tuple:
+    '''
+    (posicionais, argumentos que mudam o resultado) da linha de comando.
+    '''
+    posicionais = []
+    relevantes = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        opcao = arg.split('=', 1)[0]
+        ignorada = opcao in opcoes_ignoradas or (arg.startswith('-j') and not arg.startswith('--'))
+        if arg in opcoes_com_valor:
+            if not ignorada:
+                relevantes += argv[i:i + 2]
+            i += 2
+            continue
+        if not arg.startswith('-'):
+            posicionais.append(arg)
+        if not ignorada:
+            relevantes.append(arg)
+        i += 1
+    return posicionais, relevantes
+
+
+def arquivos_entrada(dir_pdf: str) -> list:
+    dir_abrev = os.path.join(dir_pdf, 'abrev')
+    abrev = []
+    if os.path.isdir(dir_abrev):
+        abrev = sorted(os.path.join('abrev', e.name) for e in os.scandir(dir_abrev) if e.name.endswith('.csv'))
+    return [nome for nome in arqs_entrada if os.path.exists(os.path.join(dir_pdf, nome))] + abrev
+
+
+def versao_ferramenta() -> list:
+    '''
+    Tamanho e data dos módulos do colario e a versão do Python: uma
+    atualização do código invalida as impressões.
+    '''
+    dir_codigo = os.path.dirname(os.path.abspath(__file__))
+    modulos = sorted((e.name, e.stat().st_size, e.stat().st_mtime_ns)
+                     for e in os.scandir(dir_codigo) if e.name.endswith('.py'))
+    return [sys.version] + [list(modulo) for modulo in modulos]
+
+
+def hash_arquivo(caminho: str) -> str:
+    import hashlib
+    sha = hashlib.sha256()
+    with open(caminho, mode='rb') as arq:
+        for bloco in iter(lambda: arq.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def impressao(dir_pdf: str, argv: list) -> dict:
+    '''
+    Impressão das entradas de `dir_pdf` para a linha de comando `argv`.
+    '''
+    arquivos = {}
+    for nome in arquivos_entrada(dir_pdf):
+        caminho = os.path.join(dir_pdf, nome)
+        info = os.stat(caminho)
+        arquivos[nome] = {'tamanho': info.st_size, 'mtime': info.st_mtime_ns, 'sha256': hash_arquivo(caminho)}
+    return {
+        'versao': versao_ferramenta(),
+        'argumentos': _separar_argumentos(argv)[1],
+        'arquivos': arquivos,
+    }
+
+
+def carregar(dir_pdf: str) -> dict:
+    try:
+        with open(os.path.join(dir_pdf, arq_impressao), mode='r', encoding='utf-8') as man_arq:
+            return json.load(man_arq)
+    except (OSError, ValueError):
+        return {}
+
+
+def salvar(dir_pdf: str, dados: dict):
+    caminho = os.path.join(dir_pdf, arq_impressao)
+    temp = f'{caminho}.tmp'
+    with open(temp, mode='w', encoding='utf-8') as man_arq:
+        json.dump(dados, man_arq, indent=1)
+    os.replace(temp, caminho)
+
+
+def verificar(dir_pdf: str, argv: list) -> str:
+    '''
+    Motivo para refazer o campus, ou None se está atualizado. Arquivos com
+    data nova e conteúdo igual têm a data atualizada na impressão, para que
+    a próxima verificação nem os leia.
+    '''
+    anterior = carregar(dir_pdf)
+    if not anterior:
+        return 'sem impressão de uma execução anterior'
+    if '--completo' in argv:
+        return '--completo'
+    if not os.path.exists(os.path.join(dir_pdf, '.colario-manifesto.json')):
+        return 'manifesto ausente'
+    if anterior.get('argumentos') != _separar_argumentos(argv)[1]:
+        return 'argumentos diferentes'
+    if anterior.get('versao') != versao_ferramenta():
+        return 'nova versão da ferramenta'
+
+    arquivos = anterior.get('arquivos', {})
+    nomes = arquivos_entrada(dir_pdf)
+    if sorted(nomes) != sorted(arquivos):
+        return 'arquivos de entrada incluídos ou removidos'
+    tocados = False
+    for nome in nomes:
+        item = arquivos[nome]
+        caminho = os.path.join(dir_pdf, nome)
+        info = os.stat(caminho)
+        if info.st_size != item['tamanho']:
+            return f'{nome} alterado'
+        if info.st_mtime_ns == item['mtime']:
+            continue
+        if hash_arquivo(caminho) != item['sha256']:
+            return f'{nome} alterado'
+        item['mtime'] = info.st_mtime_ns
+        tocados = True
+    if tocados:
+        salvar(dir_pdf, anterior)
+    return None
+
+
+def main(argv: list):
+    posicionais, _ = _separar_argumentos(argv)
+    if len(posicionais) < 2:
+        print('uso: colario.py --check campus dir_pdf dir_www [opções]', file=sys.stderr)
+        sys.exit(2)
+    campus, dir_pdf = posicionais[:2]
+    motivo = verificar(dir_pdf, argv)
+    if motivo is None:
+        print(f'{campus}: atualizado.')
+        sys.exit(0)
+    print(f'{campus}: desatualizado ({motivo}).')
+    sys.exit(1)
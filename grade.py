@@ -0,0 +1,191 @@
+'''
+Grade horária de cada membro (professor, sala ou turma): 17 horários por 5 dias,
+no formato de `horario-modelo.csv`, extraída do texto do `pdftotext -layout`.
+
+As grades de todos os membros ficam em um único `array` de códigos inteiros.
+O texto de cada célula e os termos dela (códigos de disciplina, sala, turma
+etc.) são guardados uma única vez, em vocabulários.
+'''
+
+from array import array
+from bisect import bisect_right
+import csv
+import pathlib
+import re
+
+arq_modelo = pathlib.Path(__file__).parent / 'horario-modelo.csv'
+
+dias = ('Seg', 'Ter', 'Qua', 'Qui', 'Sex')
+
+
+def carrega_horarios(cam_arq: pathlib.Path = arq_modelo) -> list:
+    '''
+    Intervalos dos horários, na ordem: [('7:00', '7:45'), ...]
+    '''
+    with cam_arq.open(mode='r', encoding='utf-8') as arq_modelo_csv:
+        leitor = csv.DictReader(arq_modelo_csv)
+        return [tuple(t.strip() for t in linha['Intervalo'].split('-')) for linha in leitor]
+
+
+horarios = carrega_horarios()
+
+total_celulas = len(horarios) * len(dias)
+
+re_dia = re.compile(r'\b(seg|ter|qua|qui|sex)\w*', re.IGNORECASE)
+re_horario = re.compile(r'^\s*(?:\d{1,2}º?\s+)?(\d{1,2}):(\d{2})\s*[-–]\s*\d{1,2}:\d{2}')
+re_palavra = re.compile(r'\S+')
+
+
+def indice(horario: int, dia: int) -> int:
+    '''
+    Posição da célula na grade: `horario` de 1 a 17 e `dia` de 0 (Seg) a 4 (Sex).
+    '''
+    return (horario - 1) * len(dias) + dia
+
+
+def analisar_grade(texto: str) -> list:
+    '''
+    Lista com o texto das 85 células da grade, vazias quando a página não
+    tiver o cabeçalho dos dias.
+
+    Cada coluna começa na posição do nome do dia no cabeçalho e vai até o
+    início da seguinte; cada palavra vai para a coluna em que começa, mesmo
+    quando um só espaço a separa da célula vizinha. Linhas sem horário
+    continuam a célula do horário anterior.
+    '''
+    celulas = [[] for _ in range(total_celulas)]
+    horario_inicio = {ini.zfill(5): num for num, (ini, fim) in enumerate(horarios, start=1)}
+
+    inicios = None
+    inicio_grade = 0
+    horario_atual = None
+
+    for linha in texto.splitlines():
+        if inicios is None:
+            achados = re_dia.findall(linha)
+            if [a.lower() for a in achados[:len(dias)]] == [d.lower() for d in dias]:
+                posicoes = [m.span() for m in re_dia.finditer(linha)][:len(dias)]
+                inicios = [ini for ini, _ in posicoes]
+                inicio_grade = posicoes[0][0] - (posicoes[1][0] - posicoes[0][0]) // 2
+            continue
+
+        casamento = re_horario.match(linha)
+        if casamento:
+            hora, minuto = casamento.group(1), casamento.group(2)
+            horario_atual = horario_inicio.get(f'{hora}:{minuto}'.zfill(5))
+            # Apaga o intervalo, preservando as colunas do restante da linha
+            linha = ' ' * casamento.end() + linha[casamento.end():]
+        elif horario_atual is None or not linha.strip():
+            continue
+
+        if horario_atual is None:
+            continue
+
+        for palavra in re_palavra.finditer(linha):
+            if palavra.start() < inicio_grade:
+                continue
+            dia = max(bisect_right(inicios, palavra.start()) - 1, 0)
+            celulas[indice(horario_atual, dia)].append(palavra.group())
+
+    return [' '.join(partes) for partes in celulas]
+
+
+class Vocabulario:
+    '''
+    Textos internados: cada texto distinto recebe um código inteiro, e o
+    código 0 é o texto vazio.
+    '''
+
+    __slots__ = ('_codigos', '_textos')
+
+    def __init__(self):
+        self._codigos = {'': 0}
+        self._textos = ['']
+
+    def codigo(self, texto: str) -> int:
+        codigo = self._codigos.get(texto)
+        if codigo is None:
+            codigo = self._codigos[texto] = len(self._textos)
+            self._textos.append(texto)
+        return codigo
+
+    def procurar(self, texto: str):
+        '''
+        Código do texto, ou None se ele nunca foi internado.
+        '''
+        return self._codigos.get(texto)
+
+    def texto(self, codigo: int) -> str:
+        return self._textos[codigo]
+
+    def __len__(self):
+        return len(self._textos)
+
+
+class Grades:
+    '''
+    Grades horárias de todos os membros, indexadas por (categoria, slug).
+    '''
+
+    def __init__(self):
+        self.celulas = Vocabulario()
+        self.termos = Vocabulario()
+
+        # Termos de cada célula: termos[inicio[c]:inicio[c+1]]
+        self._termos_celula = array('I')
+        self._inicio_termos = array('I', [0, 0])
+
+        # 85 códigos de célula por membro, um membro após o outro
+        self._dados = array('I')
+        self._posicao = {}
+
+    def adicionar(self, categoria: str, slug: str, texto_horario: str):
+        codigos = array('I', (self._codigo_celula(c) for c in analisar_grade(texto_horario)))
+        chave = (categoria, slug)
+        if chave in self._posicao:
+            inicio = self._posicao[chave]
+            self._dados[inicio:inicio+total_celulas] = codigos
+        else:
+            self._posicao[chave] = len(self._dados)
+            self._dados.extend(codigos)
+
+    def _codigo_celula(self, texto: str) -> int:
+        codigo = self.celulas.codigo(texto)
+        if codigo == len(self._inicio_termos) - 1:
+            self._termos_celula.extend(self.termos.codigo(t) for t in texto.split())
+            self._inicio_termos.append(len(self._termos_celula))
+        return codigo
+
+    def grade(self, categoria: str, slug: str) -> memoryview:
+        '''
+        Os 85 códigos de célula do membro, na ordem de `indice()`.
+        '''
+        inicio = self._posicao[(categoria, slug)]
+        return memoryview(self._dados)[inicio:inicio+total_celulas]
+
+    def celula(self, categoria: str, slug: str, horario: int, dia: int) -> str:
+        return self.celulas.texto(self.grade(categoria, slug)[indice(horario, dia)])
+
+    def termos_celula(self, codigo_celula: int) -> array:
+        return self._termos_celula[self._inicio_termos[codigo_celula]:self._inicio_termos[codigo_celula+1]]
+
+    def ocupacao(self, categoria: str, slug: str) -> int:
+        '''
+        Conjunto de bits com as células não vazias do membro (bit `indice()`).
+        '''
+        bits = 0
+        for i, codigo in enumerate(self.grade(categoria, slug)):
+            if codigo:
+                bits |= 1 << i
+        return bits
+
+    def membros(self, categoria: str = None):
+        for chave in self._posicao:
+            if categoria is None or chave[0] == categoria:
+                yield chave
+
+    def __contains__(self, chave):
+        return chave in self._posicao
+
+    def __len__(self):
+        return len(self._posicao)
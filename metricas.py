@@ -0,0 +1,102 @@
+'''
+Métricas de execução: tempo de parede e de CPU de cada etapa e, para cada
+comando externo, duração, código de saída e tamanho do arquivo gerado.
+
+O tempo de CPU é o do processo inteiro (todas as threads) e o dos
+subprocessos já terminados, medidos no início e no fim da etapa. Com as
+categorias processadas em paralelo, a CPU de uma etapa inclui o trabalho
+das outras que rodaram ao mesmo tempo.
+'''
+
+from contextlib import contextmanager
+import json
+import logging
+import os
+import pathlib
+import subprocess
+import threading
+import time
+
+
+class Metricas:
+    '''
+    Registro das etapas e dos comandos, seguro para várias threads.
+    '''
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.etapas = []
+        self.comandos = []
+
+    @contextmanager
+    def etapa(self, nome: str, categoria: str = None):
+        inicio = time.perf_counter()
+        tempos = os.times()
+        try:
+            yield
+        finally:
+            parede = time.perf_counter() - inicio
+            fim = os.times()
+            registro = {
+                'etapa': nome,
+                'categoria': categoria,
+                'parede': round(parede, 4),
+                'cpu': round((fim.user - tempos.user) + (fim.system - tempos.system), 4),
+                'cpu_subprocessos': round((fim.children_user - tempos.children_user)
+                                          + (fim.children_system - tempos.children_system), 4),
+            }
+            with self._trava:
+                self.etapas.append(registro)
+            logging.info(f"Etapa {nome}{f' ({categoria})' if categoria else ''}: {registro['parede']:.3f} s, "
+                         f"CPU {registro['cpu']:.3f} s + {registro['cpu_subprocessos']:.3f} s em subprocessos.")
+
+    def registrar(self, comando: str, duracao: float, codigo: int = 0, alvo=None, erro: str = ''):
+        tamanho = None
+        if alvo is not None and os.path.exists(alvo):
+            tamanho = os.path.getsize(alvo)
+        registro = {
+            'comando': comando,
+            'duracao': round(duracao, 4),
+            'codigo': codigo,
+            'alvo': None if alvo is None else str(alvo),
+            'tamanho': tamanho,
+        }
+        with self._trava:
+            self.comandos.append(registro)
+
+        if codigo != 0:
+            logging.error(f'Comando falhou ({codigo}) em {duracao:.3f} s: {comando}\n{erro.strip()}')
+        else:
+            logging.debug(f'Comando em {duracao:.3f} s ({tamanho} bytes): {comando}')
+
+    def executar(self, cmd: list, alvo=None) -> subprocess.CompletedProcess:
+        '''
+        subprocess.run() registrando o comando. `alvo` é o arquivo gerado.
+        '''
+        inicio = time.perf_counter()
+        processo = subprocess.run(cmd, capture_output=True)
+        self.registrar(' '.join(str(c) for c in cmd), time.perf_counter() - inicio, processo.returncode,
+                       alvo, processo.stderr.decode('utf-8', errors='replace'))
+        return processo
+
+    def resumo(self, mais_lentos: int = 10) -> str:
+        linhas = [f"{'Etapa':<12} {'Categoria':<10} {'Parede (s)':>10} {'CPU (s)':>9} {'Subproc. (s)':>12}"]
+        for etapa in self.etapas:
+            linhas.append(f"{etapa['etapa']:<12} {etapa['categoria'] or '-':<10} {etapa['parede']:>10.3f} "
+                          f"{etapa['cpu']:>9.3f} {etapa['cpu_subprocessos']:>12.3f}")
+
+        falhas = [c for c in self.comandos if c['codigo'] != 0]
+        soma = sum(c['duracao'] for c in self.comandos)
+        linhas.append('')
+        linhas.append(f'Comandos: {len(self.comandos)} ({len(falhas)} com erro), {soma:.3f} s somados')
+        if self.comandos:
+            linhas.append('Mais lentos:')
+            for comando in sorted(self.comandos, key=lambda c: c['duracao'], reverse=True)[:mais_lentos]:
+                linhas.append(f"  {comando['duracao']:8.3f} s  [{comando['codigo']}] {comando['comando']}")
+        for comando in falhas:
+            linhas.append(f"Erro {comando['codigo']}: {comando['comando']}")
+        return '\n'.join(linhas)
+
+    def salvar(self, caminho: pathlib.Path):
+        with open(caminho, mode='w', encoding='utf-8') as arq:
+            json.dump({'etapas': self.etapas, 'comandos': self.comandos}, arq, ensure_ascii=False, indent=1)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Atualiza os horários de vários campi ao mesmo tempo, substituindo os scripts
+Scripts/colario-atualiza-<campus>.sh executados um após o outro.
+
+Todos os campi compartilham um único conjunto de trabalhadores (--jobs), usado
+pelas conversões de páginas e pelo `make html`; com `--conversor assincrono`,
+compartilham também o laço e o semáforo das conversões. Cada campus avança
+sozinho: um campus pequeno não espera as conversões de um grande.
+
+Os campi são lidos de um arquivo YAML:
+
+    campi:
+      - nome: natal-centro-historico
+        envios: /var/www/html/sis/natal-centro-historico/envios
+        ano_periodo: "2025.1"
+        dir_horario: /var/lib/colario/natal-centro-historico/horario
+        www: /var/www/html/horario
+        formatos: [txt, svg]
+
+`formatos` (opcional) limita as conversões do campus ao que ele publica;
+sem ele, vale o --formatos da linha de comando.
+
+Com --watch, o orquestrador não termina: vigia os diretórios de envios e
+atualiza cada campus assim que chega um envio completo dele.
+'''
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+import filecmp
+import logging
+import os
+import pathlib
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import yaml
+
+from arquivos import copiar_se_mudou
+from colario import processar_campus
+from conversor import ConversorCLI, conversores, formatos_sem_imagens
+from emissor_html import gerar_html
+from etapas import grafo as grafo_etapas, ler_lista, planejar as planejar_etapas
+from metricas import Metricas
+from otimizacao import ConfOtimizacao
+from publicacao import publicar
+from vigia import categorias, ultimo_envio, vigiar_envios
+
+formatos_publicados = ('pdf', 'png', 'svg', 'txt', 'ics')
+
+
+@dataclass
+class ConfCampus:
+    nome: str
+    envios: pathlib.Path
+    ano_periodo: str
+    dir_horario: pathlib.Path
+    www: pathlib.Path = pathlib.Path('/var/www/html/horario')
+    # Formatos convertidos e publicados; None usa os da linha de comando
+    formatos: tuple = None
+
+
+def carrega_campi(cam_arq: pathlib.Path) -> list:
+    with cam_arq.open(mode='r', encoding='utf-8') as man_arq:
+        conf = yaml.safe_load(man_arq)
+    campi = []
+    for item in conf['campi']:
+        campi.append(ConfCampus(
+            nome=item['nome'],
+            envios=pathlib.Path(item['envios']),
+            ano_periodo=str(item['ano_periodo']),
+            dir_horario=pathlib.Path(item['dir_horario']),
+            www=pathlib.Path(item.get('www', ConfCampus.www)),
+            formatos=tuple(item['formatos']) if item.get('formatos') else None,
+        ))
+    return campi
+
+
+class Progresso:
+    '''
+    Mensagens de andamento por campus, na saída padrão e no log.
+    '''
+
+    def __init__(self, total: int):
+        self._trava = threading.Lock()
+        self._total = total
+        self._concluidos = 0
+        self._inicio = time.perf_counter()
+
+    def informar(self, campus: str, mensagem: str, concluido: bool = False):
+        with self._trava:
+            if concluido:
+                self._concluidos += 1
+            decorrido = time.perf_counter() - self._inicio
+            linha = f'[{decorrido:7.1f} s] [{self._concluidos}/{self._total}] {campus}: {mensagem}'
+            print(linha, flush=True)
+            logging.info(linha)
+
+
+def executar_no_conjunto(conversoes: ThreadPoolExecutor, cmd: list, cwd: pathlib.Path):
+    '''
+    Executa um comando ocupando um dos trabalhadores compartilhados.
+    '''
+    processo = conversoes.submit(subprocess.run, cmd, cwd=cwd, capture_output=True, text=True).result()
+    if processo.returncode != 0:
+        raise RuntimeError(f'{" ".join(cmd)} falhou ({processo.returncode}):\n{processo.stderr}')
+    return processo
+
+
+def atualizar_campus(conf: ConfCampus, conversoes: ThreadPoolExecutor, progresso: Progresso,
+                     args: argparse.Namespace, metricas: Metricas, laco=None):
+    '''
+    Processa e publica o último envio do campus. `laco` é o LacoConversao
+    compartilhado pelos campi com `--conversor assincrono`.
+    '''
+    campus = conf.nome
+
+    carimbo = ultimo_envio(conf.envios)
+    if carimbo is None:
+        progresso.informar(campus, f'nenhum envio completo em {conf.envios}', concluido=True)
+        return
+    for categoria in categorias:
+        origem = conf.envios / f'{carimbo}_{categoria}.pdf'
+        destino = conf.dir_horario / f'{categoria}.pdf'
+        if not destino.exists() or not filecmp.cmp(origem, destino, shallow=False):
+            shutil.copy2(origem, destino)
+    progresso.informar(campus, f'envio {carimbo}')
+
+    conversor = args.conversor
+    formatos = conf.formatos or args.formatos
+    if laco is not None:
+        # Métricas e formatos do campus, com o limite de comandos de todos
+        from concolario import ConversorAssincrono
+        if formatos is None and args.sem_imagens:
+            formatos = formatos_sem_imagens
+        conversor = ConversorAssincrono(metricas, formatos=planejar_etapas(args.etapas, formatos)[1],
+                                        dpi=args.dpi, laco=laco)
+    processado = processar_campus(campus, conf.dir_horario, conversoes, lote=args.lote,
+                                  conversor=conversor, completo=args.completo, metricas=metricas,
+                                  sem_imagens=args.sem_imagens,
+                                  otimizacao=ConfOtimizacao(dpi=args.dpi, nivel_png=args.nivel_png,
+                                                            glifos_compartilhados=args.glifos_compartilhados),
+                                  formatos=formatos, etapas=args.etapas, jobs=args.jobs)
+    total = sum(len(membros) for membros in processado.membros_categoria.values())
+    progresso.informar(campus, f'{total} páginas processadas, {len(processado.conflitos)} conflitos')
+
+    # Versão web (HTML)
+    dir_md = conf.dir_horario / 'md'
+    html = 'html' in processado.etapas
+    if html:
+        with metricas.etapa('html'):
+            if args.html == 'nativo':
+                gerar_html(processado.membros_categoria, dir_md, campus, ext_img=processado.ext_img,
+                           imagens_locais=processado.imagens_locais, downloads=processado.downloads)
+            else:
+                shutil.copytree(conf.dir_horario / 'modelo', dir_md, dirs_exist_ok=True,
+                                copy_function=copiar_se_mudou)
+                executar_no_conjunto(conversoes, ['make', 'html'], cwd=dir_md)
+        progresso.informar(campus, 'HTML gerado')
+
+    # Cada destino vira um link para uma versão completa, trocado de uma vez;
+    # os arquivos iguais aos da versão anterior são reaproveitados
+    with metricas.etapa('publicacao'):
+        if html:
+            publicar(dir_md / '_build' / 'html', conf.www / campus / conf.ano_periodo, conversoes)
+
+        # Os artefatos são copiados, não movidos, para que a próxima execução
+        # reaproveite as páginas que não mudaram. Só os formatos gerados são
+        # publicados: sem imagens, PNG e SVG ficam por conta do
+        # servidor_imagens.py, e agendas só existem com a validade em
+        # horario.yaml
+        for fmt in formatos_publicados:
+            if fmt not in processado.downloads or not (conf.dir_horario / fmt).is_dir():
+                continue
+            publicar(conf.dir_horario / fmt, conf.www / fmt / campus, conversoes)
+    progresso.informar(campus, 'publicado', concluido=True)
+
+
+def vigiar(campi: list, progresso: Progresso, args: argparse.Namespace, metricas_campus: dict, laco=None):
+    '''
+    Modo --watch: atualiza cada campus quando chega um envio completo dele.
+    Campi diferentes são atualizados ao mesmo tempo; um envio que chega
+    durante a atualização do mesmo campus é processado logo depois dela.
+    '''
+    por_nome = {conf.nome: conf for conf in campi}
+    trava = threading.Lock()
+    em_andamento = set()
+    repetir = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix='trabalhador') as conversoes, \
+         ThreadPoolExecutor(max_workers=max(1, len(campi)), thread_name_prefix='campus') as atualizadores:
+
+        def atualizar(nome: str):
+            try:
+                atualizar_campus(por_nome[nome], conversoes, progresso, args, metricas_campus[nome], laco)
+            except Exception as erro:
+                logging.exception(f'Falha ao atualizar {nome}')
+                progresso.informar(nome, f'FALHOU: {erro}', concluido=True)
+            with trava:
+                if nome in repetir:
+                    repetir.discard(nome)
+                    atualizadores.submit(atualizar, nome)
+                else:
+                    em_andamento.discard(nome)
+
+        def ao_chegar(nome: str, _):
+            with trava:
+                if nome in em_andamento:
+                    repetir.add(nome)
+                    return
+                em_andamento.add(nome)
+            atualizadores.submit(atualizar, nome)
+
+        try:
+            vigiar_envios({conf.nome: conf.envios for conf in campi}, ao_chegar, atraso=args.atraso)
+        except KeyboardInterrupt:
+            pass
+
+
+def main():
+    ana_args = argparse.ArgumentParser(description='Atualiza os horários de vários campi em paralelo')
+    ana_args.add_argument('arq_campi', help='Arquivo YAML com a lista de campi')
+    ana_args.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                          help='Trabalhadores compartilhados por todos os campi')
+    ana_args.add_argument('--campus', action='append',
+                          help='Atualiza só este campus (pode ser repetido)')
+    ana_args.add_argument('--lote', action='store_true',
+                          help='Converte cada categoria com um processo por formato, em vez de um por página')
+    ana_args.add_argument('--conversor', choices=sorted(conversores), default=ConversorCLI.nome,
+                          help='Conversor de PDF: programas externos (cli) ou PyMuPDF no próprio processo (mupdf)')
+    ana_args.add_argument('--completo', action='store_true',
+                          help='Ignora os manifestos e refaz todos os artefatos')
+    ana_args.add_argument('--sem-imagens', action='store_true',
+                          help='Não gera PNG nem SVG; as páginas usam as imagens do servidor_imagens.py')
+    ana_args.add_argument('--formatos', '--formats', type=ler_lista, metavar='FMT,...',
+                          help='Formatos gerados para cada página, dentre txt, png e svg (txt é obrigatório), '
+                               'nos campi sem `formatos` no arquivo YAML')
+    ana_args.add_argument('--etapas', '--stages', type=ler_lista, metavar='ETAPA,...',
+                          help=f'Só estas etapas e as suas dependências, dentre {", ".join(grafo_etapas)}')
+    ana_args.add_argument('--dpi', type=int, default=ConfOtimizacao.dpi, help='Resolução dos PNG')
+    ana_args.add_argument('--nivel-png', type=int, choices=range(10), default=ConfOtimizacao.nivel_png,
+                          help='Nível de compressão do zlib para recomprimir os PNG (0 não recomprime)')
+    ana_args.add_argument('--glifos-compartilhados', action='store_true',
+                          help='Guarda os glifos dos SVG de cada categoria num único _glifos.svg')
+    ana_args.add_argument('--html', choices=('sphinx', 'nativo'), default='sphinx',
+                          help='Gera o HTML com o make html (sphinx) ou direto, sem Sphinx (nativo)')
+    ana_args.add_argument('--watch', action='store_true',
+                          help='Fica vigiando os diretórios de envios e atualiza cada campus a cada novo envio')
+    ana_args.add_argument('--atraso', type=float, default=5.0,
+                          help='Com --watch, segundos sem mudanças num diretório antes de processar um envio')
+    args = ana_args.parse_args()
+
+    campi = carrega_campi(pathlib.Path(args.arq_campi))
+    if args.campus:
+        campi = [conf for conf in campi if conf.nome in args.campus]
+    try:
+        for conf in campi:
+            planejar_etapas(args.etapas, conf.formatos or args.formatos)
+    except ValueError as erro:
+        ana_args.error(f'{conf.nome}: {erro}')
+
+    now = datetime.now()
+    fname = f"/tmp/colario_orquestrador_{now.strftime('%F_%T')}_{os.getpid()}.log"
+    print(f'Arquivo de log: {fname}')
+    logging.basicConfig(
+        filename=fname,
+        filemode='w',
+        format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+        level=logging.DEBUG
+    )
+
+    progresso = Progresso(len(campi))
+    metricas_campus = {conf.nome: Metricas() for conf in campi}
+    # Um só laço de conversão, com um só limite de --jobs comandos, para todos
+    # os campi
+    laco = None
+    if args.conversor == 'assincrono':
+        from concolario import LacoConversao
+        laco = LacoConversao(args.jobs)
+    if args.watch:
+        vigiar(campi, progresso, args, metricas_campus, laco)
+        sys.exit(0)
+
+    falhas = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs), thread_name_prefix='trabalhador') as conversoes, \
+         ThreadPoolExecutor(max_workers=max(1, len(campi)), thread_name_prefix='campus') as atualizadores:
+        futuros = {
+            atualizadores.submit(atualizar_campus, conf, conversoes, progresso, args, metricas_campus[conf.nome],
+                                 laco): conf
+            for conf in campi
+        }
+        for futuro in as_completed(futuros):
+            conf = futuros[futuro]
+            try:
+                futuro.result()
+            except Exception as erro:
+                falhas += 1
+                logging.exception(f'Falha ao atualizar {conf.nome}')
+                progresso.informar(conf.nome, f'FALHOU: {erro}', concluido=True)
+
+    for campus, metricas in metricas_campus.items():
+        logging.info(f'Resumo de {campus}:\n{metricas.resumo()}')
+        metricas.salvar(f'{fname[:-4]}_{campus}.json')
+
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
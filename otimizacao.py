@@ -0,0 +1,189 @@
+'''
+Pós-processamento das imagens geradas para cada página, para diminuir o
+tamanho do que é publicado:
+
+- SVG: coordenadas arredondadas a 3 casas decimais, sem espaços entre as
+  marcas e sem os <use> de glifos vazios (os espaços entre as palavras, que
+  são a maioria dos <use> do PyMuPDF). Opcionalmente, os glifos (definições
+  usadas por <use>) de todas as páginas de uma categoria vão para um único
+  `_glifos.svg`, e cada página só aponta para ele; como os nomes dos glifos
+  são o hash da definição, páginas de execuções diferentes podem
+  compartilhar o arquivo. Glifos que nenhuma página usa mais saem do
+  arquivo. Um navegador não carrega glifos de outro arquivo num SVG mostrado
+  com <img>, então a opção não vale quando o SVG é a imagem das páginas.
+- PNG: dados da imagem recomprimidos com o zlib no nível escolhido e sem
+  blocos de texto e data. Só é gravado se ficar menor. Desligado por
+  padrão: o pdftoppm já comprime bem, e o nível 9 custa muito tempo por
+  página para uns poucos por cento.
+'''
+
+from dataclasses import dataclass
+import hashlib
+import pathlib
+import re
+import struct
+import zlib
+
+from arquivos import escrever_se_mudou
+
+arq_glifos = '_glifos.svg'
+
+assinatura_png = b'\x89PNG\r\n\x1a\n'
+blocos_png_descartados = {b'tEXt', b'zTXt', b'iTXt', b'tIME'}
+
+re_numero = re.compile(r'-?\d*\.\d+')
+re_atributo_numerico = re.compile(
+    r'\b(d|transform|x|y|x1|y1|x2|y2|cx|cy|r|width|height|points|viewBox)="([^"]*)"')
+re_entre_marcas = re.compile(r'>\s+<')
+re_defs = re.compile(r'<defs>(.*?)</defs>', re.DOTALL)
+re_definicao = re.compile(r'<(symbol|path|g)\b([^>]*?)\bid="([^"]+)"([^>]*?)(/>|>.*?</\1>)', re.DOTALL)
+re_referencia = re.compile(r'((?:xlink:)?href)="#([^"]+)"')
+re_uso = re.compile(r'<use\b[^>]*?(?:xlink:)?href="#([^"]+)"[^>]*/>')
+re_glifo_externo = re.compile(rf'"{re.escape(arq_glifos)}#([^"]+)"')
+
+modelo_glifos = '''\
+<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"><defs>{}</defs></svg>
+'''
+
+
+@dataclass
+class ConfOtimizacao:
+    # Resolução dos PNG; 150 é o padrão do pdftoppm
+    dpi: int = 150
+    # Nível do zlib na recompressão dos PNG; 0 (padrão) não recomprime
+    nivel_png: int = 0
+    minificar_svg: bool = True
+    glifos_compartilhados: bool = False
+
+
+def _arredondar(numero: re.Match) -> str:
+    texto = f'{float(numero[0]):.3f}'.rstrip('0')
+    if numero.string[numero.end():numero.end()+1] == '.':
+        # Em "1.0004.5" o "1" juntaria com o ".5" seguinte
+        return texto + '0' if texto.endswith('.') else texto
+    texto = texto.rstrip('.')
+    if texto in ('0', '-0'):
+        return '0'
+    # ".5" em vez de "0.5", como o SVG permite
+    return texto.replace('0.', '.', 1) if texto.startswith(('0.', '-0.')) else texto
+
+
+def minificar_svg(texto: str) -> str:
+    vazios = {
+        definicao[3] for definicao in re_definicao.finditer(''.join(re_defs.findall(texto)))
+        if definicao[1] == 'path' and 'd=""' in definicao[2] + definicao[4]
+    }
+    if vazios:
+        texto = re_uso.sub(lambda uso: '' if uso[1] in vazios else uso[0], texto)
+    texto = re_atributo_numerico.sub(
+        lambda atributo: f'{atributo[1]}="{re_numero.sub(_arredondar, atributo[2])}"', texto)
+    return re_entre_marcas.sub('><', texto)
+
+
+def extrair_glifos(texto: str) -> tuple:
+    '''
+    Separa as definições usadas por <use> do resto do SVG. Retorna o SVG
+    apontando para `_glifos.svg#<id>` e {id: definição} dos glifos, com os
+    ids trocados pelo hash da definição.
+    '''
+    usados = {ref for _, ref in re_referencia.findall(texto)}
+    glifos = {}
+    novos_ids = {}
+
+    def separar(definicao: re.Match) -> str:
+        marca, antes, id_antigo, depois, resto = definicao.groups()
+        if id_antigo not in usados:
+            return definicao[0]
+        sem_id = f'<{marca}{antes}{depois}{resto}'
+        novo_id = 'g' + hashlib.sha1(sem_id.encode('utf-8')).hexdigest()[:12]
+        novos_ids[id_antigo] = novo_id
+        glifos[novo_id] = f'<{marca}{antes}id="{novo_id}"{depois}{resto}'
+        return ''
+
+    texto = re_defs.sub(lambda defs: f'<defs>{re_definicao.sub(separar, defs[1])}</defs>', texto)
+    texto = re_referencia.sub(
+        lambda ref: f'{ref[1]}="{arq_glifos}#{novos_ids[ref[2]]}"' if ref[2] in novos_ids else ref[0], texto)
+    return texto, glifos
+
+
+def glifos_usados(texto: str) -> set:
+    '''
+    Ids dos glifos compartilhados a que um SVG aponta.
+    '''
+    return set(re_glifo_externo.findall(texto))
+
+
+def juntar_glifos(cam_glifos: pathlib.Path, glifos: dict, manter: set = None) -> bool:
+    '''
+    Acrescenta `glifos` ao arquivo de glifos compartilhados da categoria.
+    Com `manter`, só ficam os glifos com esses ids.
+    '''
+    existentes = {}
+    if cam_glifos.exists():
+        existentes = {
+            definicao[3]: definicao[0]
+            for definicao in re_definicao.finditer(cam_glifos.read_text(encoding='utf-8'))
+        }
+    existentes.update(glifos)
+    if manter is not None:
+        existentes = {id_glifo: definicao for id_glifo, definicao in existentes.items() if id_glifo in manter}
+    return escrever_se_mudou(cam_glifos, modelo_glifos.format(''.join(existentes[i] for i in sorted(existentes))))
+
+
+def recomprimir_png(caminho: pathlib.Path, nivel: int = 9) -> int:
+    '''
+    Recomprime o PNG em `caminho`. Retorna quantos bytes foram economizados.
+    '''
+    dados = pathlib.Path(caminho).read_bytes()
+    if not dados.startswith(assinatura_png):
+        return 0
+
+    blocos = []
+    idat = []
+    posicao = len(assinatura_png)
+    while posicao < len(dados):
+        tamanho, tipo = struct.unpack('>I4s', dados[posicao:posicao+8])
+        conteudo = dados[posicao+8:posicao+8+tamanho]
+        posicao += 12 + tamanho
+        if tipo == b'IDAT':
+            if not idat:
+                blocos.append((tipo, None))
+            idat.append(conteudo)
+        elif tipo not in blocos_png_descartados:
+            blocos.append((tipo, conteudo))
+
+    comprimido = zlib.compress(zlib.decompress(b''.join(idat)), nivel)
+    novo = bytearray(assinatura_png)
+    for tipo, conteudo in blocos:
+        if conteudo is None:
+            conteudo = comprimido
+        novo += struct.pack('>I4s', len(conteudo), tipo) + conteudo
+        novo += struct.pack('>I', zlib.crc32(tipo + conteudo))
+
+    if len(novo) >= len(dados):
+        return 0
+    pathlib.Path(caminho).write_bytes(novo)
+    return len(dados) - len(novo)
+
+
+def otimizar_pagina(arq_alvo: pathlib.Path, formatos: tuple, conf: ConfOtimizacao) -> dict:
+    '''
+    Otimiza as imagens de uma página (`arq_alvo` sem extensão). Retorna os
+    bytes economizados por formato e, com glifos compartilhados, os glifos
+    extraídos do SVG.
+    '''
+    resultado = {'png': 0, 'svg': 0, 'glifos': {}}
+    if 'png' in formatos and conf.nivel_png > 0:
+        resultado['png'] = recomprimir_png(pathlib.Path(f'{arq_alvo}.png'), conf.nivel_png)
+
+    if 'svg' in formatos and (conf.minificar_svg or conf.glifos_compartilhados):
+        cam_svg = pathlib.Path(f'{arq_alvo}.svg')
+        original = cam_svg.read_text(encoding='utf-8')
+        texto = minificar_svg(original) if conf.minificar_svg else original
+        if conf.glifos_compartilhados:
+            texto, resultado['glifos'] = extrair_glifos(texto)
+        if texto != original:
+            cam_svg.write_text(texto, encoding='utf-8')
+        resultado['svg'] = len(original.encode('utf-8')) - len(texto.encode('utf-8'))
+    return resultado
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Publicação atômica de um diretório de artefatos (HTML, PDF, PNG, SVG, TXT).
+
+O destino publicado é um link simbólico para uma versão completa em
+`<versões>/<carimbo>`. As versões ficam fora da árvore servida, em
+/var/lib/colario/versoes/<caminho do destino> (ou em --versoes), para que
+as antigas não fiquem acessíveis na web; o servidor precisa seguir links
+simbólicos (nginx: o padrão; Apache: `Options FollowSymLinks`). Cada
+publicação monta uma versão nova e só no fim troca o link, de uma vez
+(rename), então o servidor web nunca vê um diretório pela metade.
+
+Na versão nova, os arquivos iguais aos da versão anterior são links
+físicos para eles: mantêm a data de modificação e, com ela, o ETag do
+servidor web, e o navegador não baixa de novo o que não mudou. Os textos
+(SVG, TXT, HTML, CSS, JS, JSON, ICS) ganham irmãos `.gz` e, com o pacote
+opcional `brotli`, `.br`, comprimidos em paralelo, para o servidor entregar
+sem comprimir a cada pedido (nginx: `gzip_static on;` e `brotli_static on;`).
+
+Cada versão tem um `.publicacao.json` com o hash SHA-256 e o ETag de cada
+arquivo.
+
+Exemplo:
+
+    ./publicacao.py md/_build/html /var/www/html/horario/parnamirim/2025.1
+'''
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pathlib
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+arq_manifesto = '.publicacao.json'
+extensoes_comprimidas = ('.svg', '.txt', '.html', '.css', '.js', '.json', '.ics')
+versoes_mantidas = 2
+dir_versoes_padrao = pathlib.Path('/var/lib/colario/versoes')
+# Destino que era um diretório comum, guardado como a versão mais antiga
+nome_antiga = 'antiga'
+
+
+def dir_versoes_destino(destino: pathlib.Path) -> pathlib.Path:
+    '''
+    Diretório padrão das versões de `destino`: o caminho absoluto do destino
+    dentro de `dir_versoes_padrao`.
+    '''
+    absoluto = pathlib.Path(os.path.abspath(destino))
+    return dir_versoes_padrao / absoluto.relative_to(absoluto.anchor)
+
+
+def ordem_versao(versao: pathlib.Path) -> tuple:
+    '''
+    Chave para ordenar as versões da mais antiga para a mais nova: pelo
+    carimbo no nome, com a `antiga` antes de todas.
+    '''
+    return versao.name != nome_antiga, versao.name
+
+
+def hash_arquivo(caminho: pathlib.Path) -> str:
+    sha = hashlib.sha256()
+    with open(caminho, mode='rb') as arq:
+        for bloco in iter(lambda: arq.read(1024 * 1024), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def comprimir(caminho: pathlib.Path) -> dict:
+    '''
+    Grava `caminho`.gz e, se possível, `caminho`.br, só quando ficam
+    menores. Retorna {extensão: tamanho} dos gravados.
+    '''
+    dados = caminho.read_bytes()
+    gravados = {}
+    # mtime=0: o mesmo conteúdo sempre dá o mesmo .gz
+    comprimidos = {'gz': gzip.compress(dados, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        comprimidos['br'] = brotli.compress(dados, quality=11)
+    for ext, conteudo in comprimidos.items():
+        if len(conteudo) < len(dados):
+            irmao = caminho.with_name(f'{caminho.name}.{ext}')
+            irmao.write_bytes(conteudo)
+            shutil.copystat(caminho, irmao)
+            gravados[ext] = len(conteudo)
+    return gravados
+
+
+def versao_atual(destino: pathlib.Path) -> pathlib.Path:
+    '''
+    Diretório da versão publicada em `destino`, ou None.
+    '''
+    if destino.is_symlink():
+        return destino.resolve()
+    return None
+
+
+def publicar(origem: pathlib.Path, destino: pathlib.Path, executor: ThreadPoolExecutor = None,
+             dir_versoes: pathlib.Path = None) -> dict:
+    '''
+    Publica o conteúdo de `origem` em `destino`, com as versões em
+    `dir_versoes` (por padrão, `dir_versoes_destino(destino)`). Retorna
+    quantos arquivos foram reaproveitados da versão anterior, copiados e
+    comprimidos.
+    '''
+    origem = pathlib.Path(origem)
+    destino = pathlib.Path(destino)
+    dir_versoes = pathlib.Path(dir_versoes or dir_versoes_destino(destino))
+    dir_versoes.mkdir(parents=True, exist_ok=True)
+    dir_versoes = dir_versoes.resolve()
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    anterior = versao_atual(destino)
+    manifesto_anterior = {}
+    # Links físicos só dentro do mesmo diretório de versões
+    if anterior is not None and anterior.parent == dir_versoes and (anterior / arq_manifesto).exists():
+        with open(anterior / arq_manifesto, mode='r', encoding='utf-8') as man_arq:
+            manifesto_anterior = json.load(man_arq)
+
+    nova = dir_versoes / datetime.now().strftime('%Y%m%d%H%M%S%f')
+    nova.mkdir()
+    manifesto = {}
+    estatisticas = {'reaproveitados': 0, 'copiados': 0, 'comprimidos': 0}
+    a_comprimir = []
+    try:
+        for arq in sorted(origem.rglob('*')):
+            relativo = arq.relative_to(origem).as_posix()
+            alvo = nova / relativo
+            if arq.is_dir():
+                alvo.mkdir(exist_ok=True)
+                continue
+            info = arq.stat()
+            item = manifesto_anterior.get(relativo)
+            # Tamanho e data iguais dispensam o hash; senão, o hash decide
+            if item and item['tamanho'] == info.st_size and item['mtime_origem'] == info.st_mtime_ns:
+                sha = item['sha256']
+            else:
+                sha = hash_arquivo(arq)
+
+            if item and item['sha256'] == sha:
+                os.link(anterior / relativo, alvo)
+                for ext in item.get('comprimidos', {}):
+                    os.link(anterior / f'{relativo}.{ext}', nova / f'{relativo}.{ext}')
+                estatisticas['reaproveitados'] += 1
+                comprimidos = item.get('comprimidos', {})
+            else:
+                shutil.copy2(arq, alvo)
+                estatisticas['copiados'] += 1
+                comprimidos = None
+                if arq.suffix in extensoes_comprimidas:
+                    a_comprimir.append(relativo)
+
+            manifesto[relativo] = {
+                'sha256': sha,
+                'etag': f'"{sha[:16]}"',
+                'tamanho': info.st_size,
+                'mtime_origem': info.st_mtime_ns,
+                'comprimidos': comprimidos or {},
+            }
+
+        mapa = executor.map if executor is not None else map
+        for relativo, gravados in zip(a_comprimir, mapa(comprimir, [nova / r for r in a_comprimir])):
+            manifesto[relativo]['comprimidos'] = gravados
+            estatisticas['comprimidos'] += bool(gravados)
+
+        with open(nova / arq_manifesto, mode='w', encoding='utf-8') as man_arq:
+            json.dump(manifesto, man_arq, indent=1, sort_keys=True)
+    except BaseException:
+        shutil.rmtree(nova, ignore_errors=True)
+        raise
+
+    # Troca atômica do link
+    link_temp = destino.with_name(f'.{destino.name}.novo')
+    link_temp.unlink(missing_ok=True)
+    link_temp.symlink_to(nova)
+    # Um diretório comum no destino (publicações antigas, feitas com cp) sai
+    # do caminho com um rename no mesmo diretório, para que o destino falte
+    # só por um instante, e depois vira a versão mais antiga guardada, no
+    # lugar de alguma que tenha sobrado
+    afastado = None
+    if destino.exists() and not destino.is_symlink():
+        afastado = destino.with_name(f'.{destino.name}.{nome_antiga}')
+        shutil.rmtree(afastado, ignore_errors=True)
+        destino.rename(afastado)
+    os.replace(link_temp, destino)
+    if afastado is not None:
+        shutil.rmtree(dir_versoes / nome_antiga, ignore_errors=True)
+        shutil.move(afastado, dir_versoes / nome_antiga)
+    # Versões que ficavam ao lado do destino, dentro da árvore servida
+    shutil.rmtree(destino.with_name(f'{destino.name}.versoes'), ignore_errors=True)
+    logging.info(f"Publicado {origem} em {destino} -> {nova.name}: {estatisticas['reaproveitados']} "
+                 f"reaproveitados, {estatisticas['copiados']} copiados, {estatisticas['comprimidos']} comprimidos.")
+
+    # Só a versão publicada e a anterior ficam. A ordem vem do carimbo no
+    # nome: a data de um diretório muda quando se mexe no que está dentro
+    versoes = sorted((v for v in dir_versoes.iterdir() if v.is_dir()), key=ordem_versao)
+    for velha in versoes[:-versoes_mantidas]:
+        if velha not in (nova, anterior):
+            shutil.rmtree(velha, ignore_errors=True)
+    return estatisticas
+
+
+def main():
+    ana_args = argparse.ArgumentParser(description='Publica um diretório de forma atômica, com arquivos comprimidos')
+    ana_args.add_argument('origem', help='Diretório com os arquivos a publicar')
+    ana_args.add_argument('destino', help='Caminho publicado (vira um link simbólico para a versão atual)')
+    ana_args.add_argument('--versoes', metavar='DIR',
+                          help=f'Diretório das versões do destino, fora da árvore servida '
+                               f'(padrão: {dir_versoes_padrao}/<caminho do destino>)')
+    ana_args.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                          help='Número de arquivos comprimidos em paralelo')
+    args = ana_args.parse_args()
+
+    logging.basicConfig(format='%(asctime)s - %(levelname)s - %(message)s', level=logging.INFO)
+    if brotli is None:
+        logging.warning('Pacote brotli ausente; só os .gz serão gerados.')
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        estatisticas = publicar(pathlib.Path(args.origem), pathlib.Path(args.destino), executor,
+                                pathlib.Path(args.versoes) if args.versoes else None)
+    print(f"{args.destino}: {estatisticas['reaproveitados']} reaproveitados, {estatisticas['copiados']} copiados, "
+          f"{estatisticas['comprimidos']} comprimidos.")
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+'''
+Referências entre categorias: quais membros (professor, sala, turma) são
+citados no texto de cada célula das grades.
+
+Cada membro é indexado pelo slug do nome e pelas abreviações de
+`abrev/<categoria>.csv`. As células são resolvidas uma única vez por texto
+distinto, procurando no índice cada sequência de até `max_palavras` termos.
+'''
+
+from slugify import slugify
+
+max_palavras = 6
+
+
+class Referencias:
+    '''
+    Índice de chave (texto em forma de slug) -> membros [(categoria, slug)].
+    '''
+
+    def __init__(self, grades, nomes: dict, abreviacoes: dict = None):
+        '''
+        `nomes` é {categoria: {slug: nome}} e `abreviacoes` é
+        {categoria: {abreviação: nome}}, como em carrega_abreviacoes().
+        '''
+        self._grades = grades
+        self._chaves = {}
+        self._cache = {}
+        self._palavras = 1
+
+        for categoria, membros in nomes.items():
+            for slug, nome in membros.items():
+                self._indexar(slugify(nome), categoria, slug)
+                self._indexar(slug, categoria, slug)
+
+        for categoria, abrevs in (abreviacoes or {}).items():
+            membros = nomes.get(categoria, {})
+            for abrev, nome in abrevs.items():
+                slug = slugify(nome)
+                if slug in membros:
+                    self._indexar(slugify(abrev), categoria, slug)
+
+    def _indexar(self, chave: str, categoria: str, slug: str):
+        if not chave:
+            return
+        membros = self._chaves.setdefault(chave, [])
+        if (categoria, slug) not in membros:
+            membros.append((categoria, slug))
+        self._palavras = min(max_palavras, max(self._palavras, chave.count('-') + 1))
+
+    def procurar(self, texto: str) -> list:
+        return self._chaves.get(slugify(texto), [])
+
+    def da_celula(self, codigo_celula: int) -> tuple:
+        '''
+        Membros citados na célula, sem repetição, na ordem em que aparecem.
+        '''
+        refs = self._cache.get(codigo_celula)
+        if refs is None:
+            termos = [self._grades.termos.texto(t) for t in self._grades.termos_celula(codigo_celula)]
+            achados = []
+            for inicio in range(len(termos)):
+                for fim in range(inicio + 1, min(len(termos), inicio + self._palavras) + 1):
+                    for membro in self.procurar(' '.join(termos[inicio:fim])):
+                        if membro not in achados:
+                            achados.append(membro)
+            refs = self._cache[codigo_celula] = tuple(achados)
+        return refs
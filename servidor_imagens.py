@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+'''
+Servidor WSGI que gera as imagens dos horários sob demanda, para usar com
+`colario.py --sem-imagens`.
+
+Atende
+
+    /png/<campus>/<categoria>/<slug>.png
+    /svg/<campus>/<categoria>/<slug>.svg
+
+convertendo, no primeiro pedido, o PDF da página publicado em
+<dir_pdf>/<campus>/<categoria>/<slug>.pdf. As imagens geradas ficam num
+cache em disco limitado por tamanho; quando ele enche, saem as imagens
+pedidas há mais tempo. Cada imagem é guardada com o tamanho e a data do
+PDF de que saiu: um PDF publicado de novo, mesmo com uma data antiga
+(cp -p, link físico), gera a imagem de novo.
+
+Exemplo, atrás do servidor web em /horario/png e /horario/svg (os mesmos
+endereços dos links "Baixar"):
+
+    ./servidor_imagens.py /var/www/html/horario/pdf --cache /var/cache/colario/imagens --porta 8010
+'''
+
+import argparse
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from email.utils import formatdate
+import logging
+import os
+import pathlib
+import re
+from socketserver import ThreadingMixIn
+import subprocess
+import sys
+import tempfile
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from conversor import comando
+from otimizacao import ConfOtimizacao, otimizar_pagina
+
+re_caminho = re.compile(r'^/(?P<fmt>png|svg)/(?P<campus>[a-z0-9-]+)/(?P<categoria>professor|sala|turma)/'
+                        r'(?P<slug>[a-z0-9-]+)\.(?P=fmt)$')
+
+tipos_conteudo = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+
+class CacheImagens:
+    '''
+    Cache LRU em disco, limitado a `tamanho_max` bytes. A ordem de uso é a
+    data de modificação dos arquivos, atualizada a cada acesso, e por isso
+    sobrevive ao reinício do servidor. A validade da imagem não depende dessa
+    data: o caminho no cache, <fmt>/<campus>/<categoria>/<slug>/<tamanho do
+    PDF>-<data do PDF em ns>.<fmt>, identifica o PDF de origem.
+    '''
+
+    def __init__(self, dir_cache: pathlib.Path, tamanho_max: int, otimizacao: ConfOtimizacao = None):
+        self.dir_cache = pathlib.Path(dir_cache)
+        self.otimizacao = otimizacao or ConfOtimizacao()
+        self.dir_cache.mkdir(parents=True, exist_ok=True)
+        self.tamanho_max = tamanho_max
+        self._trava = threading.Lock()
+        # imagem -> [trava, pedidos que a usam]; sai quando ninguém usa
+        self._travas_itens = {}
+        # caminho relativo -> tamanho, do menos para o mais recentemente usado
+        self._itens = OrderedDict()
+        self._total = 0
+        self.acertos = 0
+        self.falhas = 0
+
+        arquivos = []
+        for arq in self.dir_cache.rglob('*'):
+            if not arq.is_file():
+                continue
+            partes = arq.relative_to(self.dir_cache).parts
+            if arq.suffix[1:] in tipos_conteudo and len(partes) == 5 and not partes[0].startswith('.tmp-'):
+                arquivos.append((arq.stat().st_mtime, arq))
+            else:
+                # Restos de conversões interrompidas e do formato antigo do cache
+                arq.unlink()
+        for _, arq in sorted(arquivos):
+            self._registrar(arq.relative_to(self.dir_cache).as_posix(), arq.stat().st_size)
+        with self._trava:
+            self._expulsar()
+        logging.info(f'Cache de imagens em {self.dir_cache}: {len(self._itens)} arquivos, {self._total} bytes.')
+
+    def _registrar(self, chave: str, tamanho: int):
+        self._total -= self._itens.pop(chave, 0)
+        self._itens[chave] = tamanho
+        self._total += tamanho
+
+    def _expulsar(self):
+        # O item mais recente fica, mesmo que sozinho passe do limite
+        while self._total > self.tamanho_max and len(self._itens) > 1:
+            chave, tamanho = self._itens.popitem(last=False)
+            self._total -= tamanho
+            (self.dir_cache / chave).unlink(missing_ok=True)
+            logging.debug(f'Imagem {chave} removida do cache.')
+
+    @contextmanager
+    def _trava_item(self, imagem: str):
+        '''
+        Trava exclusiva de uma imagem, criada no primeiro pedido e descartada
+        quando o último termina.
+        '''
+        with self._trava:
+            item = self._travas_itens.setdefault(imagem, [threading.Lock(), 0])
+            item[1] += 1
+        try:
+            with item[0]:
+                yield
+        finally:
+            with self._trava:
+                item[1] -= 1
+                if not item[1]:
+                    del self._travas_itens[imagem]
+
+    def _descartar_versoes(self, dir_versoes: pathlib.Path, atual: str):
+        '''
+        Tira do cache as imagens geradas de versões anteriores do PDF.
+        Chamada com self._trava.
+        '''
+        for arq in dir_versoes.glob('*'):
+            chave = arq.relative_to(self.dir_cache).as_posix()
+            if chave != atual:
+                self._total -= self._itens.pop(chave, 0)
+                arq.unlink(missing_ok=True)
+
+    def abrir(self, fmt: str, campus: str, categoria: str, slug: str, arq_pdf: pathlib.Path):
+        '''
+        Arquivo aberto (binário) da imagem da página no cache, gerada agora se
+        preciso. Aberto antes de soltar as travas, para que uma expulsão do
+        cache por outro pedido não atrapalhe a resposta.
+        '''
+        info_pdf = arq_pdf.stat()
+        imagem = f'{fmt}/{campus}/{categoria}/{slug}'
+        chave = f'{imagem}/{info_pdf.st_size}-{info_pdf.st_mtime_ns}.{fmt}'
+        destino = self.dir_cache / chave
+        # Pedidos simultâneos da mesma imagem esperam uma única conversão
+        with self._trava_item(imagem):
+            with self._trava:
+                if chave in self._itens:
+                    self.acertos += 1
+                    self._itens.move_to_end(chave)
+                    os.utime(destino)
+                    return open(destino, mode='rb')
+
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.TemporaryDirectory(dir=self.dir_cache, prefix='.tmp-') as dir_temp:
+                alvo = pathlib.Path(dir_temp) / slug
+                processo = subprocess.run(comando(fmt, arq_pdf, alvo, self.otimizacao.dpi),
+                                          capture_output=True, text=True)
+                if processo.returncode != 0:
+                    raise RuntimeError(f'Conversão de {arq_pdf} para {fmt} falhou ({processo.returncode}):\n'
+                                       f'{processo.stderr}')
+                otimizar_pagina(alvo, (fmt,), self.otimizacao)
+                os.replace(f'{alvo}.{fmt}', destino)
+
+            with self._trava:
+                arq = open(destino, mode='rb')
+                self.falhas += 1
+                self._descartar_versoes(destino.parent, chave)
+                self._registrar(chave, os.fstat(arq.fileno()).st_size)
+                self._expulsar()
+            logging.info(f'Imagem {chave} gerada ({os.fstat(arq.fileno()).st_size} bytes).')
+            return arq
+
+
+class AplicacaoImagens:
+    '''
+    Aplicação WSGI que entrega as imagens do cache.
+    '''
+
+    def __init__(self, dir_pdf: pathlib.Path, cache: CacheImagens, validade: int = 3600):
+        self.dir_pdf = pathlib.Path(dir_pdf)
+        self.cache = cache
+        self.validade = validade
+
+    def _erro(self, start_response, status: str):
+        corpo = status.encode('utf-8')
+        start_response(status, [('Content-Type', 'text/plain; charset=utf-8'),
+                                ('Content-Length', str(len(corpo)))])
+        return [corpo]
+
+    def __call__(self, environ, start_response):
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self._erro(start_response, '405 Method Not Allowed')
+
+        encontrado = re_caminho.match(environ.get('PATH_INFO', ''))
+        if encontrado is None:
+            return self._erro(start_response, '404 Not Found')
+        fmt, campus, categoria, slug = encontrado.group('fmt', 'campus', 'categoria', 'slug')
+        arq_pdf = self.dir_pdf / campus / categoria / f'{slug}.pdf'
+        if not arq_pdf.is_file():
+            return self._erro(start_response, '404 Not Found')
+
+        try:
+            arq = self.cache.abrir(fmt, campus, categoria, slug, arq_pdf)
+        except Exception:
+            logging.exception(f'Falha ao gerar {environ["PATH_INFO"]}')
+            return self._erro(start_response, '500 Internal Server Error')
+
+        start_response('200 OK', [
+            ('Content-Type', tipos_conteudo[fmt]),
+            ('Content-Length', str(os.fstat(arq.fileno()).st_size)),
+            ('Last-Modified', formatdate(arq_pdf.stat().st_mtime, usegmt=True)),
+            ('Cache-Control', f'public, max-age={self.validade}'),
+        ])
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            arq.close()
+            return []
+        return environ.get('wsgi.file_wrapper', lambda a: iter(lambda: a.read(65536), b''))(arq)
+
+
+class ServidorThreads(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class ManipuladorLog(WSGIRequestHandler):
+    def log_message(self, formato, *args):
+        logging.info(f'{self.address_string()} {formato % args}')
+
+
+def main():
+    ana_args = argparse.ArgumentParser(description='Gera as imagens dos horários sob demanda')
+    ana_args.add_argument('dir_pdf', help='Diretório com os PDFs publicados, <campus>/<categoria>/<slug>.pdf')
+    ana_args.add_argument('--cache', default='/var/cache/colario/imagens', help='Diretório do cache de imagens')
+    ana_args.add_argument('--tamanho-cache', type=int, default=512, help='Tamanho máximo do cache, em MiB')
+    ana_args.add_argument('--dpi', type=int, default=ConfOtimizacao.dpi, help='Resolução dos PNG')
+    ana_args.add_argument('--nivel-png', type=int, choices=range(10), default=ConfOtimizacao.nivel_png,
+                          help='Nível de compressão do zlib para recomprimir os PNG (0 não recomprime)')
+    ana_args.add_argument('--endereco', default='127.0.0.1', help='Endereço em que o servidor escuta')
+    ana_args.add_argument('--porta', type=int, default=8010, help='Porta em que o servidor escuta')
+    args = ana_args.parse_args()
+
+    now = datetime.now()
+    fname = f"/tmp/colario_imagens_{now.strftime('%F_%T')}_{os.getpid()}.log"
+    print(f'Arquivo de log: {fname}')
+    logging.basicConfig(
+        filename=fname,
+        filemode='w',
+        format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+        level=logging.INFO
+    )
+
+    cache = CacheImagens(pathlib.Path(args.cache), args.tamanho_cache * 1024 * 1024,
+                         ConfOtimizacao(dpi=args.dpi, nivel_png=args.nivel_png))
+    aplicacao = AplicacaoImagens(pathlib.Path(args.dir_pdf), cache)
+    with make_server(args.endereco, args.porta, aplicacao,
+                     server_class=ServidorThreads, handler_class=ManipuladorLog) as servidor:
+        print(f'Servindo imagens de {args.dir_pdf} em http://{args.endereco}:{args.porta}/')
+        try:
+            servidor.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    logging.info(f'Cache: {cache.acertos} acertos, {cache.falhas} imagens geradas.')
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+'''
+Os testes usam um poppler falso (tests/poppler_falso): o "PDF" é um texto
+com as páginas separadas por \f, e cada programa imita o comportamento do
+verdadeiro que importa ao colario.
+'''
+
+import os
+import pathlib
+import shutil
+import sys
+
+import pytest
+
+dir_testes = pathlib.Path(__file__).resolve().parent
+sys.path.insert(0, str(dir_testes.parent))
+
+
+def escrever_pdf_falso(caminho: pathlib.Path, paginas: list):
+    caminho.write_text(''.join(f'{pagina}\f' for pagina in paginas), encoding='utf-8')
+
+
+@pytest.fixture
+def poppler_falso(monkeypatch):
+    monkeypatch.setenv('PATH', f"{dir_testes / 'poppler_falso'}{os.pathsep}{os.environ.get('PATH', '')}")
+
+
+@pytest.fixture
+def campus(tmp_path, poppler_falso) -> pathlib.Path:
+    '''
+    Cópia do campus de exemplo em tests/dados/campus: PDFs falsos de
+    professores, salas e turmas, abreviações e validade do horário.
+    '''
+    destino = tmp_path / 'horario'
+    shutil.copytree(dir_testes / 'dados' / 'campus', destino)
+    return destino
@@ -0,0 +1,31 @@
+// Gerado pelo colario: busca no índice invertido dos horários.
+const dirBusca = new URL('.', document.currentScript.src);
+const partes = new Map();
+
+function normalizarTermo(termo) {
+  return termo.normalize('NFD').replace(/[\u0300-\u036f]/g, '').toLowerCase()
+    .replace(/[^a-z0-9]+/g, '-').replace(/^-+|-+$/g, '');
+}
+
+async function carregarJSON(nome) {
+  if (!partes.has(nome)) {
+    partes.set(nome, fetch(new URL(nome, dirBusca)).then(r => r.ok ? r.json() : {}));
+  }
+  return partes.get(nome);
+}
+
+async function buscarHorarios(consulta) {
+  const termos = consulta.split(/\s+/).map(normalizarTermo).filter(t => t.length > 1);
+  if (!termos.length) return [];
+  let resultado = null;
+  for (const termo of termos) {
+    const parte = await carregarJSON(`termos-${termo[0]}.json`);
+    const docs = new Set(parte[termo] || []);
+    resultado = resultado === null ? docs : new Set([...resultado].filter(d => docs.has(d)));
+  }
+  const documentos = await carregarJSON('documentos.json');
+  return [...resultado].sort((a, b) => a - b).map(d => {
+    const [categoria, slug, nome] = documentos[d];
+    return {categoria, slug, nome};
+  });
+}
@@ -0,0 +1,28 @@
+import subprocess
+import sys
+
+from conftest import dir_testes
+from colagenda import carrega_validade, dobrar
+
+
+def test_importar_com_horario_yaml_vazio(tmp_path):
+    (tmp_path / 'horario.yaml').write_text('', encoding='utf-8')
+    processo = subprocess.run([sys.executable, '-c', 'import colario'], cwd=tmp_path, capture_output=True,
+                              text=True, env={'PYTHONPATH': str(dir_testes.parent)})
+    assert processo.returncode == 0, processo.stderr
+
+
+def test_carrega_validade(tmp_path):
+    assert carrega_validade(tmp_path) is None
+    (tmp_path / 'horario.yaml').write_text('', encoding='utf-8')
+    assert carrega_validade(tmp_path) is None
+    ini, fim = carrega_validade(dir_testes / 'dados' / 'campus')
+    assert (ini.isoformat(), fim.isoformat()) == ('2026-02-02', '2026-06-30')
+
+
+def test_dobrar():
+    linha = 'SUMMARY:' + 'é' * 60
+    dobrada = dobrar(linha)
+    partes = dobrada[:-2].split('\r\n ')
+    assert ''.join(partes) == linha
+    assert all(len(parte.encode('utf-8')) <= 75 for parte in partes)
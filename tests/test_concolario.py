@@ -0,0 +1,71 @@
+import os
+import sys
+
+import pytest
+
+from concolario import ConversorAssincrono, ErroConversao
+from conftest import dir_testes, escrever_pdf_falso
+from conversor import conversores
+
+
+@pytest.fixture
+def sem_pdftotext(tmp_path, monkeypatch):
+    '''
+    Só o pdfseparate no PATH: a separação funciona e a conversão das
+    páginas não encontra o pdftotext.
+    '''
+    dir_bin = tmp_path / 'bin'
+    dir_bin.mkdir()
+    (dir_bin / 'pdfseparate').symlink_to(dir_testes / 'poppler_falso' / 'pdfseparate')
+    (dir_bin / 'python3').symlink_to(sys.executable)
+    monkeypatch.setenv('PATH', str(dir_bin))
+
+
+def test_programa_ausente(tmp_path, sem_pdftotext):
+    arq_pdf = tmp_path / 'sala.pdf'
+    escrever_pdf_falso(arq_pdf, [f'Sala {num}' for num in range(1, 4)])
+    conversor = ConversorAssincrono(formatos=('txt',), max_tarefas=2)
+
+    # Repassado como ErroConversao, e não como ExceptionGroup
+    with pytest.raises(ErroConversao) as erro:
+        conversor.separar(arq_pdf, tmp_path / 'sala-%d.pdf')
+    assert erro.value.codigo == 127
+    assert erro.value.cmd[0] == 'pdftotext'
+    assert any(item['codigo'] == 127 for item in conversor.metricas.comandos)
+
+
+def test_um_pdfseparate_por_pdf(tmp_path, poppler_falso):
+    arq_pdf = tmp_path / 'sala.pdf'
+    escrever_pdf_falso(arq_pdf, [f'Sala {num}' for num in range(1, 8)])
+    conversor = ConversorAssincrono(formatos=('txt',), max_tarefas=2)
+    conversor.separar(arq_pdf, tmp_path / 'sala-%02d.pdf', reaproveitavel=lambda arq: arq.name == 'sala-03.pdf')
+
+    programas = [item['comando'].split()[0] for item in conversor.metricas.comandos]
+    assert programas.count('pdfseparate') == 1
+    # Todas as páginas convertidas, menos a reaproveitada
+    assert sorted(arq.name for arq in tmp_path.glob('*.txt')) == [
+        f'sala-{num:02d}.txt' for num in range(1, 8) if num != 3]
+    assert (tmp_path / 'sala-07.txt').read_text(encoding='utf-8').startswith('Sala 7')
+
+
+def test_comando_com_erro(tmp_path, poppler_falso):
+    conversor = ConversorAssincrono(formatos=('txt',))
+    with pytest.raises(ErroConversao) as erro:
+        conversor.separar(tmp_path / 'inexistente.pdf', tmp_path / 'p-%d.pdf')
+    assert erro.value.cmd[0] == 'pdfseparate'
+
+
+def test_jobs_chega_ao_conversor(campus, monkeypatch):
+    from colario import processar_campus
+
+    criados = []
+
+    def fabrica(*args, **kwargs):
+        criados.append(conversores['assincrono'](*args, **kwargs))
+        return criados[-1]
+    monkeypatch.setitem(conversores, 'assincrono_espiao', fabrica)
+
+    processar_campus('campus', campus, conversor='assincrono_espiao', formatos=('txt',),
+                     etapas=('split', 'txt', 'md'), jobs=3)
+    assert [conversor.max_tarefas for conversor in criados] == [3]
+    assert conversores['assincrono']().max_tarefas == os.cpu_count()
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+from conflitos import MapaOcupacao, iterar_bits
+from desempenho import pagina_horario
+from grade import Grades, dias, horarios, indice, total_celulas
+from referencias import Referencias
+
+
+def montar(paginas: dict) -> tuple:
+    '''
+    Grades, referências e mapa de ocupação de {(categoria, nome): {(horario, dia): texto}}.
+    '''
+    grades = Grades()
+    nomes = {}
+    for (categoria, nome), celulas in paginas.items():
+        slug = nome.lower()
+        nomes.setdefault(categoria, {})[slug] = nome
+        grades.adicionar(categoria, slug, '\n'.join(pagina_horario(nome, celulas)))
+    referencias = Referencias(grades, nomes)
+    return grades, referencias, MapaOcupacao(grades, referencias)
+
+
+def test_sala_com_duas_turmas():
+    grades, _, mapa = montar({
+        ('turma', 'T01'): {(1, 0): 'D1 S01', (2, 0): 'D2 S02'},
+        ('turma', 'T02'): {(1, 0): 'D3 S01'},
+        ('sala', 'S01'): {},
+        ('sala', 'S02'): {(3, 4): 'D4 T02'},
+    })
+    assert mapa.conflitos() == [{
+        'categoria': 'sala', 'slug': 's01', 'descricao': 'sala com duas aulas ao mesmo tempo',
+        'dia': 'Seg', 'horario': 1, 'intervalo': ' - '.join(horarios[0]), 'origem': 'turma',
+        'membros': ['t01', 't02'],
+    }]
+    # Ocupada pelas citações, mesmo com a própria grade vazia
+    assert mapa.ocupacao[('sala', 's01')] == 1 << indice(1, 0)
+    assert mapa.livres('sala', 1, 0) == ['s02']
+    assert mapa.livres('sala', 2, 0) == ['s01']
+    assert mapa.livres('sala', 3, 4) == ['s01']
+    assert mapa.relacionados()[('sala', 's01')] == (('turma', 't01'), ('turma', 't02'))
+    assert mapa.relacionados()[('turma', 't02')] == (('sala', 's01'), ('sala', 's02'))
+
+
+def test_iterar_bits():
+    assert list(iterar_bits(0)) == []
+    assert list(iterar_bits(0b1010001)) == [0, 4, 6]
+    assert list(iterar_bits(1 << 84)) == [84]
+
+
+@pytest.mark.parametrize('semente', range(5))
+def test_igual_a_forca_bruta(semente):
+    aleatorio = random.Random(semente)
+    turmas = [f'T{i:02d}' for i in range(8)]
+    salas = [f'S{i:02d}' for i in range(4)]
+    professores = [f'P{i:02d}' for i in range(5)]
+    paginas = {(categoria, nome): {} for categoria, nomes in
+               (('turma', turmas), ('sala', salas), ('professor', professores)) for nome in nomes}
+    for turma in turmas:
+        for horario in range(1, len(horarios) + 1):
+            for dia in range(len(dias)):
+                if aleatorio.random() < 0.7:
+                    continue
+                sala, professor = aleatorio.choice(salas), aleatorio.choice(professores)
+                paginas[('turma', turma)][(horario, dia)] = f'D {sala} {professor}'
+                if aleatorio.random() < 0.5:
+                    paginas[('professor', professor)][(horario, dia)] = f'D {turma}'
+    grades, referencias, mapa = montar(paginas)
+
+    # Para cada célula, quem cita quem, comparando cada membro com a célula
+    citantes = {}
+    for categoria, slug in grades.membros():
+        for i, codigo in enumerate(grades.grade(categoria, slug)):
+            for citado in referencias.da_celula(codigo) if codigo else ():
+                if citado[0] != categoria:
+                    citantes.setdefault((citado, categoria, i), set()).add(slug)
+
+    ocupadas = {}
+    for membro in grades.membros():
+        celulas = {i for i, codigo in enumerate(grades.grade(*membro)) if codigo}
+        ocupadas[membro] = celulas | {i for (citado, _, i) in citantes if citado == membro}
+        assert set(iterar_bits(mapa.ocupacao.get(membro, 0))) == ocupadas[membro]
+
+    esperados = sorted((citado, origem, i, sorted(slugs)) for (citado, origem, i), slugs in citantes.items()
+                       if len(slugs) > 1)
+    obtidos = sorted(((c['categoria'], c['slug']), c['origem'], indice(c['horario'], dias.index(c['dia'])),
+                      c['membros']) for c in mapa.conflitos())
+    assert esperados and obtidos == esperados
+
+    for i in range(total_celulas):
+        horario, dia = divmod(i, len(dias))
+        livres = [s for c, s in sorted(grades.membros('sala')) if i not in ocupadas[(c, s)]]
+        assert mapa.livres('sala', horario + 1, dia) == livres
@@ -0,0 +1,101 @@
+import asyncio
+from http import HTTPStatus
+import json
+import os
+
+import pytest
+
+from colario import arq_manifesto, processar_campus
+from consultas import ErroConsulta, ServicoConsultas
+
+
+@pytest.fixture
+def servico(campus):
+    processar_campus('campus', campus, etapas=('split', 'txt', 'md'))
+    return ServicoConsultas(campus)
+
+
+def consultar(servico, caminho, **consulta):
+    status, corpo = servico.responder(caminho, {chave: [valor] for chave, valor in consulta.items()})
+    assert status == HTTPStatus.OK
+    return json.loads(corpo)
+
+
+def test_membros_e_aulas(servico):
+    assert [m['slug'] for m in consultar(servico, '/membros/sala')] == ['a101', 'a102', 'lab01', 'lab02']
+
+    aula = consultar(servico, '/horario/sala/a101', dia='ter', hora='9:40')['aula']
+    assert (aula['dia'], aula['horario'], aula['texto']) == ('Ter', 4, 'TEC.0003 INT_INFO_2M')
+    assert aula['relacionados'] == [{'categoria': 'turma', 'slug': 'int-info-2m', 'nome': 'INT_INFO_2M'}]
+    # Célula vazia na grade da sala, mas citada nas de professor e turma
+    aula = consultar(servico, '/horario/sala/a101', dia='Seg', horario='2')['aula']
+    assert {r['slug'] for r in aula['relacionados']} == {'bruno-lima', 'int-info-1m'}
+    assert consultar(servico, '/horario/sala/a101', dia='Seg', hora='7:45')['aula'] == aula
+    # Fora dos horários de aula
+    assert consultar(servico, '/horario/sala/a101', dia='Seg', hora='12:30')['aula'] is None
+
+    assert [m['slug'] for m in consultar(servico, '/livres/sala', dia='Ter', hora='9:40')] == ['lab01']
+    grade = consultar(servico, '/membros/professor/ana-souza')
+    assert grade['nome'] == 'Ana Souza' and grade['aulas']
+
+
+def test_cache_e_erros(servico):
+    consultar(servico, '/livres/sala', dia='Ter', hora='9:40')
+    consultar(servico, '/livres/sala', dia='ter', horario='4')
+    assert (servico.acertos, servico.falhas) == (1, 1)
+
+    for caminho, consulta, status in (('/membros/bloco', {}, HTTPStatus.NOT_FOUND),
+                                      ('/membros/sala/z999', {}, HTTPStatus.NOT_FOUND),
+                                      ('/livres/sala', {'dia': ['Dom'], 'hora': ['9:40']}, HTTPStatus.BAD_REQUEST),
+                                      ('/livres/sala', {'dia': ['Seg'], 'horario': ['18']}, HTTPStatus.BAD_REQUEST)):
+        with pytest.raises(ErroConsulta) as erro:
+            servico.responder(caminho, consulta)
+        assert erro.value.status == status
+
+
+def test_http_e_recarga(servico, campus):
+    servico.intervalo_recarga = 0.01
+
+    async def pedir():
+        servidor = await asyncio.start_server(servico.atender, '127.0.0.1', 0)
+        porta = servidor.sockets[0].getsockname()[1]
+        leitor, escritor = await asyncio.open_connection('127.0.0.1', porta)
+        respostas = []
+        # Dois pedidos na mesma conexão
+        for alvo in ('/membros/turma', '/horario/turma/int-info-2m?dia=Ter&hora=9:40'):
+            escritor.write(f'GET {alvo} HTTP/1.1\r\nHost: x\r\n\r\n'.encode())
+            await escritor.drain()
+            status = (await leitor.readline()).split()[1]
+            cabecalhos = {}
+            while (linha := await leitor.readline()) != b'\r\n':
+                nome, _, valor = linha.decode().partition(':')
+                cabecalhos[nome.lower()] = valor.strip()
+            corpo = await leitor.readexactly(int(cabecalhos['content-length']))
+            respostas.append((int(status), cabecalhos['connection'], json.loads(corpo)))
+        escritor.close()
+        servidor.close()
+
+        # Uma nova execução regrava o manifesto: dados recarregados, cache limpo
+        dados = servico.dados
+        info = (campus / arq_manifesto).stat()
+        os.utime(campus / arq_manifesto, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+        vigia = asyncio.create_task(servico.vigiar_manifesto())
+        for _ in range(500):
+            if servico.dados is not dados:
+                break
+            await asyncio.sleep(0.01)
+        vigia.cancel()
+        return respostas, dados
+
+    respostas, dados = asyncio.run(pedir())
+    assert [(status, conexao) for status, conexao, _ in respostas] == [(200, 'keep-alive'), (200, 'keep-alive')]
+    assert len(respostas[0][2]) == 3
+    assert respostas[1][2]['aula']['texto'].startswith('TEC.0003')
+    assert servico.dados is not dados and not servico._cache
+
+
+def test_professor_csv_sem_abreviacoes(campus):
+    (campus / 'abrev' / 'professor.csv').write_text('Nome,Turmas\nAna Souza,INT_INFO_2M\n', encoding='utf-8')
+    processar_campus('campus', campus, etapas=('split', 'txt', 'md'))
+    servico = ServicoConsultas(campus)
+    assert consultar(servico, '/membros/professor/ana-souza')['nome'] == 'Ana Souza'
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import escrever_pdf_falso
+from conversor import ConversorCLI
+
+
+def executar_em_paralelo(tarefas):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for futuro in [executor.submit(tarefa) for tarefa in tarefas]:
+            futuro.result()
+
+
+@pytest.mark.parametrize('paginas', [[2, 4], [1, 2, 3, 4], [3]])
+def test_converter_lote_paginas(tmp_path, poppler_falso, paginas):
+    arq_pdf = tmp_path / 'turma.pdf'
+    escrever_pdf_falso(arq_pdf, [f'Turma T{num}\n\nHorário' for num in range(1, 5)])
+    dir_temp = tmp_path / 'temp'
+    dir_temp.mkdir()
+    nome_pagina = {num: f'turma-{num:02d}' for num in paginas}
+
+    ConversorCLI().converter_lote(arq_pdf, dir_temp, nome_pagina, 4, executar_em_paralelo)
+
+    for num, nome_arq in nome_pagina.items():
+        assert (dir_temp / f'{nome_arq}.txt').read_text(encoding='utf-8').startswith(f'Turma T{num}\n')
+        assert f'Turma T{num}' in (dir_temp / f'{nome_arq}.svg').read_text(encoding='utf-8')
+        assert (dir_temp / f'{nome_arq}.png').read_bytes().endswith(f'Turma T{num}'.encode())
+    # Nada além das páginas pedidas
+    assert sorted(p.stem for p in dir_temp.glob('*.svg')) == sorted(nome_pagina.values())
+
+
+def test_mupdf_converte_do_pdf_da_categoria(tmp_path):
+    pytest.importorskip('pymupdf')
+    from conversor import ConversorMuPDF
+    from desempenho import escrever_pdf, pagina_horario
+
+    arq_pdf = tmp_path / 'sala.pdf'
+    escrever_pdf(arq_pdf, [pagina_horario(f'SALA{num:04d}', {(1, 0): f'DSC.{num:04d} T{num}'}) for num in range(1, 9)])
+    conversor = ConversorMuPDF(formatos=('txt', 'svg', 'png'))
+    abertos = []
+    abrir = conversor._pymupdf.open
+
+    def espiar(*args, **kwargs):
+        abertos.append(args[0] if args else None)
+        return abrir(*args, **kwargs)
+    conversor._pymupdf = type('pymupdf', (), {'open': staticmethod(espiar)})
+
+    dir_temp = tmp_path / 'temp'
+    dir_temp.mkdir()
+    conversor.separar(arq_pdf, dir_temp / 'sala-%02d.pdf')
+    separados = len(abertos)
+    nome_pagina = {num: f'sala-{num:02d}' for num in (2, 3, 5, 8)}
+    conversor.converter_paginas(dir_temp, nome_pagina, executar_em_paralelo)
+
+    for num, nome_arq in nome_pagina.items():
+        assert (dir_temp / f'{nome_arq}.txt').read_text(encoding='utf-8').startswith(f'SALA{num:04d}\n')
+        assert (dir_temp / f'{nome_arq}.png').read_bytes().startswith(b'\x89PNG')
+        assert '<svg' in (dir_temp / f'{nome_arq}.svg').read_text(encoding='utf-8')
+    # Nenhum PDF de página aberto; o da categoria, no máximo uma vez por thread
+    conversoes = abertos[separados:]
+    assert set(conversoes) == {arq_pdf}
+    assert len(conversoes) <= 4
+
+    # O lote gera o mesmo texto
+    dir_lote = tmp_path / 'lote'
+    dir_lote.mkdir()
+    conversor.converter_lote(arq_pdf, dir_lote, nome_pagina, 8, executar_em_paralelo)
+    for nome_arq in nome_pagina.values():
+        assert (dir_lote / f'{nome_arq}.txt').read_text() == (dir_temp / f'{nome_arq}.txt').read_text()
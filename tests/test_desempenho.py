@@ -0,0 +1,46 @@
+import pytest
+
+from desempenho import (etapas_medidas, largura_celula, medir_colario, medir_concolario, pagina_horario,
+                        resultados_fixos)
+from grade import analisar_grade, dias, horarios, indice
+from metricas import Metricas
+
+
+@pytest.mark.parametrize('medir', [medir_colario, medir_concolario])
+def test_mesmas_etapas_numa_passada(campus, monkeypatch, medir):
+    comandos = []
+    registrar = Metricas.registrar
+
+    def espiar(self, comando, *args, **kwargs):
+        comandos.append(comando)
+        registrar(self, comando, *args, **kwargs)
+    monkeypatch.setattr(Metricas, 'registrar', espiar)
+
+    # medir() muda o diretório atual; o monkeypatch o restaura
+    monkeypatch.chdir(campus)
+    resultados = medir(campus)
+    assert tuple(resultados) == etapas_medidas
+    assert all(resultados[etapa] > 0 for etapa in ('split', 'txt', 'svg', 'png', 'md', 'total'))
+    # Cada página é convertida uma vez só: 4 professores, 4 salas e 3 turmas
+    assert sum(comando.startswith('pdftotext') for comando in comandos) == 11
+
+
+def test_resultados_fixos():
+    metricas = Metricas()
+    metricas.registrar('pdftotext -layout a.pdf a.txt', 0.5)
+    metricas.registrar('/usr/bin/pdftotext -layout b.pdf b.txt', 0.25)
+    metricas.registrar('pdftoppm -png a.pdf a', 1.0)
+    metricas.etapas += [{'etapa': 'md', 'parede': 0.1}, {'etapa': 'md', 'parede': 0.2},
+                        {'etapa': 'busca', 'parede': 0.3}, {'etapa': 'conversao', 'parede': 9.0}]
+    assert resultados_fixos(metricas) == {'split': 0, 'txt': 0.75, 'svg': 0, 'png': 1.0, 'md': 0.3,
+                                          'index': 0.3, 'total': 0}
+
+
+def test_celulas_cheias_em_dias_vizinhos():
+    # Células da largura máxima em todos os dias, lado a lado
+    celulas = {(horario, dia): f'DSC.{horario:02d}{dia:02d} TUR_SINT_{dia:04d}'
+               for horario in range(1, len(horarios) + 1) for dia in range(len(dias))}
+    assert {len(texto) for texto in celulas.values()} == {largura_celula - 2}
+    grade = analisar_grade('\n'.join(pagina_horario('Sala SALA0001', celulas)))
+    assert grade == [celulas[(h, d)] for h in range(1, len(horarios) + 1) for d in range(len(dias))]
+    assert grade[indice(3, 1)] == 'DSC.0301 TUR_SINT_0001'
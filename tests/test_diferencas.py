@@ -0,0 +1,85 @@
+import json
+import shutil
+
+import pytest
+
+from conftest import escrever_pdf_falso
+from diferencas import comparar_grades, main
+from grade import dias, indice, total_celulas
+
+
+def grade(**celulas) -> list:
+    '''
+    Grade com as células dadas como Seg1='texto' (dia e horário).
+    '''
+    textos = [''] * total_celulas
+    for chave, texto in celulas.items():
+        textos[indice(int(chave[3:]), dias.index(chave[:3]))] = texto
+    return textos
+
+
+def resumo(mudancas: list) -> list:
+    return [(m['tipo'], f"{m['de']['dia']}{m['de']['horario']}", f"{m['para']['dia']}{m['para']['horario']}")
+            for m in mudancas]
+
+
+def test_grades_iguais():
+    assert comparar_grades(grade(Seg1='A'), grade(Seg1='A')) == []
+
+
+def test_tipos_de_mudanca():
+    antes = grade(Seg1='A', Ter2='B', Qua3='C', Qui4='D', Sex5='E')
+    depois = grade(Seg1='B', Ter2='A', Qua4='C', Qui4='X', Sex6='F')
+    assert resumo(comparar_grades(antes, depois)) == [
+        ('troca', 'Seg1', 'Ter2'),
+        ('movida', 'Qua3', 'Qua4'),
+        ('alterada', 'Qui4', 'Qui4'),
+        ('incluida', 'Sex6', 'Sex6'),
+        ('removida', 'Sex5', 'Sex5'),
+    ]
+    troca, movida, alterada = comparar_grades(antes, depois)[:3]
+    assert (troca['antes'], troca['depois']) == ('A', 'B')
+    assert (movida['antes'], movida['depois']) == ('C', 'C')
+    assert (alterada['antes'], alterada['depois']) == ('D', 'X')
+    assert movida['de']['intervalo'] == '8:50 - 9:35'
+
+
+def test_mesma_aula_movida_duas_vezes():
+    # Cada origem é usada uma vez; a terceira cópia vira inclusão
+    antes = grade(Seg1='A', Seg2='A')
+    depois = grade(Ter1='A', Ter2='A', Ter3='A')
+    assert resumo(comparar_grades(antes, depois)) == [
+        ('movida', 'Seg1', 'Ter1'), ('movida', 'Seg2', 'Ter2'), ('incluida', 'Ter3', 'Ter3')]
+
+
+def test_diff_entre_envios(campus, tmp_path, capsys):
+    atual = tmp_path / 'atual'
+    shutil.copytree(campus, atual)
+
+    # LAB01: a aula de segunda às 7:45 passa para sexta, nas mesmas colunas
+    paginas = (campus / 'sala.pdf').read_text(encoding='utf-8').split('\f')[:-1]
+    linhas = paginas[0].split('\n')
+    k = next(k for k, linha in enumerate(linhas) if linha.startswith('7:45'))
+    linha = linhas[k].ljust(16 + 5 * 22)
+    assert linha[16:38].strip() == 'TEC.0007 INT_INFO_2M' and not linha[104:].strip()
+    linhas[k] = (linha[:16] + ' ' * 22 + linha[38:104] + linha[16:38]).rstrip()
+    paginas[0] = '\n'.join(linhas)
+    escrever_pdf_falso(atual / 'sala.pdf', paginas)
+    # Sai a última turma
+    turmas = (campus / 'turma.pdf').read_text(encoding='utf-8').split('\f')[:-1]
+    escrever_pdf_falso(atual / 'turma.pdf', turmas[:-1])
+
+    arq_json = tmp_path / 'mudancas.json'
+    arq_md = tmp_path / 'mudancas.md'
+    with pytest.raises(SystemExit) as saida:
+        main(['campus', str(campus), str(atual), '--json', str(arq_json), '--md', str(arq_md)])
+    assert saida.value.code == 0
+
+    diferencas = json.loads(arq_json.read_text(encoding='utf-8'))['categorias']
+    assert diferencas['professor'] == {'incluidos': [], 'removidos': [], 'alterados': {}, 'inalterados': 4}
+    assert list(diferencas['sala']['alterados']) == ['lab01'] and diferencas['sala']['inalterados'] == 3
+    assert resumo(diferencas['sala']['alterados']['lab01']['mudancas']) == [('movida', 'Seg2', 'Sex2')]
+    assert [m['slug'] for m in diferencas['turma']['removidos']] == ['sub-redes-1n']
+    md = arq_md.read_text(encoding='utf-8')
+    assert '`TEC.0007 INT_INFO_2M` movida de Seg 7:45 - 8:30 para Sex 7:45 - 8:30' in md
+    assert 'sala: 0 incluídos, 0 removidos, 1 alterados, 3 sem mudanças.' in capsys.readouterr().out
@@ -0,0 +1,49 @@
+import pytest
+
+from etapas import grafo, ler_lista, planejar, resolver
+
+
+def test_ordem_respeita_dependencias():
+    ordem = resolver()
+    assert set(ordem) == set(grafo)
+    for etapa, dependencias in grafo.items():
+        for dependencia in dependencias:
+            assert ordem.index(dependencia) < ordem.index(etapa)
+
+
+def test_relacionados_antes_de_md():
+    ordem = resolver(('md', 'relacionados'))
+    assert ordem == ('split', 'txt', 'abreviacoes', 'grades', 'conflitos', 'relacionados', 'md')
+
+
+def test_so_o_pedido_e_as_dependencias():
+    assert resolver(('split', 'txt', 'md')) == ('split', 'txt', 'abreviacoes', 'md')
+    assert resolver(('agendas',)) == ('split', 'txt', 'abreviacoes', 'grades', 'agendas')
+
+
+def test_etapa_desconhecida():
+    with pytest.raises(ValueError, match='foo'):
+        resolver(('foo',))
+
+
+def test_planejar_formatos():
+    etapas, formatos = planejar(formatos=('txt', 'svg'))
+    assert formatos == ('txt', 'svg')
+    assert 'png' not in etapas and 'html' in etapas
+
+    # Sem --formatos, as conversões são as que estão entre as etapas
+    assert planejar(etapas=('split', 'txt', 'md'))[1] == ('txt',)
+    # Com os dois, os formatos mandam nas conversões
+    etapas, formatos = planejar(etapas=('md', 'png'), formatos=('txt', 'svg'))
+    assert formatos == ('txt', 'svg') and 'png' not in etapas
+
+
+def test_planejar_exige_txt():
+    with pytest.raises(ValueError, match='txt'):
+        planejar(formatos=('svg',))
+    with pytest.raises(ValueError, match='gif'):
+        planejar(formatos=('txt', 'gif'))
+
+
+def test_ler_lista():
+    assert ler_lista('split, txt,,md ') == ('split', 'txt', 'md')
@@ -0,0 +1,74 @@
+import random
+import shutil
+
+import pytest
+
+from colario import carrega_expansor, carrega_tabelas_abreviacoes
+from conftest import dir_testes
+from expansao import Expansor
+
+
+def forca_bruta(nomes: dict, texto: str) -> list:
+    '''
+    As ocorrências de Expansor.ocorrencias(), procurando cada abreviação em
+    cada posição do texto.
+    '''
+    def fronteira(posicao):
+        return not (0 <= posicao < len(texto)) or not (texto[posicao].isalnum() or texto[posicao] == '_')
+
+    achadas = sorted(((inicio, inicio + len(abrev), abrev)
+                      for abrev in nomes if abrev
+                      for inicio in range(len(texto))
+                      if texto.startswith(abrev, inicio)
+                      and fronteira(inicio - 1) and fronteira(inicio + len(abrev))),
+                     key=lambda achada: (achada[0], -achada[1]))
+    resultado = []
+    fim_anterior = 0
+    for inicio, fim, abrev in achadas:
+        if inicio >= fim_anterior:
+            resultado.append((inicio, fim, abrev))
+            fim_anterior = fim
+    return resultado
+
+
+def test_palavras_inteiras_e_mais_longa():
+    expansor = Expansor({'A101': 'Sala A101', 'LA101': 'Lab', 'TEC': 'Técnico', 'TEC.0004': 'Programação',
+                         '': 'ignorada'})
+    assert len(expansor) == 4
+    assert expansor.ocorrencias('LA101 A101 XA101') == [(0, 5, 'LA101'), (6, 10, 'A101')]
+    # Num mesmo início, a mais longa; a mais curta continua valendo sozinha
+    assert expansor.ocorrencias('TEC.0004 TEC.0005') == [(0, 8, 'TEC.0004'), (9, 12, 'TEC')]
+    assert expansor.expandir('A101 TEC.0004 A101') == (('A101', 'Sala A101'), ('TEC.0004', 'Programação'))
+    assert expansor.expandir('nada aqui') == ()
+    assert Expansor({}).ocorrencias('A101') == []
+
+
+@pytest.mark.parametrize('semente', range(20))
+def test_igual_a_forca_bruta(semente):
+    aleatorio = random.Random(semente)
+    alfabeto = 'AB1_. '
+    # Poucas letras: muitas abreviações que são prefixo ou sufixo umas das outras
+    nomes = {''.join(aleatorio.choice('AB1_.') for _ in range(aleatorio.randint(1, 5))): 'x'
+             for _ in range(aleatorio.randint(1, 12))}
+    expansor = Expansor(nomes)
+    for _ in range(20):
+        texto = ''.join(aleatorio.choice(alfabeto) for _ in range(aleatorio.randint(0, 40)))
+        assert expansor.ocorrencias(texto) == forca_bruta(nomes, texto), (nomes, texto)
+
+
+def test_abreviacoes_do_campus():
+    expansor = carrega_expansor(dir_testes / 'dados' / 'campus')
+    assert dict(expansor.expandir('TEC.0004 A101 INT_INFO_2M')) == {
+        'TEC.0004': 'Programação Estruturada',
+        'A101': 'Sala de aula A101',
+        'INT_INFO_2M': 'Informática 2º ano matutino (Integrado)',
+    }
+
+
+def test_professor_csv_fica_de_fora(tmp_path):
+    # abrev/professor.csv é Nome,Turmas, sem abreviações
+    shutil.copytree(dir_testes / 'dados' / 'campus' / 'abrev', tmp_path / 'abrev')
+    (tmp_path / 'abrev' / 'professor.csv').write_text(
+        'Nome,Turmas\nAna Souza,"INT_INFO_1M, INT_INFO_2M"\n', encoding='utf-8')
+    assert sorted(carrega_tabelas_abreviacoes(tmp_path)) == ['disciplina', 'sala', 'turma']
+    assert dict(carrega_expansor(tmp_path).expandir('A101 Ana')) == {'A101': 'Sala de aula A101'}
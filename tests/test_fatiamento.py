@@ -0,0 +1,50 @@
+import pytest
+
+from colario import FatiadorPDF, hash_pdf_pagina
+from conversor import ConversorCLI
+
+
+def test_hash_pdf_pagina_ignora_id(tmp_path, campus):
+    hashes = []
+    for execucao in ('a', 'b'):
+        dir_paginas = tmp_path / execucao
+        dir_paginas.mkdir()
+        ConversorCLI().separar(campus / 'sala.pdf', dir_paginas / 'sala-%02d.pdf')
+        hashes.append({pagina.name: hash_pdf_pagina(pagina) for pagina in dir_paginas.glob('*.pdf')})
+    # Os arquivos diferem (/ID novo), os hashes não
+    assert (tmp_path / 'a' / 'sala-01.pdf').read_bytes() != (tmp_path / 'b' / 'sala-01.pdf').read_bytes()
+    assert hashes[0] == hashes[1]
+    assert len(set(hashes[0].values())) == len(hashes[0])
+
+
+def test_hash_pdf_pagina_pdf_real(tmp_path):
+    pymupdf = pytest.importorskip('pymupdf')
+    caminhos = []
+    for execucao in ('a', 'b'):
+        with pymupdf.open() as doc:
+            doc.new_page().insert_text((72, 72), 'Sala A101')
+            caminho = tmp_path / f'{execucao}.pdf'
+            doc.save(caminho)
+            caminhos.append(caminho)
+    assert hash_pdf_pagina(caminhos[0]) == hash_pdf_pagina(caminhos[1])
+
+
+def test_hash_pdf_pagina_id_em_string(tmp_path):
+    # O /ID pode vir como string literal, com escapes e bytes quaisquer
+    hashes = []
+    for execucao, identificador in (('a', rb'<037A31C3>(\0017\)G4o\t\273)'), ('b', b'<9F00AB>(x\nz)')):
+        caminho = tmp_path / f'{execucao}.pdf'
+        caminho.write_bytes(b'%PDF-1.7\ntrailer\n<</Size 7/Root 1 0 R/ID[' + identificador + b']>>\n%%EOF\n')
+        hashes.append(hash_pdf_pagina(caminho))
+    assert hashes[0] == hashes[1]
+
+
+def test_segunda_execucao_reaproveita_paginas(campus):
+    conversor = ConversorCLI(formatos=('txt',))
+    primeira = FatiadorPDF('sala', conversor=conversor, dir_raiz=campus, campus='campus')
+    assert primeira.alterados == set(primeira.membros)
+
+    segunda = FatiadorPDF('sala', paginas_anteriores=primeira.paginas, conversor=conversor,
+                          dir_raiz=campus, campus='campus')
+    assert segunda.paginas == primeira.paginas
+    assert segunda.alterados == set()
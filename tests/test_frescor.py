@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+import frescor
+from frescor import arq_impressao, carregar, impressao, salvar, verificar
+
+argv = ['campus', '.', '/tmp/www']
+
+
+@pytest.fixture
+def dir_pdf(tmp_path):
+    for nome in ('professor.pdf', 'sala.pdf', 'turma.pdf'):
+        (tmp_path / nome).write_text(f'{nome}\f')
+    (tmp_path / 'abrev').mkdir()
+    (tmp_path / 'abrev' / 'sala.csv').write_text('SALA0001,Sala 1\n')
+    (tmp_path / '.colario-manifesto.json').write_text('{}')
+    salvar(str(tmp_path), impressao(str(tmp_path), argv))
+    return tmp_path
+
+
+def test_atualizado(dir_pdf):
+    assert verificar(str(dir_pdf), argv) is None
+
+
+def test_sem_impressao_ou_manifesto(dir_pdf):
+    (dir_pdf / '.colario-manifesto.json').unlink()
+    assert verificar(str(dir_pdf), argv) == 'manifesto ausente'
+    (dir_pdf / arq_impressao).unlink()
+    assert verificar(str(dir_pdf), argv) == 'sem impressão de uma execução anterior'
+
+
+def test_data_nova_mesmo_conteudo(dir_pdf, monkeypatch):
+    caminho = dir_pdf / 'sala.pdf'
+    os.utime(caminho, ns=(0, 10 ** 18))
+    assert verificar(str(dir_pdf), argv) is None
+    assert carregar(str(dir_pdf))['arquivos']['sala.pdf']['mtime'] == 10 ** 18
+
+    # A data atualizada na impressão dispensa a leitura na próxima vez
+    def sem_hash(_):
+        raise AssertionError('não devia ler o arquivo')
+    monkeypatch.setattr(frescor, 'hash_arquivo', sem_hash)
+    assert verificar(str(dir_pdf), argv) is None
+
+
+def test_conteudo_alterado(dir_pdf):
+    caminho = dir_pdf / 'turma.pdf'
+    info = caminho.stat()
+    # Mesmo tamanho e mesma data: só o hash ou o tamanho denunciariam
+    caminho.write_text('turma.pdX\f')
+    os.utime(caminho, ns=(info.st_atime_ns, info.st_mtime_ns + 1))
+    assert verificar(str(dir_pdf), argv) == 'turma.pdf alterado'
+
+
+def test_arquivos_incluidos(dir_pdf):
+    (dir_pdf / 'abrev' / 'turma.csv').write_text('TURMA,Turma\n')
+    assert verificar(str(dir_pdf), argv) == 'arquivos de entrada incluídos ou removidos'
+
+
+def test_argumentos(dir_pdf):
+    assert verificar(str(dir_pdf), argv + ['--dpi', '100']) == 'argumentos diferentes'
+    assert verificar(str(dir_pdf), argv + ['--completo']) == '--completo'
+    # Opções que não mudam o resultado, com e sem valor
+    assert verificar(str(dir_pdf), ['-j', '4', '--check'] + argv + ['--jobs=2', '-j8']) is None
+    assert verificar(str(dir_pdf), argv + ['--watch', '/tmp/envios', '--atraso', '2']) is None
+
+
+def test_main(dir_pdf, monkeypatch, capsys):
+    monkeypatch.chdir(dir_pdf)
+    with pytest.raises(SystemExit) as saida:
+        frescor.main(['--check'] + argv)
+    assert saida.value.code == 0
+    (dir_pdf / 'sala.pdf').write_text('outra sala\f')
+    with pytest.raises(SystemExit) as saida:
+        frescor.main(['--check'] + argv)
+    assert saida.value.code == 1
+    assert 'sala.pdf alterado' in capsys.readouterr().out
+
+
+def test_vigiar_salva_impressao(tmp_path, monkeypatch):
+    import argparse
+
+    import colario
+    import vigia
+
+    dir_envios = tmp_path / 'envios'
+    dir_envios.mkdir()
+    for categoria in vigia.categorias:
+        (dir_envios / f'20260301_{categoria}.pdf').write_text(f'{categoria}\f')
+    dir_pdf = tmp_path / 'horario'
+    dir_pdf.mkdir()
+    monkeypatch.chdir(dir_pdf)
+    linha = ['campus', '.', '/tmp/www', '--watch', str(dir_envios)]
+    monkeypatch.setattr('sys.argv', ['colario.py'] + linha)
+
+    def executar(*_):
+        (dir_pdf / '.colario-manifesto.json').write_text('{}')
+    monkeypatch.setattr(colario, 'campus', 'campus', raising=False)
+    monkeypatch.setattr(colario, 'executar', executar)
+    monkeypatch.setattr(vigia, 'vigiar_envios', lambda envios, ao_chegar, **_: ao_chegar('campus', '20260301'))
+
+    colario.vigiar(argparse.Namespace(completo=False, atraso=0), dir_envios, '/dev/null')
+    # O --check do cron, sem --watch, dá o campus como atualizado
+    assert verificar('.', ['campus', '.', '/tmp/www']) is None
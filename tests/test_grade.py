@@ -0,0 +1,71 @@
+from conftest import dir_testes
+from desempenho import pagina_horario
+from grade import Grades, analisar_grade, dias, horarios, indice, total_celulas
+
+dir_txt = dir_testes / 'dados' / 'esperado' / 'campus' / 'txt'
+
+
+def test_grade_do_pdftotext():
+    celulas = analisar_grade((dir_txt / 'sala' / 'a101.txt').read_text(encoding='utf-8'))
+    assert len(celulas) == total_celulas == len(horarios) * len(dias)
+    assert celulas[indice(1, dias.index('Qui'))] == 'TEC.0009 INT_INFO_2M'
+    assert celulas[indice(4, dias.index('Ter'))] == 'TEC.0003 INT_INFO_2M'
+    # Duas aulas na mesma linha, cada uma na sua coluna
+    assert celulas[indice(7, dias.index('Ter'))] == 'TEC.0003 SUB_REDES_1N'
+    assert celulas[indice(7, dias.index('Qui'))] == 'TEC.0006 INT_INFO_2M'
+    # Separadas por um só espaço, cada aula fica na coluna em que começa
+    assert celulas[indice(9, dias.index('Ter'))] == 'TEC.0008 SUB_REDES_1N'
+    assert celulas[indice(9, dias.index('Qua'))] == 'TEC.0005 INT_INFO_2M'
+    assert celulas[indice(14, dias.index('Qua'))] == 'TEC.0008 SUB_REDES_1N'
+    assert celulas[indice(14, dias.index('Qui'))] == 'TEC.0003 INT_INFO_2M'
+    assert sum(bool(celula) for celula in celulas) == 17
+
+
+def test_grade_sintetica():
+    aulas = {(1, 0): 'DSC.0001 SALA0001', (17, 4): 'DSC.0002 SALA0002', (8, 2): 'DSC.0003 LAB'}
+    celulas = analisar_grade('\n'.join(pagina_horario('Professor Fulano', aulas)))
+    assert {i: c for i, c in enumerate(celulas) if c} == {indice(h, d): texto for (h, d), texto in aulas.items()}
+
+
+def test_linhas_de_continuacao_e_dias_por_extenso():
+    texto = '\n'.join([
+        'TURMA X',
+        '',
+        '                Segunda     Terça       Quarta      Quinta      Sexta',
+        '7:00 - 7:45     TEC.0001                            TEC.0002',
+        '                A101                                LAB01',
+        '7:45 - 8:30                 TEC.0003',
+    ])
+    celulas = analisar_grade(texto)
+    assert celulas[indice(1, 0)] == 'TEC.0001 A101'
+    assert celulas[indice(1, 3)] == 'TEC.0002 LAB01'
+    assert celulas[indice(2, 1)] == 'TEC.0003'
+    assert sum(bool(celula) for celula in celulas) == 3
+
+
+def test_sem_cabecalho():
+    assert analisar_grade('Página sem grade\n7:00 - 7:45   TEC.0001\f') == [''] * total_celulas
+
+
+def test_grades_compartilham_vocabulario():
+    grades = Grades()
+    for categoria, slug in (('sala', 'a101'), ('sala', 'a102'), ('turma', 'int-info-2m')):
+        grades.adicionar(categoria, slug, (dir_txt / categoria / f'{slug}.txt').read_text(encoding='utf-8'))
+    assert len(grades) == 3 and ('sala', 'a101') in grades
+    assert list(grades.membros('sala')) == [('sala', 'a101'), ('sala', 'a102')]
+
+    # Cada texto de célula tem um único código, com os seus termos
+    ter_4 = indice(4, dias.index('Ter'))
+    codigo = grades.grade('sala', 'a101')[ter_4]
+    assert grades.celulas.texto(codigo) == 'TEC.0003 INT_INFO_2M'
+    assert codigo == grades.celulas.procurar('TEC.0003 INT_INFO_2M')
+    termos = [grades.termos.texto(t) for t in grades.termos_celula(codigo)]
+    assert termos == ['TEC.0003', 'INT_INFO_2M']
+    assert grades.ocupacao('sala', 'a101') >> ter_4 & 1
+    assert bin(grades.ocupacao('sala', 'a101')).count('1') == 17
+
+    # Adicionar de novo substitui a grade, sem outro membro
+    grades.adicionar('sala', 'a101', '')
+    assert len(grades) == 3 and grades.ocupacao('sala', 'a101') == 0
+    assert grades.celula('sala', 'a102', 1, 0) == analisar_grade(
+        (dir_txt / 'sala' / 'a102.txt').read_text(encoding='utf-8'))[0]
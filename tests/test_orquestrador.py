@@ -0,0 +1,47 @@
+import argparse
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import concolario
+from concolario import ConversorAssincrono, LacoConversao
+from metricas import Metricas
+from orquestrador import ConfCampus, Progresso, atualizar_campus
+from vigia import categorias
+
+
+def test_campi_compartilham_o_laco(campus, tmp_path, monkeypatch):
+    criados = []
+
+    class Espiao(ConversorAssincrono):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            criados.append(self)
+    monkeypatch.setattr(concolario, 'ConversorAssincrono', Espiao)
+
+    args = argparse.Namespace(lote=False, conversor='assincrono', completo=False, sem_imagens=False,
+                              dpi=72, nivel_png=0, glifos_compartilhados=False, formatos=None,
+                              etapas=('split', 'txt', 'md'), jobs=2, html='nativo')
+    confs = []
+    for nome in ('campus-a', 'campus-b'):
+        envios = tmp_path / nome / 'envios'
+        envios.mkdir(parents=True)
+        for categoria in categorias:
+            shutil.copy(campus / f'{categoria}.pdf', envios / f'20250101T000000_{categoria}.pdf')
+        dir_horario = tmp_path / nome / 'horario'
+        shutil.copytree(campus, dir_horario)
+        confs.append(ConfCampus(nome, envios, '2025.1', dir_horario, www=tmp_path / 'www'))
+
+    laco = LacoConversao(args.jobs)
+    metricas = {conf.nome: Metricas() for conf in confs}
+    with ThreadPoolExecutor(max_workers=2) as conversoes, ThreadPoolExecutor(max_workers=2) as atualizadores:
+        futuros = [atualizadores.submit(atualizar_campus, conf, conversoes, Progresso(len(confs)), args,
+                                        metricas[conf.nome], laco) for conf in confs]
+        for futuro in futuros:
+            futuro.result()
+
+    # Um conversor por campus, com as métricas dele, mas um único semáforo
+    assert len(criados) == 2 and all(conversor._laco is laco for conversor in criados)
+    assert {id(conversor.metricas) for conversor in criados} == {id(m) for m in metricas.values()}
+    assert all(conversor.max_tarefas == 2 and conversor.formatos == ('txt',) for conversor in criados)
+    for conf in confs:
+        assert (tmp_path / 'www' / 'txt' / conf.nome / 'sala' / 'a101.txt').exists()
@@ -0,0 +1,58 @@
+import pytest
+
+from colario import FatiadorPDF, processar_campus
+from desempenho import escrever_pdf, pagina_horario
+from otimizacao import ConfOtimizacao, arq_glifos, extrair_glifos, glifos_usados, juntar_glifos, re_definicao
+
+
+def ids_arquivo_glifos(cam_glifos):
+    return {definicao[3] for definicao in re_definicao.finditer(cam_glifos.read_text(encoding='utf-8'))}
+
+
+def test_juntar_glifos_remove_os_nao_usados(tmp_path):
+    svg = ('<svg><defs><path id="a" d="M0 0L1 1"/><path id="b" d="M1 1L2 2"/></defs>'
+           '<use xlink:href="#a"/><use xlink:href="#b"/></svg>')
+    texto, glifos = extrair_glifos(svg)
+    assert glifos_usados(texto) == set(glifos) and len(glifos) == 2
+    cam_glifos = tmp_path / arq_glifos
+    juntar_glifos(cam_glifos, glifos)
+    assert ids_arquivo_glifos(cam_glifos) == set(glifos)
+
+    manter = {sorted(glifos)[0]}
+    juntar_glifos(cam_glifos, {}, manter)
+    assert ids_arquivo_glifos(cam_glifos) == manter
+
+
+def test_glifos_de_paginas_alteradas(tmp_path):
+    pytest.importorskip('pymupdf')
+    from conversor import ConversorMuPDF
+
+    otimizacao = ConfOtimizacao(glifos_compartilhados=True)
+    conversor = ConversorMuPDF(formatos=('txt', 'svg'))
+    # A mesma sala com uma aula trocada: as letras da aula antiga saem
+    escrever_pdf(tmp_path / 'sala.pdf', [pagina_horario('SALA0001', {(1, 0): 'QWZ.0001 KJY'}),
+                                         pagina_horario('SALA0002', {(2, 1): 'ABC.0002 DEF'})])
+    primeira = FatiadorPDF('sala', conversor=conversor, dir_raiz=tmp_path, campus='campus',
+                           otimizacao=otimizacao, ext_img='svg')
+    antes = ids_arquivo_glifos(tmp_path / 'svg' / 'sala' / arq_glifos)
+    escrever_pdf(tmp_path / 'sala.pdf', [pagina_horario('SALA0001', {(1, 0): 'ABC.0001 DEF'}),
+                                         pagina_horario('SALA0002', {(2, 1): 'ABC.0002 DEF'})])
+    segunda = FatiadorPDF('sala', paginas_anteriores=primeira.paginas, conversor=conversor, dir_raiz=tmp_path,
+                campus='campus', otimizacao=otimizacao, ext_img='svg')
+
+    dir_svg = tmp_path / 'svg' / 'sala'
+    usados = set()
+    for cam_svg in dir_svg.glob('*.svg'):
+        if cam_svg.name != arq_glifos:
+            usados |= glifos_usados(cam_svg.read_text(encoding='utf-8'))
+    assert segunda.alterados == {'sala0001'}
+    # Todos os glifos usados existem, e só eles
+    depois = ids_arquivo_glifos(dir_svg / arq_glifos)
+    assert depois == usados
+    assert depois < antes
+
+
+def test_svg_como_imagem_das_paginas_sem_glifos_externos(campus):
+    processar_campus('campus', campus, formatos=('txt', 'svg'),
+                     otimizacao=ConfOtimizacao(glifos_compartilhados=True))
+    assert not (campus / 'svg' / 'sala' / arq_glifos).exists()
@@ -0,0 +1,49 @@
+from colario import arq_conflitos, processar_campus
+from emissor_html import gerar_html
+
+
+def test_etapas_sem_imagens(campus):
+    processar_campus('campus', campus)
+    assert (campus / arq_conflitos).exists()
+    assert (campus / 'md' / '_static' / 'busca').is_dir()
+    # Página de busca do make html, com o busca.js
+    assert '_static/busca/busca.js' in (campus / 'md' / 'busca.md').read_text()
+    assert '{figure} ../_static/img/sala/a101.png' in (campus / 'md' / 'sala' / 'a101.md').read_text()
+
+    processado = processar_campus('campus', campus, etapas=('split', 'txt', 'md'))
+    assert processado.ext_img is None
+    pagina = (campus / 'md' / 'sala' / 'a101.md').read_text()
+    # Sem imagens geradas nem servidor de imagens, a página fica sem figura
+    assert '{figure}' not in pagina
+    assert '[PNG]' not in pagina and '[TXT]' in pagina
+    # Nada de etapas que não rodaram
+    for artefato in ('png', 'svg', 'ics', arq_conflitos, 'md/_static/busca', 'md/busca.md', 'md/_static/img'):
+        assert not (campus / artefato).exists(), artefato
+
+    gerar_html(processado.membros_categoria, campus / 'md', 'campus', ext_img=processado.ext_img,
+               imagens_locais=processado.imagens_locais, downloads=processado.downloads)
+    assert '<figure' not in (campus / 'md' / '_build' / 'html' / 'sala' / 'a101.html').read_text()
+
+
+def test_sem_imagens_usa_servidor(campus):
+    processado = processar_campus('campus', campus, sem_imagens=True)
+    assert processado.ext_img == 'png' and not processado.imagens_locais
+    pagina = (campus / 'md' / 'sala' / 'a101.md').read_text()
+    assert '{figure} https://mange.ifrn.edu.br/horario/png/campus/sala/a101.png' in pagina
+    assert '[PNG]' in pagina
+
+
+def test_so_svg(campus):
+    processado = processar_campus('campus', campus, formatos=('txt', 'svg'))
+    assert processado.ext_img == 'svg'
+    assert not (campus / 'png').exists()
+    assert '{figure} ../_static/img/sala/a101.svg' in (campus / 'md' / 'sala' / 'a101.md').read_text()
+    assert (campus / 'md' / '_static' / 'img' / 'sala' / 'a101.svg').exists()
+
+
+def test_grades_com_professor_csv(campus):
+    # abrev/professor.csv (Nome,Turmas) não tem abreviações para as referências
+    (campus / 'abrev' / 'professor.csv').write_text('Nome,Turmas\nAna Souza,INT_INFO_2M\n', encoding='utf-8')
+    processado = processar_campus('campus', campus, etapas=('conflitos',))
+    assert processado.ocupacao.ocupacao[('sala', 'a101')]
+    assert (campus / arq_conflitos).exists()
@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from publicacao import arq_manifesto, dir_versoes_destino, dir_versoes_padrao, nome_antiga, publicar
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    origem = tmp_path / 'build'
+    origem.mkdir()
+    (origem / 'index.html').write_text('<html>' + 'horário ' * 100 + '</html>')
+    (origem / 'img.png').write_bytes(b'\x89PNG')
+    return origem, tmp_path / 'www' / 'campus' / '2026.1', tmp_path / 'versoes'
+
+
+def test_versoes_fora_do_www(dirs):
+    origem, destino, dir_versoes = dirs
+    publicar(origem, destino, dir_versoes=dir_versoes)
+
+    assert destino.is_symlink()
+    versao = destino.resolve()
+    assert versao.parent == dir_versoes.resolve()
+    assert (destino / 'index.html').read_text() == (origem / 'index.html').read_text()
+    assert (destino / 'index.html.gz').exists() and (destino / arq_manifesto).exists()
+    # Nada além do link na árvore servida
+    assert sorted(p.name for p in destino.parent.iterdir()) == ['2026.1']
+
+
+def test_reaproveita_e_poda_pelo_nome(dirs):
+    origem, destino, dir_versoes = dirs
+    publicar(origem, destino, dir_versoes=dir_versoes)
+    primeira = destino.resolve()
+    (origem / 'img.png').write_bytes(b'\x89PNG novo')
+    publicar(origem, destino, dir_versoes=dir_versoes)
+    segunda = destino.resolve()
+    assert os.path.samefile(primeira / 'index.html', segunda / 'index.html')
+    assert not os.path.samefile(primeira / 'img.png', segunda / 'img.png')
+
+    # Mexer numa versão antiga muda a data do diretório, não a ordem
+    (primeira / 'extra').write_text('x')
+    publicar(origem, destino, dir_versoes=dir_versoes)
+    assert sorted(dir_versoes.iterdir()) == [segunda, destino.resolve()]
+
+
+def test_destino_comum_e_antiga_que_sobrou(dirs):
+    origem, destino, dir_versoes = dirs
+    destino.mkdir(parents=True)
+    (destino / 'velho.html').write_text('cp')
+    (dir_versoes / nome_antiga).mkdir(parents=True)
+    (dir_versoes / nome_antiga / 'sobra').write_text('x')
+    # Versões ao lado do destino, de publicações anteriores
+    (destino.parent / '2026.1.versoes' / '1').mkdir(parents=True)
+
+    publicar(origem, destino, dir_versoes=dir_versoes)
+    assert destino.is_symlink()
+    assert sorted(p.name for p in (dir_versoes / nome_antiga).iterdir()) == ['velho.html']
+    assert sorted(p.name for p in destino.parent.iterdir()) == ['2026.1']
+
+    # Na poda, a antiga é a mais velha
+    publicar(origem, destino, dir_versoes=dir_versoes)
+    assert not (dir_versoes / nome_antiga).exists()
+
+
+def test_dir_versoes_padrao():
+    assert dir_versoes_destino('/var/www/html/horario/campus') == dir_versoes_padrao / 'var/www/html/horario/campus'
@@ -0,0 +1,58 @@
+'''
+Saída do campus de exemplo comparada, byte a byte, com a esperada em
+tests/dados/esperado/campus. Depois de uma mudança intencional na saída,
+regrave a esperada com
+
+    COLARIO_REGRAVAR_ESPERADO=1 python -m pytest tests/test_saida.py
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+
+from colario import arq_conflitos, processar_campus
+from conftest import dir_testes
+
+dir_esperado = dir_testes / 'dados' / 'esperado' / 'campus'
+# As imagens são as do poppler falso; md/_static/img só as copia
+artefatos = ('md', 'txt', 'ics', arq_conflitos)
+ignorados = ('md/_static/img', 'md/_build')
+
+
+def arquivos_saida(raiz) -> dict:
+    '''
+    {caminho relativo: conteúdo} dos `artefatos` em `raiz`.
+    '''
+    arquivos = {}
+    for artefato in artefatos:
+        caminho = raiz / artefato
+        for arq in ([caminho] if caminho.is_file() else sorted(caminho.rglob('*'))):
+            relativo = arq.relative_to(raiz).as_posix()
+            if arq.is_file() and not relativo.startswith(ignorados):
+                arquivos[relativo] = arq.read_bytes()
+    return arquivos
+
+
+def test_saida_igual_a_esperada(campus):
+    with ThreadPoolExecutor(max_workers=4) as conversoes:
+        processar_campus('campus', campus, conversoes)
+    saida = arquivos_saida(campus)
+
+    if os.environ.get('COLARIO_REGRAVAR_ESPERADO'):
+        shutil.rmtree(dir_esperado, ignore_errors=True)
+        for relativo, conteudo in saida.items():
+            (dir_esperado / relativo).parent.mkdir(parents=True, exist_ok=True)
+            (dir_esperado / relativo).write_bytes(conteudo)
+
+    esperado = arquivos_saida(dir_esperado)
+    assert sorted(saida) == sorted(esperado)
+    diferentes = [relativo for relativo in saida if saida[relativo] != esperado[relativo]]
+    assert not diferentes
+
+
+def test_saida_incremental_igual(campus):
+    # Uma segunda execução, que reaproveita tudo, não muda a saída
+    processar_campus('campus', campus)
+    primeira = arquivos_saida(campus)
+    processar_campus('campus', campus)
+    assert arquivos_saida(campus) == primeira
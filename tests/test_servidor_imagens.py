@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from conftest import escrever_pdf_falso
+from otimizacao import ConfOtimizacao
+from servidor_imagens import CacheImagens
+
+
+def ler(cache, arq_pdf, fmt='svg', slug='a101'):
+    with cache.abrir(fmt, 'campus', 'sala', slug, arq_pdf) as arq:
+        return arq.read()
+
+
+def test_pdf_republicado_com_data_antiga(tmp_path, poppler_falso):
+    arq_pdf = tmp_path / 'a101.pdf'
+    escrever_pdf_falso(arq_pdf, ['Sala A101'])
+    os.utime(arq_pdf, ns=(10**18, 10**18))
+    cache = CacheImagens(tmp_path / 'cache', 1024 * 1024, ConfOtimizacao(nivel_png=0))
+    assert b'Sala A101' in ler(cache, arq_pdf)
+    assert b'Sala A101' in ler(cache, arq_pdf)
+    assert (cache.acertos, cache.falhas) == (1, 1)
+
+    # Publicado de novo com a data da construção, mais antiga que a imagem
+    escrever_pdf_falso(arq_pdf, ['Sala A101 nova'])
+    os.utime(arq_pdf, ns=(10**18 - 1, 10**18 - 1))
+    assert b'Sala A101 nova' in ler(cache, arq_pdf)
+    assert cache.falhas == 2
+    # Só a versão atual fica no cache
+    assert len(list((tmp_path / 'cache' / 'svg' / 'campus' / 'sala' / 'a101').iterdir())) == 1
+    assert len(cache._itens) == 1
+
+    # Ao reiniciar, o cache continua valendo
+    cache = CacheImagens(tmp_path / 'cache', 1024 * 1024, ConfOtimizacao(nivel_png=0))
+    assert b'Sala A101 nova' in ler(cache, arq_pdf)
+    assert cache.acertos == 1
+
+
+def test_expulsao_e_travas(tmp_path, poppler_falso):
+    pdfs = []
+    for num in range(6):
+        arq_pdf = tmp_path / f's{num}.pdf'
+        escrever_pdf_falso(arq_pdf, [f'Sala S{num}'])
+        pdfs.append(arq_pdf)
+    cache = CacheImagens(tmp_path / 'cache', 200, ConfOtimizacao(nivel_png=0))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        imagens = list(executor.map(lambda i: ler(cache, pdfs[i % 6], slug=f's{i % 6}'), range(24)))
+    for i, imagem in enumerate(imagens):
+        assert f'Sala S{i % 6}'.encode() in imagem
+    assert cache._total <= 200 or len(cache._itens) == 1
+    assert cache._total == sum(cache._itens.values())
+    assert not cache._travas_itens
+
+
+def test_pedidos_simultaneos_uma_conversao(tmp_path, poppler_falso):
+    arq_pdf = tmp_path / 'a101.pdf'
+    escrever_pdf_falso(arq_pdf, ['Sala A101'])
+    cache = CacheImagens(tmp_path / 'cache', 1024 * 1024, ConfOtimizacao(nivel_png=0))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(b'Sala A101' in imagem for imagem in executor.map(lambda _: ler(cache, arq_pdf), range(16)))
+    assert cache.falhas == 1 and cache.acertos == 15
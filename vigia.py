@@ -0,0 +1,168 @@
+'''
+Vigia dos diretórios de envio: espera o envio dos três PDFs de um horário
+(<carimbo>_professor.pdf, <carimbo>_sala.pdf e <carimbo>_turma.pdf) e avisa
+quando o conjunto está completo e parou de mudar.
+
+No Linux usa o inotify (pela libc, com ctypes); se ele não estiver
+disponível, compara a data e o tamanho dos PDFs a cada poucos segundos.
+'''
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import pathlib
+import select
+import struct
+import time
+
+categorias = ('professor', 'sala', 'turma')
+
+# Constantes de <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+
+formato_evento = 'iIII'
+tamanho_evento = struct.calcsize(formato_evento)
+
+
+def ultimo_envio(dir_envios: pathlib.Path) -> str:
+    '''
+    Carimbo de tempo do envio mais recente com as três categorias, a partir
+    dos arquivos <carimbo>_<categoria>.pdf, ou None se não houver nenhum.
+    '''
+    por_carimbo = {}
+    for arq in pathlib.Path(dir_envios).glob('*_*.pdf'):
+        carimbo, _, categoria = arq.stem.partition('_')
+        por_carimbo.setdefault(carimbo, set()).add(categoria)
+    completos = sorted(c for c, cats in por_carimbo.items() if set(categorias) <= cats)
+    return completos[-1] if completos else None
+
+
+class VigiaInotify:
+    '''
+    Espera por PDFs gravados ou movidos para os diretórios vigiados.
+    '''
+
+    def __init__(self, diretorios: list):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 falhou')
+        self._diretorios = {}
+        for diretorio in diretorios:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(diretorio), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                erro = ctypes.get_errno()
+                os.close(self._fd)
+                raise OSError(erro, f'inotify_add_watch falhou para {diretorio}')
+            self._diretorios[wd] = pathlib.Path(diretorio)
+
+    def esperar(self, tempo_max: float = None) -> set:
+        '''
+        Diretórios em que chegaram PDFs, ou um conjunto vazio se nada chegar
+        em `tempo_max` segundos.
+        '''
+        prontos, _, _ = select.select([self._fd], [], [], tempo_max)
+        if not prontos:
+            return set()
+        alterados = set()
+        dados = os.read(self._fd, 64 * 1024)
+        posicao = 0
+        while posicao < len(dados):
+            wd, mascara, _, tamanho = struct.unpack_from(formato_evento, dados, posicao)
+            nome = dados[posicao + tamanho_evento:posicao + tamanho_evento + tamanho].rstrip(b'\0')
+            posicao += tamanho_evento + tamanho
+            if mascara & IN_Q_OVERFLOW:
+                alterados.update(self._diretorios.values())
+            elif nome.endswith(b'.pdf') and wd in self._diretorios:
+                alterados.add(self._diretorios[wd])
+        return alterados
+
+    def fechar(self):
+        os.close(self._fd)
+
+
+class VigiaVarredura:
+    '''
+    Alternativa ao inotify: compara data e tamanho dos PDFs a cada `intervalo`
+    segundos.
+    '''
+
+    def __init__(self, diretorios: list, intervalo: float = 2.0):
+        self._diretorios = [pathlib.Path(d) for d in diretorios]
+        self._intervalo = intervalo
+        self._estado = {d: self._varrer(d) for d in self._diretorios}
+
+    def _varrer(self, diretorio: pathlib.Path) -> dict:
+        estado = {}
+        with os.scandir(diretorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith('.pdf'):
+                    info = entrada.stat()
+                    estado[entrada.name] = (info.st_mtime_ns, info.st_size)
+        return estado
+
+    def esperar(self, tempo_max: float = None) -> set:
+        limite = None if tempo_max is None else time.monotonic() + tempo_max
+        while True:
+            espera = self._intervalo if limite is None else max(0.0, min(self._intervalo, limite - time.monotonic()))
+            time.sleep(espera)
+            alterados = set()
+            for diretorio in self._diretorios:
+                estado = self._varrer(diretorio)
+                if estado != self._estado[diretorio]:
+                    self._estado[diretorio] = estado
+                    alterados.add(diretorio)
+            if alterados or (limite is not None and time.monotonic() >= limite):
+                return alterados
+
+    def fechar(self):
+        pass
+
+
+def criar_vigia(diretorios: list, intervalo: float = 2.0):
+    try:
+        vigia = VigiaInotify(diretorios)
+        logging.info(f'Vigiando {len(diretorios)} diretórios com inotify.')
+    except (OSError, AttributeError) as erro:
+        logging.warning(f'inotify indisponível ({erro}); verificando a cada {intervalo} s.')
+        vigia = VigiaVarredura(diretorios, intervalo)
+    return vigia
+
+
+def vigiar_envios(envios: dict, ao_chegar, atraso: float = 5.0, intervalo: float = 2.0):
+    '''
+    Chama `ao_chegar(nome, carimbo)` para cada novo envio completo. `envios`
+    é {nome: diretório de envios}. Um envio só é considerado depois de
+    `atraso` segundos sem mudanças no diretório, para que os três PDFs
+    cheguem juntos. O envio mais recente no início também é entregue.
+    Não retorna; termina com KeyboardInterrupt.
+    '''
+    por_diretorio = {pathlib.Path(d): nome for nome, d in envios.items()}
+    entregues = {}
+    # Diretório -> momento da última mudança; no início, todos "mudaram"
+    pendentes = {diretorio: time.monotonic() - atraso for diretorio in por_diretorio}
+    vigia = criar_vigia(list(por_diretorio), intervalo)
+    try:
+        while True:
+            agora = time.monotonic()
+            for diretorio, instante in list(pendentes.items()):
+                if agora - instante < atraso:
+                    continue
+                del pendentes[diretorio]
+                nome = por_diretorio[diretorio]
+                carimbo = ultimo_envio(diretorio)
+                if carimbo is None or entregues.get(nome) == carimbo:
+                    continue
+                entregues[nome] = carimbo
+                logging.info(f'Envio {carimbo} de {nome} completo.')
+                ao_chegar(nome, carimbo)
+
+            agora = time.monotonic()
+            tempo_max = min((instante + atraso - agora for instante in pendentes.values()), default=None)
+            for diretorio in vigia.esperar(None if tempo_max is None else max(0.0, tempo_max)):
+                pendentes[diretorio] = time.monotonic()
+    finally:
+        vigia.fechar()